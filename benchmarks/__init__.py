@@ -0,0 +1,6 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Benchmarks of simulation hot paths.
+# **********************************************************************************#
+"""
@@ -0,0 +1,56 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Benchmark of trading action transition modes.
+#    Usage: python -m benchmarks.bench_state_transition
+# **********************************************************************************#
+"""
+import time
+import random
+from copy import deepcopy
+from brain.trade_env.base import TradingAction
+from brain.trade_env.state import PortfolioState
+from brain.trade_env.state_transition import trading_action_transition
+
+
+ACTIONS = [TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT, TradingAction.COVER, TradingAction.FAIR]
+
+
+def _run(mode, steps=20000, seed=0):
+    """
+    Run transitions in the given mode and return steps per second.
+
+    Args:
+        mode(string): 'deepcopy', 'copy' or 'inplace'
+        steps(int): number of steps
+        seed(int): random seed
+
+    Returns:
+        float: steps per second
+    """
+    random_state = random.Random(seed)
+    state = PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=5e5)
+    actions = [random_state.choice(ACTIONS) for _ in range(steps)]
+    prices = [21000 + random_state.gauss(0, 100) for _ in range(steps)]
+    start = time.perf_counter()
+    if mode == 'deepcopy':
+        for action, price in zip(actions, prices):
+            state = trading_action_transition(action, deepcopy(state), price, inplace=True)
+    elif mode == 'copy':
+        for action, price in zip(actions, prices):
+            state = trading_action_transition(action, state, price)
+    else:
+        for action, price in zip(actions, prices):
+            trading_action_transition(action, state, price, inplace=True)
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    baseline = _run('deepcopy')
+    for mode in ['deepcopy', 'copy', 'inplace']:
+        speed = baseline if mode == 'deepcopy' else _run(mode)
+        print('{:<10}{:>12.0f} steps/sec{:>8.2f}x'.format(mode, speed, speed / baseline))
+
+
+if __name__ == '__main__':
+    main()
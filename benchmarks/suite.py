@@ -0,0 +1,313 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Benchmark suite of simulation hot paths on synthetic prices.
+#     Desc: speeds are normalized by a calibration loop run alternately with each benchmark,
+#           so the baseline compares relative speeds rather than the speed of one host. The
+#           baseline is not versioned, save it locally with --save-baseline before comparing.
+#    Usage: python -m benchmarks.suite [--output results.json] [--baseline benchmarks/baseline.json]
+#                                      [--threshold 0.2] [--save-baseline] [--filter name]
+# **********************************************************************************#
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import numpy as np
+from collections import OrderedDict
+from brain.core.memory import ReplayMemory
+from brain.trade.position import FuturesPosition
+from brain.trade.trade import Trade
+from brain.trade_env.bar_quote import BarQuote
+from brain.trade_env.base import TradingAction
+from brain.trade_env.market_env import FuturesMarketEnv
+from brain.trade_env.state import PortfolioState
+from brain.trade_env.state_transition import trading_action_transition
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.2
+ACTIONS = [TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT, TradingAction.COVER, TradingAction.FAIR]
+REPLAY_CAPACITIES = [1000, 10000, 100000]
+REPLAY_BATCH_SIZE = 32
+CALIBRATION_NUMBER = 100000
+CALIBRATION_ROUNDS = 5
+
+
+def _prices(length, seed=0):
+    """
+    Synthetic random walk prices.
+    """
+    return 21000 + np.cumsum(np.random.RandomState(seed).normal(0, 20, size=length))
+
+
+def _measure(func, number, repeat=3):
+    """
+    Best operations per second of func over repeats.
+
+    Args:
+        func(func): function running `number` operations
+        number(int): number of operations of each call
+        repeat(int): number of repeats
+
+    Returns:
+        float: operations per second
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return number / best
+
+
+class _Calibration(object):
+    """
+    Object of the calibration loop.
+    """
+    __slots__ = ['value']
+
+    def __init__(self):
+        self.value = 0.
+
+    def add(self, price):
+        self.value = self.value * 0.5 + price
+
+
+def calibrate(number=CALIBRATION_NUMBER):
+    """
+    Operations per second of a reference loop of attribute access, method calls, float arithmetic
+    and small numpy calls, the speed of the interpreter on this host.
+
+    Args:
+        number(int): number of operations
+
+    Returns:
+        float: operations per second
+    """
+    reference = _Calibration()
+    prices = _prices(number).tolist()
+    array = np.zeros(4)
+
+    def run():
+        for index, price in enumerate(prices):
+            reference.add(price)
+            if not index % 10:
+                array.sum()
+
+    return _measure(run, number)
+
+
+def _holding_state():
+    """
+    Portfolio state holding both long and short positions.
+    """
+    state = PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=5e5)
+    trading_action_transition(TradingAction.BUY, state, 21000, inplace=True)
+    trading_action_transition(TradingAction.SHORT, state, 21010, inplace=True)
+    return state
+
+
+def bench_env_step(number=20000):
+    """
+    FuturesMarketEnv.step with in-place trading action transition.
+    """
+    random_state = random.Random(0)
+    actions = [random_state.choice(ACTIONS) for _ in range(number)]
+    env = FuturesMarketEnv.from_configs(margin_cash=5e5, symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                        bar_quote=BarQuote(bar_dict={'closePrice': _prices(number + 1)}))
+    state_transition = (lambda a, s: trading_action_transition(a, s, env.bar_quote.current(), inplace=True))
+
+    def run():
+        env.reset()
+        for action in actions:
+            env.step(action, state_transition=state_transition)
+
+    return _measure(run, number)
+
+
+def bench_transition(action, number=20000):
+    """
+    trading_action_transition of one action type on a copied holding state.
+    """
+    state = _holding_state()
+    prices = _prices(number).tolist()
+
+    def run():
+        for price in prices:
+            trading_action_transition(action, state, price)
+
+    return _measure(run, number)
+
+
+def bench_position_update(number=20000):
+    """
+    FuturesPosition.update of open and close trades, two updates per operation pair.
+    """
+    position = FuturesPosition.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15)
+    prices = _prices(number // 2).tolist()
+    trades = [(Trade(None, 'ZN1902', direction, 'open', 2, price, None, 0, 0),
+               Trade(None, 'ZN1902', -direction, 'close', 2, price + 5, None, 0, 0))
+              for direction, price in zip([1, -1] * (number // 4), prices)]
+
+    def run():
+        for open_trade, close_trade in trades:
+            position.update(open_trade, 5, 0.15)
+            position.update(close_trade, 5, 0.15)
+
+    return _measure(run, 2 * len(trades))
+
+
+def bench_position_evaluate(number=50000):
+    """
+    FuturesPosition.evaluate of a holding position.
+    """
+    position = _holding_state().position_holding
+    prices = _prices(number).tolist()
+
+    def run():
+        for price in prices:
+            position.evaluate(price, 5, 0.15)
+
+    return _measure(run, number)
+
+
+def bench_portfolio_evaluate(number=50000):
+    """
+    PortfolioState.evaluate of a holding portfolio.
+    """
+    state = _holding_state()
+    prices = _prices(number).tolist()
+
+    def run():
+        for price in prices:
+            state.evaluate(price)
+
+    return _measure(run, number)
+
+
+def bench_replay_sample(capacity, number=2000):
+    """
+    ReplayMemory.sample of a full memory.
+    """
+    random.seed(0)
+    memory = ReplayMemory(capacity)
+    memory.extend(range(capacity))
+
+    def run():
+        for _ in range(number):
+            memory.sample(REPLAY_BATCH_SIZE)
+
+    return _measure(run, number)
+
+
+def benchmarks():
+    """
+    All benchmarks.
+
+    Returns:
+        OrderedDict: key-->benchmark name, value-->function returning operations per second
+    """
+    result = OrderedDict()
+    result['env_step'] = bench_env_step
+    for action in ACTIONS:
+        result['transition_{}'.format(action.lower())] = (lambda a=action: bench_transition(a))
+    result['position_update'] = bench_position_update
+    result['position_evaluate'] = bench_position_evaluate
+    result['portfolio_evaluate'] = bench_portfolio_evaluate
+    for capacity in REPLAY_CAPACITIES:
+        result['replay_sample_{}'.format(capacity)] = (lambda c=capacity: bench_replay_sample(c))
+    return result
+
+
+def run_benchmarks(pattern=None, rounds=CALIBRATION_ROUNDS):
+    """
+    Run benchmarks, each one alternately with the calibration loop for rounds, the relative speed is
+    the median ratio of the rounds and the operations per second the best of them.
+
+    Args:
+        pattern(string): only run benchmarks whose names contain pattern
+        rounds(int): number of rounds
+
+    Returns:
+        dict: machine-readable results, operations per second in 'results' and speeds relative to
+              the calibration loop in 'relative'
+    """
+    results, relative = OrderedDict(), OrderedDict()
+    for name, func in benchmarks().items():
+        if pattern is None or pattern in name:
+            speeds, ratios = list(), list()
+            for _ in range(rounds):
+                calibration = calibrate()
+                speeds.append(func())
+                ratios.append(speeds[-1] / calibration)
+            results[name], relative[name] = max(speeds), float(np.median(ratios))
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+        'relative': relative
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare calibrated speeds with baseline, baselines without them are not comparable.
+
+    Args:
+        results(dict): output of run_benchmarks
+        baseline(dict): baseline output of run_benchmarks
+        threshold(float): maximum relative slowdown
+
+    Returns:
+        dict, list: key-->benchmark name, value-->speed ratio to baseline; and names of regressions
+    """
+    ratios, regressions = OrderedDict(), list()
+    reference = baseline.get('relative', dict())
+    for name, speed in results['relative'].items():
+        if name not in reference:
+            continue
+        ratios[name] = speed / reference[name]
+        if ratios[name] < 1 - threshold:
+            regressions.append(name)
+    return ratios, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark suite of simulation hot paths.')
+    parser.add_argument('--output', help='path to write json results')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline json results')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='maximum relative slowdown')
+    parser.add_argument('--save-baseline', action='store_true', help='write results as the baseline')
+    parser.add_argument('--filter', help='only run benchmarks whose names contain it')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    baseline = None
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print('no baseline at {}, save one on this host with --save-baseline first'.format(args.baseline))
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+    ratios, regressions = compare(results, baseline, args.threshold) if baseline else (dict(), list())
+    for name, speed in results['results'].items():
+        ratio = '{:>8.2f}x'.format(ratios[name]) if name in ratios else ''
+        flag = '  REGRESSION' if name in regressions else ''
+        print('{:<24}{:>14.0f} ops/sec{:>10.4g} calibrated{}{}'.format(name, speed, results['relative'][name],
+                                                                          ratio, flag))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Backtest collections.
+# **********************************************************************************#
+"""
+from . engine import BacktestEngine, Context
+
+
+__all__ = [
+    'BacktestEngine',
+    'Context'
+]
@@ -0,0 +1,435 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Event-driven backtest engine.
+#     Desc: bars of the universe are preloaded into one array, history is served by
+#           views of it and only the refresh bars run the callbacks.
+# **********************************************************************************#
+"""
+import math
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from utils.exceptions import *
+from .. const import (
+    DEFAULT_KEYWORDS,
+    BAR_QUOTE_DAILY_FIELDS,
+    BAR_QUOTE_MINUTE_FIELDS
+)
+from .. loader.database_api import (
+    normalize_date,
+    load_futures_daily_data,
+    load_futures_minute_data
+)
+from .. loader.trading_calendar import TradingCalendar
+from .. trade.trade_book import TradeBook
+from .. trade_env.multi_state import MultiSymbolPortfolioState
+
+
+MIN_MINUTE_BARS_PER_DAY = 225
+
+
+def _to_dates(values):
+    """
+    Normalize dates to datetime64[D].
+    """
+    return np.asarray(pd.to_datetime(pd.Index(list(values))).values, dtype='datetime64[D]')
+
+
+def _forward_fill(values):
+    """
+    Forward fill nan along the last axis.
+    """
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(index, axis=-1, out=index)
+    return np.take_along_axis(values, index, axis=-1)
+
+
+class Context(object):
+    """
+    Backtest context passed to initialize, handle_data and post_trading_day.
+    Any attribute can be set on it to keep strategy variables.
+
+    handle_data of a bar runs before the bar closes: history, current_price and portfolio_value are
+    those of the previous bar, and orders fill at the close of the bar. post_trading_day runs after
+    the last bar of the day closed, and sees that bar, so its orders are queued and fill at the close
+    of the next refresh bar, before handle_data of that bar.
+    """
+    def __init__(self, engine):
+        """
+        Args:
+            engine(BacktestEngine): backtest engine
+        """
+        self._engine = engine
+        self.cursor = 0
+        self.closed = False
+        self.current_date = None
+        self.universe = engine.universe
+        self.config = engine.config
+        self.portfolio = engine.portfolio
+
+    @property
+    def now(self):
+        """
+        Bar time at the cursor.
+        """
+        return self._engine.times[self.cursor]
+
+    @property
+    def last_bar(self):
+        """
+        Index of the last closed bar: the cursor once it closed, otherwise the bar before it.
+        """
+        return self.cursor if self.closed else self.cursor - 1
+
+    @property
+    def portfolio_value(self):
+        """
+        Portfolio value marked to market at the last closed bar.
+        """
+        if self.last_bar >= 0:
+            self._engine.mark_to_market(self.last_bar)
+        return self.portfolio.portfolio_value
+
+    def current_price(self, symbol):
+        """
+        Close price of the symbol at the last closed bar, the last valid one if the symbol has no bar,
+        cost base before its first bar.
+
+        Args:
+            symbol(string): symbol
+
+        Returns:
+            float: price
+        """
+        index = self._engine.symbol_index[symbol]
+        if self.last_bar < 0:
+            return self._engine.cost_base[index]
+        return self._engine.prices[index, self.last_bar]
+
+    def history(self, field='closePrice', window=None, symbol=None):
+        """
+        History bars up to the last closed bar, served as views of the preloaded bars without copy.
+
+        Args:
+            field(string): bar field
+            window(int): number of bars, max history window by default
+            symbol(string): symbol, all symbols of the universe if None
+
+        Returns:
+            array: shape (window,) of the symbol or (symbols, window) of the universe, nan where no bar
+        """
+        engine = self._engine
+        window = window or engine.max_history_window
+        end = self.last_bar + 1
+        start = max(end - window, 0)
+        bars = engine.bars[engine.field_index[field]]
+        if symbol is None:
+            return bars[:, start:end]
+        return bars[engine.symbol_index[symbol], start:end]
+
+    def position(self, symbol):
+        """
+        Net position of the symbol, long amount minus short amount.
+
+        Args:
+            symbol(string): symbol
+
+        Returns:
+            float: net position
+        """
+        index = self._engine.symbol_index[symbol]
+        positions = self.portfolio.positions
+        return positions.long_amount[index] - positions.short_amount[index]
+
+    def order(self, symbol, amount):
+        """
+        Trade amount of the symbol at the close price of the cursor bar, closing the opposite position before
+        opening. Once the cursor bar closed, the order is queued to the next refresh bar instead.
+
+        Args:
+            symbol(string): symbol
+            amount(int): positive to buy and negative to sell
+
+        Returns:
+            list of TradeView: filled trades, empty if queued
+        """
+        if self.closed:
+            self._engine.queue(symbol, amount)
+            return list()
+        return self._engine.fill(symbol, amount, self.cursor)
+
+    def order_to(self, symbol, target):
+        """
+        Trade the symbol to the target net position, counting the queued amount.
+
+        Args:
+            symbol(string): symbol
+            target(int): target net position
+
+        Returns:
+            list of TradeView: filled trades, empty if queued
+        """
+        return self.order(symbol, target - self.position(symbol) - self._engine.pending.get(symbol, 0))
+
+
+class BacktestEngine(object):
+    """
+    Event-driven backtest engine configured by the keys of DEFAULT_KEYWORDS.
+
+    Bars of all fields and symbols are preloaded into one array of shape (fields, symbols, bars)
+    aligned on the union of bar times, warmed up by max_history_window bars before start.
+    Only the refresh bars run handle_data and the portfolio is marked to market on demand
+    and at the end of each trading day, so the loop cost scales with the callbacks. To avoid
+    look-ahead, handle_data only sees bars before the refresh bar and its orders fill at the
+    close of the refresh bar, orders of post_trading_day are queued to the next refresh bar.
+    """
+    def __init__(self, config=None, data=None, bar_store=None, calendar=None, multiplier=1, margin_rate=1.,
+                 fields=None, commission=None, slippage=None):
+        """
+        Args:
+            config(dict): backtest config, defaults of DEFAULT_KEYWORDS are used for missing keys
+            data(dict): preloaded data in the output format of load_futures_daily_data or
+                        load_futures_minute_data (with tradeTime), loaded by the config if None
+            bar_store(BarStore): local bar store used by the loaders
+            calendar(TradingCalendar): trading calendar, loaded between start and end if None
+            multiplier(float or dict): contract multiplier, or key-->symbol, value-->multiplier
+            margin_rate(float or dict): contract margin rate, or key-->symbol, value-->margin rate
+            fields(list of string): numeric bar fields to load
+            commission(Commission): commission charged on fills, free if None
+            slippage(Slippage): slippage charged on fills, free if None
+        """
+        config = config or dict()
+        if not set(config).issubset(DEFAULT_KEYWORDS):
+            raise Exceptions.INVALID_BACKTEST_CONFIG
+        self.config = dict(DEFAULT_KEYWORDS, **config)
+        self.universe = list(self.config['universe'])
+        self.symbol_index = {symbol: index for index, symbol in enumerate(self.universe)}
+        self.daily = self.config['freq'] == 'd'
+        window = self.config['max_history_window']
+        self.max_history_window = window if isinstance(window, int) else window[0 if self.daily else 1]
+        self.fields = list(fields or (BAR_QUOTE_DAILY_FIELDS if self.daily else BAR_QUOTE_MINUTE_FIELDS))
+        self.field_index = {field: index for index, field in enumerate(self.fields)}
+        if data is None:
+            data = self._load(bar_store=bar_store, calendar=calendar)
+        self._preload(data)
+        cost_base = np.array([self.config['cost_base'].get(_, 0) for _ in self.universe], dtype=np.float64)
+        prices = _forward_fill(self.bars[self.field_index['closePrice']])
+        self.cost_base = cost_base
+        self.tradable = ~np.isnan(prices)
+        self.prices = np.where(self.tradable, prices, cost_base[:, None])
+        start = self.config['start']
+        self.start_day = 0 if start is None else int(np.searchsorted(self.trading_days, _to_dates([start])[0]))
+        end = self.config['end']
+        self.end_day = len(self.trading_days) if end is None else \
+            int(np.searchsorted(self.trading_days, _to_dates([end])[0], side='right'))
+
+        def _specs(value):
+            return [value.get(_, 1.) for _ in self.universe] if isinstance(value, dict) else value
+
+        self.portfolio = MultiSymbolPortfolioState.from_configs(
+            self.universe,
+            position_base=[self.config['position_base'].get(_, 0) for _ in self.universe],
+            cost_base=cost_base,
+            margin_cash=self.config['capital_base'],
+            multiplier=_specs(multiplier),
+            margin_rate=_specs(margin_rate))
+        self.commission = commission
+        self.slippage = slippage
+        self.trades = TradeBook()
+        self.pending = dict()
+        self._marked_cursor = None
+
+    def _load(self, bar_store=None, calendar=None):
+        """
+        Load bars of the universe from start, shifted back by the warm up days, to end.
+        """
+        warm_up_days = self.max_history_window if self.daily else \
+            int(math.ceil(self.max_history_window / MIN_MINUTE_BARS_PER_DAY))
+        start, end = normalize_date(self.config['start']), normalize_date(self.config['end'])
+        if calendar is None:
+            calendar = TradingCalendar.load(start - timedelta(days=2 * warm_up_days + 15), end)
+        first = max(int(calendar.index(start)) - warm_up_days, 0)
+        trading_days = [pd.Timestamp(_).to_pydatetime() for _ in calendar.trading_days(calendar.dates[first], end)]
+        if self.daily:
+            return load_futures_daily_data(self.universe, trading_days, attributes=self.fields, bar_store=bar_store)
+        return load_futures_minute_data(self.universe, trading_days, field=self.fields + ['tradeTime'],
+                                        freq=self.config['freq'], bar_store=bar_store)
+
+    def _preload(self, data):
+        """
+        Preload data into the bar array, symbols missing in data are filled with nan.
+        """
+        frame = data[self.fields[0]]
+        self.trading_days = _to_dates(frame.index)
+        num_days, num_symbols = len(self.trading_days), len(self.universe)
+        if self.daily:
+            self.times = self.trading_days
+            self.day_offsets = np.arange(num_days + 1)
+            self.bars = np.full((len(self.fields), num_symbols, num_days), np.nan)
+            for field, field_bars in zip(self.fields, self.bars):
+                for symbol, symbol_bars in zip(self.universe, field_bars):
+                    if field in data and symbol in data[field]:
+                        symbol_bars[:] = data[field][symbol].to_numpy(dtype=np.float64)
+            return
+        # 分钟线按交易日对齐所有合约的bar时间
+        times_frame = data['tradeTime']
+        day_times, positions = list(), list()
+        for day in range(num_days):
+            symbol_times = [np.asarray(times_frame[symbol].iloc[day], dtype='datetime64[m]')
+                            if symbol in times_frame else np.empty(0, dtype='datetime64[m]')
+                            for symbol in self.universe]
+            times = np.unique(np.concatenate(symbol_times))
+            day_times.append(times)
+            positions.append([np.searchsorted(times, _) for _ in symbol_times])
+        self.day_offsets = np.concatenate([[0], np.cumsum([len(_) for _ in day_times])])
+        self.times = np.concatenate(day_times)
+        self.bars = np.full((len(self.fields), num_symbols, len(self.times)), np.nan)
+        for field, field_bars in zip(self.fields, self.bars):
+            if field not in data:
+                continue
+            for index, symbol in enumerate(self.universe):
+                if symbol not in data[field]:
+                    continue
+                cells = data[field][symbol]
+                for day in range(num_days):
+                    field_bars[index, self.day_offsets[day] + positions[day][index]] = cells.iloc[day]
+
+    def refresh_bars(self, day):
+        """
+        Bar indices running handle_data in the trading day, by refresh_rate: every n trading days for
+        daily bars, every n bars or (days, bars) for minute bars.
+
+        Args:
+            day(int): trading day index
+
+        Returns:
+            range: bar indices
+        """
+        refresh_rate = self.config['refresh_rate']
+        if self.daily:
+            every_days, every_bars = refresh_rate, 1
+        else:
+            every_days, every_bars = refresh_rate if isinstance(refresh_rate, (tuple, list)) else (1, refresh_rate)
+        start, end = self.day_offsets[day], self.day_offsets[day + 1]
+        if (day - self.start_day) % every_days:
+            return range(0)
+        return range(start + every_bars - 1, end, every_bars)
+
+    def mark_to_market(self, cursor):
+        """
+        Mark the portfolio to market at the bar, only once for each bar.
+
+        Args:
+            cursor(int): bar index
+        """
+        if cursor != self._marked_cursor:
+            self.portfolio.evaluate(self.prices[:, cursor])
+            self._marked_cursor = cursor
+
+    def fill(self, symbol, amount, cursor):
+        """
+        Fill the order of the symbol at the close price of the bar, closing the opposite position before opening.
+
+        Args:
+            symbol(string): symbol
+            amount(int): positive to buy and negative to sell
+            cursor(int): bar index
+
+        Returns:
+            list of TradeView: filled trades
+        """
+        index = self.symbol_index[symbol]
+        if not amount or not self.tradable[index, cursor]:
+            return list()
+        price = self.prices[index, cursor]
+        self.mark_to_market(cursor)
+        positions = self.portfolio.positions
+        direction = 1 if amount > 0 else -1
+        holding = positions.short_amount[index] if direction == 1 else positions.long_amount[index]
+        close_amount = min(holding, abs(amount))
+        trades = list()
+        for offset_flag, offset, quantity in [('close', -1, close_amount), ('open', 1, abs(amount) - close_amount)]:
+            if not quantity:
+                continue
+            market_value = quantity * price * positions.multiplier.item(index)
+            commission = self.commission.calculate_futures_commission(market_value, offset_flag) \
+                if self.commission else 0
+            slippage = self.slippage.calculate_futures_slippage(market_value) if self.slippage else 0
+            # 只更新成交合约所在行, 避免每笔成交遍历整个合约池
+            self.portfolio.update_row(index, direction, offset, quantity, price, cost=commission + slippage)
+            trades.append(self.trades.record(order_id=None, symbol=symbol, direction=direction,
+                                             offset_flag=offset_flag, transact_amount=quantity,
+                                             transact_price=price, filled_time=self.times[cursor],
+                                             commission=commission, slippage=slippage))
+        return trades
+
+    def queue(self, symbol, amount):
+        """
+        Queue the order of the symbol to the next refresh bar, amounts of the same symbol are netted.
+
+        Args:
+            symbol(string): symbol
+            amount(int): positive to buy and negative to sell
+        """
+        if symbol not in self.symbol_index:
+            raise KeyError(symbol)
+        self.pending[symbol] = self.pending.get(symbol, 0) + amount
+
+    def fill_pending(self, cursor):
+        """
+        Fill the queued orders at the close price of the bar, orders of symbols without a bar are dropped.
+
+        Args:
+            cursor(int): bar index
+
+        Returns:
+            list of TradeView: filled trades
+        """
+        pending, self.pending = self.pending, dict()
+        return [trade for symbol, amount in pending.items() for trade in self.fill(symbol, amount, cursor)]
+
+    def run(self):
+        """
+        Run the backtest: initialize once, handle_data on refresh bars before they close and post_trading_day
+        after each trading day, when the portfolio is marked to market at the last bar of the day. Orders
+        queued by post_trading_day fill at the next refresh bar, those still queued at the end are dropped.
+
+        Returns:
+            dict: trading_days, portfolio_value, margin_cash, positions of shape (days, symbols) and trades
+        """
+        config = self.config
+        context = Context(self)
+        handle_data, post_trading_day = config['handle_data'], config['post_trading_day']
+        config['initialize'](context)
+        days = range(self.start_day, self.end_day)
+        portfolio_value, margin_cash = np.zeros(len(days)), np.zeros(len(days))
+        positions = np.zeros((len(days), len(self.universe)))
+        for index, day in enumerate(days):
+            context.current_date = self.trading_days[day]
+            context.closed = False
+            for cursor in self.refresh_bars(day):
+                context.cursor = cursor
+                if self.pending:
+                    self.fill_pending(cursor)
+                handle_data(context)
+            context.cursor, context.closed = self.day_offsets[day + 1] - 1, True
+            post_trading_day(context)
+            self.mark_to_market(context.cursor)
+            portfolio_value[index] = self.portfolio.portfolio_value
+            margin_cash[index] = self.portfolio.margin_cash
+            positions[index] = self.portfolio.positions.long_amount - self.portfolio.positions.short_amount
+        return {
+            'trading_days': self.trading_days[self.start_day:self.end_day],
+            'portfolio_value': portfolio_value,
+            'margin_cash': margin_cash,
+            'positions': positions,
+            'trades': self.trades
+        }
+
+
+__all__ = [
+    'BacktestEngine',
+    'Context'
+]
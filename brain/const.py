@@ -40,6 +40,7 @@ SYMBOL_PATTERN_STOCK = '[036]\d{5}\.(XSHE|XSHG)'
 SYMBOL_PATTERN_BASE_FUTURES = '[A-Z]{1,2}\d{3,4}$'
 SYMBOL_PATTERN_FUTURE_PRODUCT = '^[A-Z]{1,2}'
 SYMBOL_PATTERN_CONTINUOUS_FUTURES = '[A-Z]{1,2}(M0|M1|N0|N1|P0|P1|L0|L1|L3|L6)$'
+SYMBOL_PATTERN_MAIN_CONTINUOUS_FUTURES = '[A-Z]{1,2}M0$'
 SYMBOL_PATTERN_INDEX = '(\d{6}.ZICN|000\d{3}.XSHG|399\d{3}.XSHE|[A-Z0-9]{2,}\.(?!(XSHG|XSHE|OFCN)))'
 SYMBOL_PATTERN_HS_INDEX = '(\d{6}.ZICN|000\d{3}.XSHG|399\d{3}.XSHE)'
 SYMBOL_PATTERN_FUND = '([15]\d{5}\.(XSHE|XSHG)|\d{6}\.OFCN)\d{0,1}'
@@ -61,6 +62,8 @@ FUTURES_EXCHANGE_MAP = {'Futures.CHINA': 'all',
 STOCK_PATTERN = re.compile(SYMBOL_PATTERN_STOCK)
 BASE_FUTURES_PATTERN = re.compile(SYMBOL_PATTERN_BASE_FUTURES)
 CONTINUOUS_FUTURES_PATTERN = re.compile(SYMBOL_PATTERN_CONTINUOUS_FUTURES)
+MAIN_CONTINUOUS_FUTURES_PATTERN = re.compile(SYMBOL_PATTERN_MAIN_CONTINUOUS_FUTURES)
+FUTURE_PRODUCT_PATTERN = re.compile(SYMBOL_PATTERN_FUTURE_PRODUCT)
 INDEX_PATTERN = re.compile(SYMBOL_PATTERN_INDEX)
 HS_INDEX_PATTERN = re.compile(SYMBOL_PATTERN_HS_INDEX)
 NH_FUTURE_INDEX_PATTERN = re.compile(SYMBOL_PATTERN_NH_FUTURE_INDEX)
@@ -72,6 +75,10 @@ FUTURES_DAILY_FIELDS = ['tradeDate', 'openPrice', 'highPrice', 'lowPrice', 'clos
                         'volume', 'openInterest', 'preSettlementPrice', 'turnoverVol', 'turnoverValue']
 FUTURES_MINUTE_FIELDS = ['tradeDate', 'clearingDate', 'barTime', 'openPrice', 'highPrice', 'lowPrice',
                          'closePrice', 'volume', 'tradeTime', 'turnoverVol', 'turnoverValue', 'openInterest']
+BAR_QUOTE_DAILY_FIELDS = ['openPrice', 'highPrice', 'lowPrice', 'closePrice', 'settlementPrice',
+                          'volume', 'openInterest', 'preSettlementPrice', 'turnoverVol', 'turnoverValue']
+BAR_QUOTE_MINUTE_FIELDS = ['openPrice', 'highPrice', 'lowPrice', 'closePrice',
+                           'volume', 'turnoverVol', 'turnoverValue', 'openInterest']
 
 
 ADJ_FACTOR = 'default_adj_factor'
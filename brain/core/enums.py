@@ -4,6 +4,7 @@
 #     File: Enums.
 # **********************************************************************************#
 """
+from collections.abc import Hashable
 
 
 class BaseEnums(object):
@@ -34,4 +35,13 @@ class BaseEnums(object):
         Returns:
             boolean: belongs or not
         """
-        return value in cls.__dict__.values()
+        values = cls.__dict__.get('_values')
+        if values is None:
+            values = frozenset(value for name, value in vars(cls).items()
+                               if not name.startswith('_') and not isinstance(value, (classmethod, staticmethod))
+                               and isinstance(value, Hashable))
+            setattr(cls, '_values', values)
+        try:
+            return value in values
+        except TypeError:
+            return False
@@ -0,0 +1,493 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Bar store.
+#     Desc: local columnar bar store of memory-mapped arrays, shared by processes
+#           through the page cache.
+# **********************************************************************************#
+"""
+import os
+import time
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from . import database_api
+from . continuous import ContinuousContractBuilder
+from .. const import (
+    CONTINUOUS_FUTURES_PATTERN,
+    MAIN_CONTINUOUS_FUTURES_PATTERN,
+    BAR_QUOTE_DAILY_FIELDS,
+    BAR_QUOTE_MINUTE_FIELDS
+)
+
+
+DEFAULT_BAR_STORE_ROOT = os.environ.get('METABRAIN_BAR_STORE',
+                                        os.path.join(os.path.expanduser('~'), '.metabrain', 'bar_store'))
+INDEX_DATES = '_dates'
+INDEX_OFFSETS = '_offsets'
+INDEX_TIMES = '_times'
+VERSION_FILE = '_version'
+STACK_PREFIX = '_stack_'
+MINUTE_INDEX_FIELDS = ['tradeDate', 'clearingDate', 'barTime', 'tradeTime']
+
+
+def _to_dates(trading_days):
+    """
+    Normalize trading days to a sorted datetime64[D] array.
+
+    Args:
+        trading_days(list of datetime or string): trading days
+
+    Returns:
+        array: dates
+    """
+    return np.sort(pd.to_datetime(pd.Index(list(trading_days))).values.astype('datetime64[D]'))
+
+
+def _empty(dtype):
+    """
+    Missing value of the dtype: NaT for times, empty string for strings and NaN otherwise.
+    """
+    if dtype.kind == 'M':
+        return np.datetime64('NaT', 'm')
+    return '' if dtype.kind == 'U' else np.nan
+
+
+def _gather(values, offsets, day_index):
+    """
+    Gather bars of the selected days.
+
+    Args:
+        values(array): bar values
+        offsets(array): bar offsets of days, length days + 1
+        day_index(array): selected day positions
+
+    Returns:
+        array: bars of selected days
+    """
+    starts, ends = offsets[:-1][day_index], offsets[1:][day_index]
+    if not len(starts):
+        return values[:0]
+    take = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+    return values[take]
+
+
+class BarStore(object):
+    """
+    Local columnar bar store.
+
+    * One memory-mapped .npy file per (symbol, frequency, field): {root}/{freq}/{symbol}/{version}/{field}.npy
+    * A small index per (symbol, frequency): _dates.npy (trading days), _offsets.npy (first bar
+      of each day, length days + 1) and _times.npy (bar times, minute frequencies only).
+    * Each write publishes a new version directory by replacing the _version file atomically, so
+      readers resolving the version once see the fields and the index of the same write.
+    """
+    def __init__(self, root=None):
+        """
+        Args:
+            root(string): store root directory
+        """
+        self.root = root or DEFAULT_BAR_STORE_ROOT
+        self._memmaps = dict()
+
+    def fields(self, symbol, freq='d'):
+        """
+        Stored fields of the symbol.
+
+        Args:
+            symbol(string): symbol
+            freq(string): frequency
+
+        Returns:
+            list: field names
+        """
+        return self._fields(self._directory(symbol, freq))
+
+    @staticmethod
+    def _fields(directory):
+        """
+        Fields stored in the version directory.
+        """
+        if not os.path.isdir(directory):
+            return list()
+        return sorted(_[:-4] for _ in os.listdir(directory) if _.endswith('.npy') and not _.startswith('_'))
+
+    @staticmethod
+    def _arrays(directory):
+        """
+        Arrays of bars stored in the version directory, fields and index fields such as _times.
+        """
+        if not os.path.isdir(directory):
+            return list()
+        return [_[:-4] for _ in os.listdir(directory) if _.endswith('.npy') and
+                _[:-4] not in (INDEX_DATES, INDEX_OFFSETS) and not _.startswith(STACK_PREFIX)]
+
+    def dates(self, symbol, freq='d'):
+        """
+        Stored trading days of the symbol.
+
+        Args:
+            symbol(string): symbol
+            freq(string): frequency
+
+        Returns:
+            array: datetime64[D] array
+        """
+        dates = self._load(symbol, freq, INDEX_DATES)
+        return np.empty(0, dtype='datetime64[D]') if dates is None else dates
+
+    def covers(self, symbol, trading_days, fields, freq='d'):
+        """
+        Whether all trading days and fields of the symbol are stored.
+
+        Args:
+            symbol(string): symbol
+            trading_days(list of datetime): trading days
+            fields(list of string): fields
+            freq(string): frequency
+
+        Returns:
+            boolean: covered or not
+        """
+        dates = _to_dates(trading_days)
+        return set(fields).issubset(self.fields(symbol, freq)) and bool(np.isin(dates, self.dates(symbol, freq)).all())
+
+    def read(self, symbol, fields=None, freq='d', start=None, end=None):
+        """
+        Read bars between start and end as read-only memory-mapped views.
+
+        Args:
+            symbol(string): symbol
+            fields(list of string): fields, all stored fields by default
+            freq(string): frequency
+            start(datetime or string): start trading day
+            end(datetime or string): end trading day
+
+        Returns:
+            dict, array, array: bar dict of views, trading days and bar offsets of days (relative)
+        """
+        directory = self._directory(symbol, freq)
+        fields = fields or self._fields(directory)
+        dates = self._load(symbol, freq, INDEX_DATES, directory)
+        offsets = self._load(symbol, freq, INDEX_OFFSETS, directory)
+        begin, stop = self._day_range(dates, start, end)
+        bar_begin, bar_stop = offsets[begin], offsets[stop]
+        bar_dict = {field: self._load(symbol, freq, field, directory)[bar_begin:bar_stop] for field in fields}
+        return bar_dict, dates[begin:stop], offsets[begin:stop + 1] - bar_begin
+
+    def stacked(self, symbol, trading_days, fields=None, freq='d'):
+        """
+        History bars of the fields as one read-only (fields, bars) view of a memory-mapped array,
+        filled from the data api if not stored yet. The stacked array is saved once per stored
+        version and field list, so windows over all fields are views of the page cache.
+
+        Args:
+            symbol(string): symbol
+            trading_days(list of datetime): trading days
+            fields(list of string): numeric fields
+            freq(string): frequency
+
+        Returns:
+            array, array: bars of shape (fields, bars) and bar times
+        """
+        fields = list(fields or (BAR_QUOTE_DAILY_FIELDS if freq == 'd' else BAR_QUOTE_MINUTE_FIELDS))
+        self.fill(symbol, trading_days, fields, freq=freq)
+        dates = _to_dates(trading_days)
+        directory = self._directory(symbol, freq)
+        name = STACK_PREFIX + hashlib.md5('\n'.join(fields).encode('utf-8')).hexdigest()
+        bars = self._load(symbol, freq, name, directory)
+        if bars is None:
+            self._save(directory, name, np.vstack([self._load(symbol, freq, _, directory) for _ in fields]))
+            bars = self._load(symbol, freq, name, directory)
+        stored_dates = self._load(symbol, freq, INDEX_DATES, directory)
+        offsets = self._load(symbol, freq, INDEX_OFFSETS, directory)
+        begin, stop = self._day_range(stored_dates, dates[0], dates[-1])
+        bar_begin, bar_stop = offsets[begin], offsets[stop]
+        if freq == 'd':
+            times = stored_dates[begin:stop]
+        else:
+            times = self._load(symbol, freq, INDEX_TIMES, directory)[bar_begin:bar_stop]
+        return bars[:, bar_begin:bar_stop], times
+
+    def times(self, symbol, freq='m', start=None, end=None):
+        """
+        Bar times between start and end, dates for daily frequency.
+
+        Args:
+            symbol(string): symbol
+            freq(string): frequency
+            start(datetime or string): start trading day
+            end(datetime or string): end trading day
+
+        Returns:
+            array: datetime64 array
+        """
+        if freq == 'd':
+            dates = self.dates(symbol, freq)
+            begin, stop = self._day_range(dates, start, end)
+            return dates[begin:stop]
+        return self.read(symbol, fields=[INDEX_TIMES], freq=freq, start=start, end=end)[0][INDEX_TIMES]
+
+    def write(self, symbol, bar_dict, trading_days, freq='d', offsets=None, times=None):
+        """
+        Write bars of trading days, merged with the stored days, incoming days override stored ones.
+        All fields and the index are written to a new version directory, published at once.
+
+        Args:
+            symbol(string): symbol
+            bar_dict(dict): key-->field, value-->bar values of all trading days, strings are kept as
+                            strings, e.g. index fields prefixed by '_', other values are stored as floats
+            trading_days(list of datetime): trading days
+            freq(string): frequency
+            offsets(array): first bar of each day, length days + 1, one bar per day by default
+            times(array): bar times, minute frequencies only
+        """
+        dates = _to_dates(trading_days)
+        offsets = np.arange(len(dates) + 1) if offsets is None else np.asarray(offsets, dtype=np.int64)
+        columns = dict()
+        for field, values in bar_dict.items():
+            values = np.asarray(values)
+            columns[field] = values if values.dtype.kind == 'U' else values.astype(np.float64)
+        if times is not None:
+            columns[INDEX_TIMES] = np.asarray(times, dtype='datetime64[m]')
+        directory = self._directory(symbol, freq)
+        stored_dates = self._load(symbol, freq, INDEX_DATES, directory)
+        stored_dates = np.empty(0, dtype='datetime64[D]') if stored_dates is None else stored_dates
+        keep = ~np.isin(stored_dates, dates)
+        if stored_dates.size:
+            stored_offsets = self._load(symbol, freq, INDEX_OFFSETS, directory)
+            stored_size = stored_offsets[-1]
+            fields = set(columns) | set(self._arrays(directory))
+            day_index = np.flatnonzero(keep)
+            merged_dates = np.concatenate([stored_dates[keep], dates])
+            order = np.argsort(merged_dates, kind='stable')
+            lengths = np.concatenate([np.diff(stored_offsets)[keep], np.diff(offsets)])[order]
+            merged_offsets = np.concatenate([[0], np.cumsum(lengths)])
+            for field in fields:
+                stored, values = self._load(symbol, freq, field, directory), columns.get(field)
+                if stored is None:
+                    stored = np.full(stored_size, _empty(values.dtype))
+                if values is None:
+                    values = np.full(offsets[-1], _empty(stored.dtype), dtype=stored.dtype)
+                old_values = _gather(stored, stored_offsets, day_index)
+                old_offsets = np.concatenate([[0], np.cumsum(np.diff(stored_offsets)[keep])])
+                all_values = np.concatenate([old_values, values])
+                all_offsets = np.concatenate([old_offsets[:-1], offsets + old_offsets[-1]])
+                columns[field] = _gather(all_values, all_offsets, order)
+            dates, offsets = merged_dates[order], merged_offsets
+        columns[INDEX_OFFSETS], columns[INDEX_DATES] = offsets, dates
+        self._publish(symbol, freq, columns, directory)
+
+    def history(self, symbol, trading_days, fields=None, freq='d'):
+        """
+        History bars of the symbol, filled from the data api if not stored yet.
+
+        Args:
+            symbol(string): symbol
+            trading_days(list of datetime): trading days
+            fields(list of string): numeric fields
+            freq(string): frequency
+
+        Returns:
+            dict, array: bar dict of memory-mapped views and bar times
+        """
+        fields = list(fields or (BAR_QUOTE_DAILY_FIELDS if freq == 'd' else BAR_QUOTE_MINUTE_FIELDS))
+        bars, times = self.stacked(symbol, trading_days, fields=fields, freq=freq)
+        return {field: bars[index] for index, field in enumerate(fields)}, times
+
+    def fill(self, universe, trading_days, fields, freq='d'):
+        """
+        Fill the store from load_futures_daily_data / load_futures_minute_data for symbols not covered.
+
+        Args:
+            universe(string or list): symbols
+            trading_days(list of datetime): trading days
+            fields(list of string): numeric fields
+            freq(string): frequency
+        """
+        universe = [universe] if isinstance(universe, str) else list(universe)
+        missing = [_ for _ in universe if not self.covers(_, trading_days, fields, freq=freq)]
+        if not missing:
+            return
+        dates = _to_dates(trading_days)
+        if freq == 'd':
+            data = database_api.load_futures_daily_data(missing, trading_days, attributes=fields)
+            for symbol in missing:
+                bar_dict = dict()
+                for field in fields:
+                    frame = data.get(field)
+                    if frame is None or symbol not in frame:
+                        bar_dict[field] = np.full(len(dates), np.nan)
+                        continue
+                    series = frame[symbol].copy()
+                    series.index = pd.to_datetime(series.index).values.astype('datetime64[D]')
+                    bar_dict[field] = series.reindex(dates).to_numpy(dtype=np.float64)
+                self.write(symbol, bar_dict, dates, freq=freq)
+        else:
+            data = database_api.load_futures_minute_data(missing, trading_days, field=fields + ['tradeTime'], freq=freq)
+            for symbol in missing:
+                times = [np.asarray(_, dtype='datetime64[m]') for _ in data['tradeTime'][symbol]]
+                offsets = np.concatenate([[0], np.cumsum([len(_) for _ in times])])
+                bar_dict = {field: np.concatenate([np.asarray(_, dtype=np.float64) for _ in data[field][symbol]])
+                            for field in fields}
+                self.write(symbol, bar_dict, dates, freq=freq, offsets=offsets, times=np.concatenate(times))
+
+    def load_futures_daily_data(self, universe, trading_days, attributes=None, adjust='ratio'):
+        """
+        Store backed version of database_api.load_futures_daily_data, with the same output.
+        Main continuous symbols such as RBM0 are built by ContinuousContractBuilder, other
+        continuous symbols are filtered.
+
+        Args:
+            universe(list): universe symbols list
+            trading_days(list): trading days list
+            attributes(string or list): numeric attribute fields
+            adjust(string): back-adjustment method of main continuous symbols, 'ratio', 'difference' or None
+
+        Returns:
+            dict: key-->attribute, value-->DataFrame
+        """
+        universe = list(filter(lambda x: MAIN_CONTINUOUS_FUTURES_PATTERN.match(x) or
+                               not CONTINUOUS_FUTURES_PATTERN.match(x), universe))
+        attributes = attributes or BAR_QUOTE_DAILY_FIELDS
+        attributes = attributes.split() if isinstance(attributes, str) else list(attributes)
+        attributes = [_ for _ in attributes if _ != 'tradeDate']
+        continuous = [_ for _ in universe if MAIN_CONTINUOUS_FUTURES_PATTERN.match(_)]
+        self.fill([_ for _ in universe if _ not in continuous], trading_days, attributes, freq='d')
+        builder = ContinuousContractBuilder(self, method=adjust)
+        series = {symbol: builder.build(symbol, trading_days, fields=attributes)['bars'] for symbol in continuous}
+        dates = _to_dates(trading_days)
+        index = pd.Index([str(_) for _ in dates], name='tradeDate')
+        directories = {symbol: self._directory(symbol, 'd') for symbol in universe}
+        positions = {symbol: np.searchsorted(self._load(symbol, 'd', INDEX_DATES, directories[symbol]), dates)
+                     for symbol in universe if symbol not in series}
+        return {attribute: pd.DataFrame({symbol: series[symbol][attribute] if symbol in series else
+                                         self._load(symbol, 'd', attribute, directories[symbol])[positions[symbol]]
+                                         for symbol in universe}, index=index, columns=universe)
+                for attribute in attributes}
+
+    def load_futures_minute_data(self, universe=None, trading_days=None, field=None, freq='m'):
+        """
+        Store backed version of database_api.load_futures_minute_data, with the same output.
+        Numeric fields are views of the memory-mapped files, time fields are derived from the index.
+
+        Args:
+            universe(list of str): futures universe list
+            trading_days(list of datetime.datetime): trading days list
+            field(list of string): needed fields
+            freq(string): frequency string
+
+        Returns:
+            dict of str=>DataFrame: key-->field，value-->DataFrame
+        """
+        universe = list(filter(lambda x: not CONTINUOUS_FUTURES_PATTERN.match(x), universe))
+        field = field or database_api.FUTURES_MINUTE_FIELDS
+        numeric_fields = [_ for _ in field if _ not in MINUTE_INDEX_FIELDS]
+        self.fill(universe, trading_days, numeric_fields, freq=freq)
+        dates = _to_dates(trading_days)
+        index = [str(_) for _ in dates]
+        cells = {_: dict() for _ in field}
+        for symbol in universe:
+            directory = self._directory(symbol, freq)
+            stored_dates = self._load(symbol, freq, INDEX_DATES, directory)
+            offsets = self._load(symbol, freq, INDEX_OFFSETS, directory)
+            day_index = np.searchsorted(stored_dates, dates)
+            columns = {_: self._load(symbol, freq, _, directory) for _ in numeric_fields}
+            times = self._load(symbol, freq, INDEX_TIMES, directory)
+            for name in field:
+                day_cells = list()
+                for date, position in zip(index, day_index):
+                    start, end = offsets[position], offsets[position + 1]
+                    if name in columns:
+                        day_cells.append(columns[name][start:end])
+                        continue
+                    strings = np.datetime_as_string(times[start:end]).astype(object)
+                    if name == 'tradeTime':
+                        day_cells.append(np.array([_.replace('T', ' ') for _ in strings]))
+                    elif name == 'barTime':
+                        day_cells.append(np.array([_[11:] for _ in strings]))
+                    elif name == 'tradeDate':
+                        day_cells.append(np.array([_[:10] for _ in strings]))
+                    else:
+                        day_cells.append(np.array([date] * (end - start)))
+                cells[name][symbol] = day_cells
+        return {name: pd.DataFrame(values, index=index, columns=universe) for name, values in cells.items()}
+
+    @staticmethod
+    def _day_range(dates, start=None, end=None):
+        """
+        Positions of the first and after the last stored day between start and end.
+        """
+        begin = 0 if start is None else int(np.searchsorted(dates, _to_dates([start])[0], side='left'))
+        stop = len(dates) if end is None else int(np.searchsorted(dates, _to_dates([end])[0], side='right'))
+        return begin, stop
+
+    def _directory(self, symbol, freq):
+        """
+        Directory of the published version of the symbol, the symbol directory itself if unversioned.
+        """
+        base = os.path.join(self.root, freq, symbol)
+        try:
+            with open(os.path.join(base, VERSION_FILE)) as version_file:
+                return os.path.join(base, version_file.read().strip())
+        except OSError:
+            return base
+
+    def _load(self, symbol, freq, name, directory=None):
+        """
+        Load the stored array of the published or given version as a read-only memory map,
+        cached until the file is replaced.
+        """
+        path = os.path.join(directory or self._directory(symbol, freq), '{}.npy'.format(name))
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        version = (file_stat.st_ino, file_stat.st_mtime_ns)
+        cached = self._memmaps.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, np.load(path, mmap_mode='r'))
+            self._memmaps[path] = cached
+        return cached[1]
+
+    @staticmethod
+    def _save(directory, name, array):
+        """
+        Save array atomically.
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, '{}.npy'.format(name))
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as temp_file:
+            np.save(temp_file, np.ascontiguousarray(array))
+        os.replace(temp_path, path)
+
+    def _publish(self, symbol, freq, arrays, previous):
+        """
+        Save arrays to a new version directory and publish it by replacing the version file.
+        The previous version is kept for readers still resolving it, earlier versions are removed.
+        """
+        base = os.path.join(self.root, freq, symbol)
+        version = 'v{:020d}.{}'.format(time.time_ns(), os.getpid())
+        directory = os.path.join(base, version)
+        for name, array in arrays.items():
+            self._save(directory, name, array)
+        temp_path = os.path.join(base, '{}.{}.tmp'.format(VERSION_FILE, os.getpid()))
+        with open(temp_path, 'w') as version_file:
+            version_file.write(version)
+        os.replace(temp_path, os.path.join(base, VERSION_FILE))
+        # 首次写入时 previous 为未分版本的品种目录本身, 不做清理
+        previous = os.path.basename(previous) if os.path.normpath(previous) != os.path.normpath(base) else ''
+        if previous.startswith('v'):
+            for name in os.listdir(base):
+                if name.startswith('v') and name < previous and os.path.isdir(os.path.join(base, name)):
+                    shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+        self._memmaps = {path: cached for path, cached in self._memmaps.items()
+                         if not path.startswith(base + os.sep) or path.startswith(directory + os.sep)}
+
+
+__all__ = [
+    'BarStore'
+]
@@ -0,0 +1,204 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Continuous contract.
+#     Desc: continuous main contract series stitched from the main contracts of each day,
+#           cached in the bar store with the main contract of each day.
+# **********************************************************************************#
+"""
+import numpy as np
+import pandas as pd
+from . import database_api
+from .. const import (
+    FUTURE_PRODUCT_PATTERN,
+    BAR_QUOTE_DAILY_FIELDS
+)
+
+
+INDEX_CONTRACTS = '_contracts'
+PRE_MAIN_CLOSE = 'preMainClose'
+ADJUSTED_FIELDS = ['openPrice', 'highPrice', 'lowPrice', 'closePrice', 'settlementPrice', 'preSettlementPrice']
+ADJUST_METHODS = ['ratio', 'difference', None]
+
+
+def _to_dates(trading_days):
+    """
+    Normalize trading days to a sorted datetime64[D] array.
+    """
+    return np.sort(pd.to_datetime(pd.Index(list(trading_days))).values.astype('datetime64[D]'))
+
+
+def _to_datetimes(dates):
+    """
+    Dates as datetime.datetime list, the input of the database api loaders.
+    """
+    return list(pd.to_datetime(dates).to_pydatetime())
+
+
+def roll_index(contracts):
+    """
+    Positions of the days whose main contract differs from the previous day.
+
+    Args:
+        contracts(array): main contract of each day
+
+    Returns:
+        array: roll positions
+    """
+    contracts = np.asarray(contracts)
+    return np.flatnonzero(contracts[1:] != contracts[:-1]) + 1
+
+
+def adjust_factors(close_price, pre_main_close, method='ratio'):
+    """
+    Back-adjustment factors of each day, so that the last day keeps raw prices.
+
+    Each day contributes the close of its main contract on the previous day against the close of the
+    previous main contract, which is 1 (ratio) or 0 (difference) except on roll days, and the factor
+    of a day accumulates the contributions of all later days.
+
+    Args:
+        close_price(array): close price of the main contract of each day
+        pre_main_close(array): close price of the main contract of each day on the previous day
+        method(string): 'ratio' to multiply prices, 'difference' to add to prices
+
+    Returns:
+        array: factors of each day
+    """
+    size = len(close_price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'ratio':
+            daily = np.asarray(pre_main_close[1:], dtype=np.float64) / close_price[:-1]
+            daily[~np.isfinite(daily)] = 1.
+            factors = np.ones(size)
+            factors[:-1] = np.cumprod(daily[::-1])[::-1]
+        else:
+            daily = np.asarray(pre_main_close[1:], dtype=np.float64) - close_price[:-1]
+            daily[np.isnan(daily)] = 0.
+            factors = np.zeros(size)
+            factors[:-1] = np.cumsum(daily[::-1])[::-1]
+    return factors
+
+
+class ContinuousContractBuilder(object):
+    """
+    Builder of continuous main contract series, such as RBM0.
+
+    Raw bars of the main contract of each day and the close of that contract on the previous day are
+    stitched once and cached in the bar store under the continuous symbol, with the main contract of
+    each day as the _contracts index written in the same version. Only days not cached yet and the
+    cached days right after them are stitched, all days if a field is new. Back-adjustment is applied
+    on read over the requested days in a few array operations.
+    """
+    def __init__(self, bar_store, method='ratio'):
+        """
+        Args:
+            bar_store(BarStore): bar store caching the stitched series and the bars of underlying contracts
+            method(string): back-adjustment method, 'ratio', 'difference' or None for raw prices
+        """
+        if method not in ADJUST_METHODS:
+            raise ValueError('Exception in "ContinuousContractBuilder": method must be one of {}!'
+                             .format(ADJUST_METHODS))
+        self.bar_store = bar_store
+        self.method = method
+
+    def build(self, symbol, trading_days, fields=None):
+        """
+        Continuous series of the symbol, stitching the days not cached yet.
+
+        Args:
+            symbol(string): continuous symbol, such as RBM0
+            trading_days(list of datetime): trading days
+            fields(list of string): numeric bar fields
+
+        Returns:
+            dict: bars(key-->field, value-->adjusted array), dates, contracts, roll_index and factors
+        """
+        store = self.bar_store
+        fields = [_ for _ in (fields or BAR_QUOTE_DAILY_FIELDS) if _ != 'tradeDate']
+        stored_fields = list(dict.fromkeys(fields + ['closePrice', PRE_MAIN_CLOSE]))
+        dates = _to_dates(trading_days)
+        stitched = self._stitched_days(symbol, dates, stored_fields)
+        if stitched.size:
+            # 已缓存的其他字段一并拼接, 避免覆盖的日期丢失它们
+            stitched_fields = set(stored_fields) | set(store.fields(symbol, 'd'))
+            self._stitch(symbol, stitched, sorted(stitched_fields - {PRE_MAIN_CLOSE}))
+        raw, stored_dates, _ = store.read(symbol, fields=stored_fields + [INDEX_CONTRACTS], freq='d')
+        positions = np.searchsorted(stored_dates, dates)
+        contracts = raw[INDEX_CONTRACTS][positions]
+        raw = {field: raw[field][positions] for field in stored_fields}
+        if self.method is None:
+            factors = np.ones(len(dates))
+        else:
+            factors = adjust_factors(raw['closePrice'], raw[PRE_MAIN_CLOSE], method=self.method)
+        bars = dict()
+        for field in fields:
+            if field not in ADJUSTED_FIELDS or self.method is None:
+                bars[field] = raw[field]
+            elif self.method == 'ratio':
+                bars[field] = raw[field] * factors
+            else:
+                bars[field] = raw[field] + factors
+        return {
+            'bars': bars,
+            'dates': dates,
+            'contracts': contracts,
+            'roll_index': roll_index(contracts),
+            'factors': factors
+        }
+
+    def _stitched_days(self, symbol, dates, fields):
+        """
+        Days to stitch: all days if a field is not cached yet, otherwise the days not cached yet and
+        the cached days right after them, whose previous day and so preMainClose change.
+        """
+        store = self.bar_store
+        stored_dates = store.dates(symbol, 'd')
+        if not set(fields).issubset(store.fields(symbol, 'd')):
+            return np.union1d(stored_dates, dates)
+        missing = dates[~np.isin(dates, stored_dates)]
+        if not missing.size:
+            return missing
+        all_dates = np.union1d(stored_dates, missing)
+        following = all_dates[np.minimum(np.searchsorted(all_dates, missing) + 1, len(all_dates) - 1)]
+        return np.union1d(missing, following[np.isin(following, stored_dates)])
+
+    def _stitch(self, symbol, dates, fields):
+        """
+        Stitch raw bars of the main contracts of dates and merge them into the cache, the main
+        contract of each day is written with the bars as the _contracts index.
+        """
+        store = self.bar_store
+        all_dates = np.union1d(store.dates(symbol, 'd'), dates)
+        previous = all_dates[np.maximum(np.searchsorted(all_dates, dates) - 1, 0)]
+        product = FUTURE_PRODUCT_PATTERN.match(symbol).group()
+        main = database_api.load_futures_main_contract([product], trading_days=_to_datetimes(dates))[product]
+        main.index = pd.to_datetime(main.index).values.astype('datetime64[D]')
+        contracts = main.reindex(dates).fillna('').to_numpy(dtype=str)
+        tickers = sorted(set(contracts) - {''})
+        load_days = np.union1d(dates, previous)
+        data = store.load_futures_daily_data(tickers, _to_datetimes(load_days), attributes=fields) \
+            if tickers else dict()
+        # 按(日期, 合约)取值, 一次索引拼接所有字段
+        ticker_index = np.searchsorted(tickers, contracts) if tickers else np.zeros(len(dates), dtype=np.int64)
+        day_index, previous_index = np.searchsorted(load_days, dates), np.searchsorted(load_days, previous)
+        valid = contracts != ''
+        bar_dict = dict()
+        for field in fields + [PRE_MAIN_CLOSE]:
+            frame = data.get('closePrice' if field == PRE_MAIN_CLOSE else field)
+            if frame is None:
+                bar_dict[field] = np.full(len(dates), np.nan)
+                continue
+            values = frame[tickers].to_numpy(dtype=np.float64)
+            rows = previous_index if field == PRE_MAIN_CLOSE else day_index
+            bar_dict[field] = np.where(valid, values[rows, np.minimum(ticker_index, len(tickers) - 1)], np.nan)
+        bar_dict[PRE_MAIN_CLOSE] = np.where(previous < dates, bar_dict[PRE_MAIN_CLOSE], np.nan)
+        bar_dict[INDEX_CONTRACTS] = contracts.astype('<U16')
+        store.write(symbol, bar_dict, dates, freq='d')
+
+
+__all__ = [
+    'ContinuousContractBuilder',
+    'adjust_factors',
+    'roll_index'
+]
@@ -83,7 +83,7 @@ def get_trading_days(start, end):
     return list(map(lambda x: normalize_date(x['calendarDate']), filter(lambda x: x['isOpen'] == 1, data)))
 
 
-def get_direct_trading_day(date, step, forward):
+def get_direct_trading_day(date, step, forward, calendar=None):
     """
     Get direct trading day.
 
@@ -91,9 +91,12 @@ def get_direct_trading_day(date, step, forward):
         date(string or datetime):
         step:
         forward:
+        calendar(TradingCalendar): loaded trading calendar, shift on it without request if given
 
     Returns:
     """
+    if calendar is not None:
+        return calendar.shift(date, step, forward)
     if step > 50:
         raise Exception('step can only be less than 20.')
     date = normalize_date(date)
@@ -106,7 +109,7 @@ def get_direct_trading_day(date, step, forward):
     return target_trading_days[target_index]
 
 
-def load_futures_daily_data(universe, trading_days, attributes=None):
+def load_futures_daily_data(universe, trading_days, attributes=None, bar_store=None):
     """
     Load futures daily data.
 
@@ -119,9 +122,12 @@ def load_futures_daily_data(universe, trading_days, attributes=None):
                  u'openPrice', u'highestPrice', u'lowestPrice', u'closePrice',
                  u'settlePrice', u'turnoverVol', u'turnoverValue', u'openInt', u'CHG',
                  u'CHG1', u'CHGPct', u'mainCon', u'smainCon']
+        bar_store(BarStore): local bar store, read from it and fill it with symbols not stored yet
     Returns:
         dict: key-->attribute, value-->DataFrame
     """
+    if bar_store is not None:
+        return bar_store.load_futures_daily_data(universe, trading_days, attributes=attributes)
     universe = list(filter(lambda x: not CONTINUOUS_FUTURES_PATTERN.match(x), universe))
     attributes = attributes or FUTURES_DAILY_FIELDS
     trading_days = sorted([trading_day.strftime("%Y%m%d") for trading_day in trading_days])
@@ -179,7 +185,7 @@ def load_futures_daily_data(universe, trading_days, attributes=None):
     return data_all
 
 
-def load_futures_minute_data(universe=None, trading_days=None, field=None, freq='m'):
+def load_futures_minute_data(universe=None, trading_days=None, field=None, freq='m', bar_store=None):
     """
     Load futures minute data concurrently.
     Available data: closePrice, highPrice, lowPrice, openPrice, turnoverVol, clearingDate, barTime, tradeDate
@@ -189,6 +195,7 @@ def load_futures_minute_data(universe=None, trading_days=None, field=None, freq=
         trading_days(list of datetime.datetime): trading days list
         field(list of string): needed fields
         freq(string): frequency string
+        bar_store(BarStore): local bar store, read from it and fill it with symbols not stored yet
 
     Returns:
         dict of str=>DataFrame: key-->field，value-->DataFrame
@@ -199,6 +206,8 @@ def load_futures_minute_data(universe=None, trading_days=None, field=None, freq=
         >> equity_data = load_minute_futures_data(universe, trading_days, ['closePrice'])
 
     """
+    if bar_store is not None:
+        return bar_store.load_futures_minute_data(universe, trading_days, field=field, freq=freq)
     universe = list(filter(lambda x: not CONTINUOUS_FUTURES_PATTERN.match(x), universe))
     field = field or FUTURES_MINUTE_FIELDS
     trading_days_index = [dt.strftime("%Y-%m-%d") for dt in trading_days]
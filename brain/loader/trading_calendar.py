@@ -0,0 +1,105 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Trading calendar.
+#     Desc: integer index over the full trading calendar, loaded once.
+# **********************************************************************************#
+"""
+import numpy as np
+import pandas as pd
+from . import database_api
+
+
+def _to_datetime64(date):
+    """
+    Normalize date or dates to datetime64[D].
+    """
+    return np.array(pd.to_datetime(date), dtype='datetime64[D]')
+
+
+class TradingCalendar(object):
+    """
+    Trading calendar as a sorted datetime64[D] array, date lookups are binary searches
+    and day shifts are integer offsets, with no request after loading.
+    """
+    def __init__(self, trading_days):
+        """
+        Args:
+            trading_days(list of datetime or string): trading days
+        """
+        self.dates = np.unique(_to_datetime64(list(trading_days)))
+
+    @classmethod
+    def load(cls, start, end):
+        """
+        Load the trading calendar between start and end by one request.
+
+        Args:
+            start(string or datetime): start date
+            end(string or datetime): end date
+
+        Returns:
+            TradingCalendar: instance
+        """
+        return cls(database_api.get_trading_days(start, end))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def index(self, date):
+        """
+        Index of the first trading day not earlier than date.
+
+        Args:
+            date(string or datetime or array): date or dates
+
+        Returns:
+            int or array: index
+        """
+        return np.searchsorted(self.dates, _to_datetime64(date), side='left')[()]
+
+    def trading_day(self, index):
+        """
+        Trading day at index.
+
+        Args:
+            index(int): index
+
+        Returns:
+            datetime: trading day
+        """
+        return pd.Timestamp(self.dates[index]).to_pydatetime()
+
+    def shift(self, date, step, forward=True):
+        """
+        Trading day `step` days after or before date, the same as get_direct_trading_day.
+
+        Args:
+            date(string or datetime): date
+            step(int): number of trading days
+            forward(boolean): shift forward or backward
+
+        Returns:
+            datetime: trading day
+        """
+        return self.trading_day(self.index(date) + (1 if forward else -1) * step)
+
+    def trading_days(self, start=None, end=None):
+        """
+        Trading days between start and end, both inclusive.
+
+        Args:
+            start(string or datetime): start date
+            end(string or datetime): end date
+
+        Returns:
+            array: datetime64[D] trading days
+        """
+        begin = 0 if start is None else self.index(start)
+        stop = len(self.dates) if end is None else np.searchsorted(self.dates, _to_datetime64(end), side='right')
+        return self.dates[begin:stop]
+
+
+__all__ = [
+    'TradingCalendar'
+]
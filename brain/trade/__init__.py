@@ -4,22 +4,36 @@
 #     File:
 # **********************************************************************************#
 """
+from . backtest import BacktestResult, backtest_signals
 from . cost import Commission, Slippage
+from . matching import OrderMatcher
 from . position import (
     LongShortPosition,
-    FuturesPosition
+    FuturesPosition,
+    PositionEvaluation,
+    evaluate_positions
 )
+from . settlement import SettlementEngine
 from . trade import (
     Trade,
     MetaTrade
 )
+from . trade_book import TradeBook, TradeView
 
 
 __all__ = [
+    'BacktestResult',
+    'backtest_signals',
     'Commission',
     'Slippage',
+    'OrderMatcher',
     'LongShortPosition',
     'FuturesPosition',
+    'PositionEvaluation',
+    'evaluate_positions',
+    'SettlementEngine',
     'Trade',
-    'MetaTrade'
+    'MetaTrade',
+    'TradeBook',
+    'TradeView'
 ]
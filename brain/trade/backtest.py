@@ -0,0 +1,202 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Vectorized signal backtest.
+# **********************************************************************************#
+"""
+import numpy as np
+from . position import evaluate_positions
+from .. core.objects import SlottedObject
+
+
+class BacktestResult(SlottedObject):
+    """
+    Signal backtest result, each field is an array of shape (signals, bars) or (bars,) for one signal.
+    """
+    __slots__ = [
+        'position',
+        'trades',
+        'long_cost',
+        'short_cost',
+        'realized_pnl',
+        'float_pnl',
+        'margin',
+        'margin_cash',
+        'equity'
+    ]
+
+    def __init__(self, position=None, trades=None, long_cost=None, short_cost=None, realized_pnl=None,
+                 float_pnl=None, margin=None, margin_cash=None, equity=None):
+        """
+        Args:
+            position(array): net position after each bar
+            trades(array): net traded amount of each bar
+            long_cost(array): long average cost after each bar
+            short_cost(array): short average cost after each bar
+            realized_pnl(array): profit and loss of closed amount against average cost of each bar
+            float_pnl(array): floating profit of holding position after each bar, FuturesPosition.profit
+            margin(array): total margin after each bar
+            margin_cash(array): margin cash after each bar
+            equity(array): portfolio value after each bar
+        """
+        super(BacktestResult, self).__init__()
+        self.position = position
+        self.trades = trades
+        self.long_cost = long_cost
+        self.short_cost = short_cost
+        self.realized_pnl = realized_pnl
+        self.float_pnl = float_pnl
+        self.margin = margin
+        self.margin_cash = margin_cash
+        self.equity = equity
+
+
+def _evaluate(price, long_amount, short_amount, long_cost, short_cost, value, multiplier):
+    """
+    Floating earning added by FuturesPosition.evaluate and the evaluated position value.
+    """
+    evaluation = evaluate_positions(price, long_amount, short_amount, long_cost, short_cost, value, multiplier)
+    return evaluation.float_pnl_added, evaluation.value
+
+
+def _average_cost(opened, amount, original_amount, price):
+    """
+    Average cost after each bar, the only recurrence of the accounting, stepped over bars with opens only.
+    """
+    # 按bar逐列递推, 转置为(bars, signals)使每列连续
+    opened_bars, amount_bars, original_bars = opened.T.copy(), amount.T.copy(), original_amount.T.copy()
+    costs = np.zeros(opened_bars.shape)
+    current = np.zeros(opened.shape[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for bar in np.flatnonzero(opened_bars.any(axis=1)):
+            cost = (current * original_bars[bar] + (amount_bars[bar] - original_bars[bar]) * price[bar]) / \
+                amount_bars[bar]
+            np.copyto(current, cost, where=opened_bars[bar])
+            costs[bar] = current
+    bars = np.arange(opened.shape[1])
+    last_open = np.maximum.accumulate(np.where(opened, bars, 0), axis=1)
+    return np.where(amount > 0, np.take_along_axis(costs.T, last_open, axis=1), 0.)
+
+
+def _shift(array):
+    """
+    Values of the previous bar, zero before the first bar.
+    """
+    shifted = np.zeros(array.shape)
+    shifted[:, 1:] = array[:, :-1]
+    return shifted
+
+
+def _trade_added(price, previous_price, long_amount, short_amount, previous_long, previous_short,
+                 long_cost, short_cost, previous_long_cost, previous_short_cost, previous_value, multiplier):
+    """
+    Portfolio value added by the close trade and the open trade of traded bars, in the order of
+    FuturesPosition.update, inputs are arrays of the traded bars.
+    """
+    m = multiplier
+    close_long = np.maximum(previous_long - long_amount, 0.)
+    close_short = np.maximum(previous_short - short_amount, 0.)
+    long_left, short_left = previous_long - close_long, previous_short - close_short
+    closed = (close_long > 0) | (close_short > 0)
+    opened = (long_amount > long_left) | (short_amount > short_left)
+    # 先处理平仓盈亏, 再更新持仓浮动盈亏增量
+    direction = np.where(close_long > 0, -1., 1.)
+    close_amount = close_long + close_short
+    close_pnl = -direction * (price - previous_price) * close_amount * m
+    trade_mv = -direction * close_amount * m
+    value = previous_value - np.where(close_long > 0, previous_price, price) * trade_mv
+    float_pnl, evaluated_value = _evaluate(price, long_left, short_left, previous_long_cost, previous_short_cost,
+                                           value, m)
+    close_added = np.where(closed, close_pnl + float_pnl, 0.)
+    value = np.where(closed, evaluated_value, previous_value)
+    # 开仓前更新持仓浮动盈亏
+    float_pnl, _ = _evaluate(price, long_left, short_left, np.where(long_left == 0, 0., previous_long_cost),
+                             np.where(short_left == 0, 0., previous_short_cost), value, m)
+    open_added = np.where(opened, float_pnl, 0.)
+    realized_pnl = (close_long * (price - previous_long_cost) + close_short * (previous_short_cost - price)) * m
+    return close_added, open_added, realized_pnl
+
+
+def backtest_signals(prices, signals, margin_cash=1e6, multiplier=1, margin_rate=1.):
+    """
+    Backtest target position signals in numpy passes over all bars, following the accounting of
+    FuturesPosition.update and FuturesPosition.evaluate: starting flat, on each bar the position is traded
+    to the signal at the close price, closing before opening, and then evaluated at the close price.
+
+    Args:
+        prices(array): close prices of shape (bars,)
+        signals(array): target net positions in contracts, of shape (bars,) or (signals, bars)
+        margin_cash(float): initial margin cash
+        multiplier(float): contract multiplier
+        margin_rate(float): contract margin rate
+
+    Returns:
+        BacktestResult: backtest result
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    signals = np.asarray(signals, dtype=np.float64)
+    single = signals.ndim == 1
+    signals = np.atleast_2d(signals)
+    m = multiplier
+    long_amount = np.maximum(signals, 0.)
+    short_amount = np.maximum(-signals, 0.)
+    previous_long, previous_short = _shift(long_amount), _shift(short_amount)
+    long_cost = _average_cost(long_amount > previous_long, long_amount, previous_long, prices)
+    short_cost = _average_cost(short_amount > previous_short, short_amount, previous_short, prices)
+    long_market_value = prices * long_amount * m
+    short_market_value = prices * short_amount * m
+    value = long_market_value - short_market_value
+    previous_value = _shift(value)
+    trades = signals - _shift(signals)
+
+    # 未成交的bar只按收盘价估值, 成交的bar按平仓、开仓、估值的顺序计算
+    evaluate_added = value - previous_value
+    flat_value = previous_value == 0
+    if flat_value.any():
+        rows, bars = np.nonzero(flat_value)
+        cost_value = m * (long_cost[rows, bars] * long_amount[rows, bars] -
+                          short_cost[rows, bars] * short_amount[rows, bars])
+        evaluate_added[rows, bars] = value[rows, bars] - cost_value
+    rows, bars = np.nonzero(trades)
+    evaluate_added[rows, bars] = 0.
+    previous_bars = np.maximum(bars - 1, 0)
+    first_bar = bars == 0
+    close_added, open_added, realized = _trade_added(
+        prices[bars], np.where(first_bar, 0., prices[previous_bars]),
+        long_amount[rows, bars], short_amount[rows, bars],
+        previous_long[rows, bars], previous_short[rows, bars],
+        long_cost[rows, bars], short_cost[rows, bars],
+        np.where(first_bar, 0., long_cost[rows, previous_bars]),
+        np.where(first_bar, 0., short_cost[rows, previous_bars]),
+        previous_value[rows, bars], m)
+
+    # 按成交顺序逐笔累加, 与逐bar更新组合价值的浮点结果一致
+    added = np.zeros((signals.shape[0], 3 * signals.shape[1] + 1))
+    added[:, 0] = margin_cash
+    added[:, 3::3] = evaluate_added
+    added[rows, 3 * bars + 1] = close_added
+    added[rows, 3 * bars + 2] = open_added
+    equity = np.cumsum(added, axis=1)[:, 3::3]
+    realized_pnl = np.zeros(signals.shape)
+    realized_pnl[rows, bars] = realized
+    margin = long_market_value * margin_rate + short_market_value * margin_rate
+    result = {
+        'position': signals,
+        'trades': trades,
+        'long_cost': long_cost,
+        'short_cost': short_cost,
+        'realized_pnl': realized_pnl,
+        'float_pnl': value - m * (long_cost * long_amount - short_cost * short_amount),
+        'margin': margin,
+        'margin_cash': equity - margin,
+        'equity': equity
+    }
+    if single:
+        result = {key: value[0] for key, value in result.items()}
+    return BacktestResult(**result)
+
+
+__all__ = [
+    'BacktestResult',
+    'backtest_signals'
+]
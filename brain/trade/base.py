@@ -15,3 +15,24 @@ class SecuritiesType(BaseEnums):
     futures = 'futures'
 
     ALL = [futures]
+
+
+class OrderType(BaseEnums):
+    """
+    Order type
+    """
+    market = 'market'
+    limit = 'limit'
+    stop = 'stop'
+
+    ALL = [market, limit, stop]
+
+
+class FillRule(BaseEnums):
+    """
+    Price rule of market orders filled on a bar
+    """
+    open = 'open'
+    close = 'close'
+
+    ALL = [open, close]
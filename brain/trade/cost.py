@@ -5,6 +5,7 @@
 #   Author: Myron
 # **********************************************************************************#
 """
+import numpy as np
 
 
 class Commission(object):
@@ -80,6 +81,24 @@ class Commission(object):
         else:
             return cost
 
+    def calculate_futures_commissions(self, market_value, offset):
+        """
+        批量计算期货手续费, 与calculate_futures_commission逐笔计算结果一致
+        Args:
+            market_value (array): 市值, 0表示未成交
+            offset (array): 开平标志, 1为开仓, -1为平仓
+        Returns:
+            array: 手续费成本
+        Examples:
+            >> commission = Commission()
+            >> commission.calculate_futures_commissions(np.array([10000.00, 0.]), np.array([1, -1]))
+        """
+        cost = np.where(np.asarray(offset) == 1, self.buycost, self.sellcost)
+        if self.unit == 'perValue':
+            return cost * market_value
+        else:
+            return np.where(np.asarray(market_value) != 0, cost, 0.)
+
     def calculate_otc_fund_commission(self, cash, order_type='purchase'):
         """
         计算场外基金手续费
@@ -182,6 +201,25 @@ class Slippage(object):
         else:
             return self.value
 
+    def calculate_futures_slippages(self, market_value):
+        """
+        批量计算期货滑点, 与calculate_futures_slippage逐笔计算结果一致
+
+        Args:
+            market_value (array): 市值, 0表示未成交
+
+        Returns:
+            array: 滑点成本
+
+        Examples:
+            >> slippage = Slippage()
+            >> slippage.calculate_futures_slippages(np.array([10000.00, 0.]))
+        """
+        if self.unit == 'perValue':
+            return self.value * np.asarray(market_value, dtype=np.float64)
+        else:
+            return np.where(np.asarray(market_value) != 0, self.value, 0.)
+
     def calculate_index_slippage(self, market_value):
         """
         计算指数账户交易滑点
@@ -0,0 +1,275 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Bar-level order matching.
+# **********************************************************************************#
+"""
+import numpy as np
+from utils.exceptions import *
+from . base import OrderType, FillRule
+from . trade import Trade
+
+
+# 撮合优先级: 市价单, 触发的止损单, 限价单
+ORDER_TYPE_CODES = {
+    OrderType.market: 0,
+    OrderType.stop: 1,
+    OrderType.limit: 2
+}
+ORDER_COLUMNS = [
+    'order_id',
+    'symbol',
+    'direction',
+    'offset',
+    'amount',
+    'order_type',
+    'price'
+]
+
+
+class OrderMatcher(object):
+    """
+    Bar-level matching of queued market, limit and stop orders of a universe against OHLCV bars.
+
+    Resting orders are kept in columns and each bar triggers all of them in one vectorized pass.
+    With a volume limit, triggered orders are ranked by symbol, order type, price and time with
+    one lexsort and share the volume cap of their symbol through a cumulative sum, so matching
+    K resting orders costs O(K log K), only the filled orders are turned into Trade objects.
+
+    Fill prices:
+        market order: open or close price of the bar, by fill_rule
+        limit order: buy when low reaches the limit, at the limit price or the better open price,
+                     and vice versa for sell
+        stop order: buy when high reaches the stop, at the stop price or the worse open price,
+                    and vice versa for sell
+    """
+    def __init__(self, universe, fill_rule=FillRule.close, volume_limit=None, touch_fill=True,
+                 positions=None, commission=None, slippage=None, multiplier=None, margin_rate=None, capacity=64):
+        """
+        Args:
+            universe(list): symbols, bars are arrays aligned with them
+            fill_rule(string): price of market orders, FillRule.open or FillRule.close
+            volume_limit(float): maximum participation of bar volume of each symbol, unlimited if None
+            touch_fill(boolean): whether limit orders fill when the bar only touches the limit price,
+                                 otherwise the price should trade through the limit
+            positions(dict): key-->symbol, value-->FuturesPosition updated by the trades, close fills are
+                             capped by holdings and the rest of the order is canceled
+            commission(Commission): commission charged on trades, free if None
+            slippage(Slippage): slippage charged on trades, free if None
+            multiplier(float or dict): contract multiplier, or key-->symbol, value-->multiplier,
+                                       attribute of the position or 1 if not given
+            margin_rate(float or dict): contract margin rate, or key-->symbol, value-->margin rate,
+                                        attribute of the position or 1 if not given
+            capacity(int): initial number of order rows
+        """
+        if not FillRule.has_value(fill_rule):
+            raise Exceptions.INVALID_INITIALIZE_PARAMETERS
+        self.universe = list(universe)
+        self.symbol_index = {symbol: index for index, symbol in enumerate(self.universe)}
+        self.fill_rule = fill_rule
+        self.volume_limit = volume_limit
+        self.touch_fill = touch_fill
+        self.positions = positions
+        self.commission = commission
+        self.slippage = slippage
+        self.multiplier = multiplier
+        self.margin_rate = margin_rate
+        self.size = 0
+        self._next_id = 0
+        self._columns = {
+            'order_id': np.empty(capacity, dtype=np.int64),
+            'symbol': np.empty(capacity, dtype=np.int64),
+            'direction': np.empty(capacity, dtype=np.int64),
+            'offset': np.empty(capacity, dtype=np.int64),
+            'amount': np.empty(capacity, dtype=np.float64),
+            'order_type': np.empty(capacity, dtype=np.int64),
+            'price': np.empty(capacity, dtype=np.float64)
+        }
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, column):
+        """
+        Column of resting orders as a view, amount is the amount left to fill.
+        """
+        return self._columns[column][:self.size]
+
+    def submit(self, symbol, direction, offset_flag, amount, order_type=OrderType.market, price=None):
+        """
+        Queue an order, matched from the next bar on.
+
+        Args:
+            symbol(string): symbol
+            direction(int): 1 for buy and -1 for sell
+            offset_flag(string): 'open' or 'close'
+            amount(float): order amount
+            order_type(string): OrderType.market, OrderType.limit or OrderType.stop
+            price(float): limit or stop price
+
+        Returns:
+            int: order id
+        """
+        if not amount > 0 or order_type not in ORDER_TYPE_CODES or \
+                (order_type != OrderType.market and (price is None or np.isnan(price))):
+            raise Exceptions.INVALID_ORDER
+        if self.size == len(self._columns['order_id']):
+            for column, values in self._columns.items():
+                grown = np.empty(2 * len(values), dtype=values.dtype)
+                grown[:self.size] = values
+                self._columns[column] = grown
+        order_id = self._next_id
+        row = (order_id, self.symbol_index[symbol], direction, 1 if offset_flag == 'open' else -1, amount,
+               ORDER_TYPE_CODES[order_type], np.nan if price is None else price)
+        for column, value in zip(ORDER_COLUMNS, row):
+            self._columns[column][self.size] = value
+        self.size += 1
+        self._next_id += 1
+        return order_id
+
+    def cancel(self, order_id):
+        """
+        Cancel a resting order.
+
+        Args:
+            order_id(int): order id
+
+        Returns:
+            boolean: whether the order was resting
+        """
+        keep = self['order_id'] != order_id
+        canceled = not keep.all()
+        if canceled:
+            self._compact(keep)
+        return canceled
+
+    def _compact(self, keep):
+        """
+        Keep the masked orders in their queue order.
+        """
+        size = int(keep.sum())
+        for values in self._columns.values():
+            values[:size] = values[:self.size][keep]
+        self.size = size
+
+    def _triggered(self, open_price, high_price, low_price, close_price):
+        """
+        Indices and fill prices of orders triggered by the bar.
+        """
+        symbol, price = self['symbol'], self['price']
+        order_type, buy = self['order_type'], self['direction'] == 1
+        bar_open, high, low = open_price[symbol], high_price[symbol], low_price[symbol]
+        market_price = (open_price if self.fill_rule == FillRule.open else close_price)[symbol]
+        with np.errstate(invalid='ignore'):
+            tradable = ~(np.isnan(bar_open) | np.isnan(market_price))
+            limit_hit = np.where(buy, low < price, high > price)
+            if self.touch_fill:
+                limit_hit |= np.where(buy, low <= price, high >= price)
+            stop_hit = np.where(buy, high >= price, low <= price)
+        is_market = order_type == ORDER_TYPE_CODES[OrderType.market]
+        is_limit = order_type == ORDER_TYPE_CODES[OrderType.limit]
+        triggered = tradable & (is_market | np.where(is_limit, limit_hit, stop_hit))
+        # 限价单以限价或更优的开盘价成交, 止损单以止损价或更差的开盘价成交
+        better, worse = np.where(buy, np.fmin(bar_open, price), np.fmax(bar_open, price)), \
+            np.where(buy, np.fmax(bar_open, price), np.fmin(bar_open, price))
+        fill_price = np.where(is_market, market_price, np.where(is_limit, better, worse))
+        index = np.flatnonzero(triggered)
+        return index, fill_price[index]
+
+    def _volume_capped(self, index, volume):
+        """
+        Sort triggered orders by priority and cap their fills by the volume of each symbol.
+        """
+        symbol, order_type = self['symbol'][index], self['order_type'][index]
+        price = np.where(order_type == ORDER_TYPE_CODES[OrderType.limit],
+                         -self['direction'][index] * self['price'][index], 0.)
+        order = np.lexsort((self['order_id'][index], price, order_type, symbol))
+        symbol, amount = symbol[order], self['amount'][index][order]
+        capacity = np.floor(np.asarray(volume, dtype=np.float64) * self.volume_limit)[symbol]
+        accumulated = np.cumsum(amount) - amount
+        first = np.empty(symbol.size, dtype=bool)
+        first[:1] = True
+        first[1:] = symbol[1:] != symbol[:-1]
+        before = accumulated - np.maximum.accumulate(np.where(first, accumulated, 0.))
+        return order, np.clip(capacity - before, 0., amount)
+
+    def match(self, open_price, high_price, low_price, close_price, volume=None, filled_time=None):
+        """
+        Match resting orders against one bar of the universe, NaN prices mean no bar of the symbol.
+
+        Args:
+            open_price(array): open prices of shape (symbols,)
+            high_price(array): high prices of shape (symbols,)
+            low_price(array): low prices of shape (symbols,)
+            close_price(array): close prices of shape (symbols,)
+            volume(array): volumes of shape (symbols,), required by volume_limit
+            filled_time(object): filled time of trades
+
+        Returns:
+            list of Trade: trades in matching order
+        """
+        if not self.size:
+            return list()
+        index, fill_price = self._triggered(*[np.asarray(_, dtype=np.float64) for _ in
+                                              (open_price, high_price, low_price, close_price)])
+        if not index.size:
+            return list()
+        if self.volume_limit is None:
+            fill_amount = self['amount'][index]
+        else:
+            order, fill_amount = self._volume_capped(index, volume)
+            index, fill_price = index[order], fill_price[order]
+        filled = fill_amount > 0
+        index, fill_price, fill_amount = index[filled], fill_price[filled], fill_amount[filled]
+        amount, trades = self['amount'], list()
+        rows = zip(index.tolist(), self['order_id'][index].tolist(), self['symbol'][index].tolist(),
+                   self['direction'][index].tolist(), self['offset'][index].tolist(), fill_price.tolist(),
+                   fill_amount.tolist())
+        for row, order_id, symbol_index, direction, offset, price, quantity in rows:
+            symbol = self.universe[symbol_index]
+            offset_flag = 'open' if offset == 1 else 'close'
+            position = self.positions.get(symbol) if self.positions is not None else None
+            amount[row] -= quantity
+            if position is not None and offset == -1:
+                holding = position.long_amount if direction == -1 else position.short_amount
+                if holding < quantity:
+                    quantity, amount[row] = holding, 0.
+                if not quantity:
+                    continue
+            multiplier = self._contract(self.multiplier, 'multiplier', symbol, position)
+            trade = self._trade(order_id, symbol, direction, offset_flag, quantity, price, filled_time, multiplier)
+            if position is not None:
+                position.update(trade, multiplier, self._contract(self.margin_rate, 'margin_rate', symbol, position))
+            trades.append(trade)
+        self._compact(amount > 0)
+        return trades
+
+    @staticmethod
+    def _contract(override, field, symbol, position=None):
+        """
+        Contract parameter of a symbol, FuturesPosition.update does not store the given ones,
+        so the overrides take precedence over the attribute of the position.
+        """
+        if isinstance(override, dict):
+            override = override.get(symbol)
+        if override is not None:
+            return override
+        return getattr(position, field) if position is not None else 1
+
+    def _trade(self, order_id, symbol, direction, offset_flag, quantity, price, filled_time, multiplier=1):
+        """
+        Trade of a fill, with costs charged on its market value.
+        """
+        market_value = quantity * price * multiplier
+        commission = self.commission.calculate_futures_commission(market_value, offset_flag) \
+            if self.commission else 0
+        slippage = self.slippage.calculate_futures_slippage(market_value) if self.slippage else 0
+        return Trade(order_id=order_id, symbol=symbol, direction=direction, offset_flag=offset_flag,
+                     transact_amount=quantity, transact_price=price, filled_time=filled_time,
+                     commission=commission, slippage=slippage)
+
+
+__all__ = [
+    'OrderMatcher',
+    'ORDER_TYPE_CODES'
+]
@@ -9,6 +9,7 @@ from __future__ import division
 import numpy as np
 from utils.exceptions import *
 from . base import SecuritiesType
+from .. core.objects import SlottedObject
 
 
 def choose_position(security_type):
@@ -27,6 +28,82 @@ def choose_position(security_type):
     return position_obj
 
 
+class PositionEvaluation(SlottedObject):
+    """
+    Evaluated positions of a batch, each field is an array of shape (N,).
+    """
+    __slots__ = [
+        'long_margin',
+        'short_margin',
+        'profit',
+        'value',
+        'float_pnl_added',
+        'portfolio_value',
+        'margin_cash'
+    ]
+
+    def __init__(self, long_margin=None, short_margin=None, profit=None, value=None, float_pnl_added=None,
+                 portfolio_value=None, margin_cash=None):
+        """
+        Args:
+            long_margin(array): long margin
+            short_margin(array): short margin
+            profit(array): floating profit against average costs
+            value(array): evaluated position value
+            float_pnl_added(array): incremental floating earning
+            portfolio_value(array): portfolio value added by the floating earning, None if not given
+            margin_cash(array): portfolio value less total margin, None if portfolio value is not given
+        """
+        super(PositionEvaluation, self).__init__()
+        self.long_margin = long_margin
+        self.short_margin = short_margin
+        self.profit = profit
+        self.value = value
+        self.float_pnl_added = float_pnl_added
+        self.portfolio_value = portfolio_value
+        self.margin_cash = margin_cash
+
+
+def evaluate_positions(price, long_amount, short_amount, long_cost, short_cost, value,
+                       multiplier=1., margin_rate=1., portfolio_value=None):
+    """
+    Evaluate a batch of positions at once, element-wise the same float operations as
+    LongShortPosition.evaluate and PortfolioState.evaluate. Inputs are broadcast against each other.
+
+    Args:
+        price(float or array): reference price
+        long_amount(array): long amount
+        short_amount(array): short amount
+        long_cost(array): long average cost
+        short_cost(array): short average cost
+        value(array): position value of the last evaluation, zero falls back to the cost value
+        multiplier(float or array): contract multiplier
+        margin_rate(float or array): contract margin rate
+        portfolio_value(array): portfolio value before the evaluation, optional
+
+    Returns:
+        PositionEvaluation: evaluated positions
+    """
+    long_market_value = price * long_amount * multiplier
+    short_market_value = price * short_amount * multiplier
+    cost_value = multiplier * (long_cost * long_amount - short_cost * short_amount)
+    evaluated_value = long_market_value - short_market_value
+    float_pnl_added = evaluated_value - np.where(value == 0, cost_value, value)
+    long_margin = long_market_value * margin_rate
+    short_margin = short_market_value * margin_rate
+    margin_cash = None
+    if portfolio_value is not None:
+        portfolio_value = portfolio_value + float_pnl_added
+        margin_cash = portfolio_value - (long_margin + short_margin)
+    return PositionEvaluation(long_margin=long_margin,
+                              short_margin=short_margin,
+                              profit=evaluated_value - cost_value,
+                              value=evaluated_value,
+                              float_pnl_added=float_pnl_added,
+                              portfolio_value=portfolio_value,
+                              margin_cash=margin_cash)
+
+
 class LongShortPosition(object):
     """
     Long short position.
@@ -46,6 +123,21 @@ class LongShortPosition(object):
         'offset_profit'
     ]
 
+    checkpoint_fields = [
+        'symbol',
+        'price',
+        'long_amount',
+        'long_cost',
+        'short_amount',
+        'short_cost',
+        'long_margin',
+        'short_margin',
+        'value',
+        'profit',
+        'today_profit',
+        'offset_profit'
+    ]
+
     def __init__(self, symbol=0, price=0., long_amount=0, short_amount=0, long_margin=0,
                  short_margin=0, long_cost=0, short_cost=0, value=0, profit=0, today_profit=0,
                  offset_profit=0):
@@ -69,6 +161,36 @@ class LongShortPosition(object):
         """
         return self.long_margin + self.short_margin
 
+    def copy(self):
+        """
+        Slot-wise copy, much cheaper than deepcopy since all attributes are scalars.
+
+        Returns:
+            LongShortPosition: copied position
+        """
+        position = self.__class__.__new__(self.__class__)
+        position.restore(self.checkpoint())
+        return position
+
+    def checkpoint(self):
+        """
+        Checkpoint of current position as a flat tuple.
+
+        Returns:
+            tuple: attribute values in the order of checkpoint_fields
+        """
+        return tuple([getattr(self, attribute) for attribute in self.checkpoint_fields])
+
+    def restore(self, checkpoint):
+        """
+        Restore position from checkpoint in place.
+
+        Args:
+            checkpoint(tuple): checkpoint generated by self.checkpoint
+        """
+        for attribute, value in zip(self.checkpoint_fields, checkpoint):
+            setattr(self, attribute, value)
+
     def evaluate(self, price, multiplier=1., margin_rate=1.):
         """
         Update price, margin and profit, return the incremental floating earning.
@@ -185,6 +307,15 @@ class FuturesPosition(LongShortPosition):
     """
     Futures position.
     """
+    checkpoint_fields = LongShortPosition.checkpoint_fields + [
+        'today_long_open',
+        'today_short_open',
+        'pre_settlement_price',
+        'settlement_price',
+        'margin_rate',
+        'multiplier'
+    ]
+
     def __init__(self, symbol=None, price=None, long_amount=0, short_amount=0, long_margin=0, short_margin=0,
                  long_cost=0, short_cost=0, value=0, profit=0, today_long_open=0, today_short_open=0,
                  today_profit=0, offset_profit=0, pre_settlement_price=0, settlement_price=0,
@@ -0,0 +1,155 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Daily settlement.
+# **********************************************************************************#
+"""
+import numpy as np
+from . position import FuturesPosition, evaluate_positions
+
+
+class SettlementEngine(object):
+    """
+    Day-end settlement of a book of futures positions, whose attributes are kept in arrays of shape (N,),
+    one element for each position, so that the roll of a day is a few array operations.
+    """
+    settlement_fields = [
+        'price',
+        'long_amount',
+        'short_amount',
+        'long_cost',
+        'short_cost',
+        'long_margin',
+        'short_margin',
+        'value',
+        'profit',
+        'today_long_open',
+        'today_short_open',
+        'today_profit',
+        'pre_settlement_price',
+        'settlement_price',
+        'margin_rate',
+        'multiplier'
+    ]
+
+    def __init__(self, symbols=None, **arrays):
+        """
+        Args:
+            symbols(list): symbols of positions
+            **arrays(**dict): key-word arrays of settlement_fields, each of shape (N,)
+        """
+        size = len(symbols) if symbols is not None else \
+            max(np.size(arrays.get(field, 0)) for field in self.settlement_fields)
+        self.symbols = list(symbols) if symbols is not None else list(range(size))
+        for field in self.settlement_fields:
+            array = np.empty(size, dtype=np.float64)
+            array[:] = arrays.get(field, 1. if field in ('margin_rate', 'multiplier') else 0.)
+            setattr(self, field, array)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_positions(cls, positions, multiplier=None, margin_rate=None):
+        """
+        Gather positions of a book into arrays. FuturesPosition.update takes the multiplier and the
+        margin rate as arguments without storing them, so they can be given here as in evaluate_positions,
+        otherwise the attributes of positions are used.
+
+        Args:
+            positions(list or dict): FuturesPosition list, or dict of key-->symbol, value-->FuturesPosition
+            multiplier(float, array or dict): contract multiplier, or key-->symbol, value-->multiplier
+            margin_rate(float, array or dict): contract margin rate, or key-->symbol, value-->margin rate
+
+        Returns:
+            SettlementEngine: instance
+        """
+        if isinstance(positions, dict):
+            positions = list(positions.values())
+        arrays = {field: [getattr(position, field) or 0. for position in positions]
+                  for field in cls.settlement_fields}
+        for field, override in (('multiplier', multiplier), ('margin_rate', margin_rate)):
+            if isinstance(override, dict):
+                arrays[field] = [override.get(position.symbol, value) for position, value in
+                                 zip(positions, arrays[field])]
+            elif override is not None:
+                arrays[field] = override
+        return cls(symbols=[position.symbol for position in positions], **arrays)
+
+    def to_positions(self, positions=None):
+        """
+        Scatter arrays back to positions.
+
+        Args:
+            positions(list or dict): FuturesPosition list or dict to update in place, new positions if None
+
+        Returns:
+            list or dict: positions
+        """
+        if positions is None:
+            positions = [FuturesPosition(symbol=symbol) for symbol in self.symbols]
+        items = positions.values() if isinstance(positions, dict) else positions
+        columns = [getattr(self, field).tolist() for field in self.settlement_fields]
+        for position, values in zip(items, zip(*columns)):
+            for field, value in zip(self.settlement_fields, values):
+                setattr(position, field, value)
+        return positions
+
+    def settle(self, settlement_price):
+        """
+        Run the day-end roll: positions are evaluated at the settlement price the same way as
+        FuturesPosition.evaluate, margins are recomputed, the settlement price becomes the
+        pre-settlement price of the next day and today fields are reset.
+
+        Args:
+            settlement_price(array): settlement prices of shape (N,), NaN keeps the last price
+
+        Returns:
+            array: profit of the day, today_profit before the roll plus the floating earning added
+                   at the settlement price, to be added to portfolio values
+        """
+        settlement_price = np.asarray(settlement_price, dtype=np.float64)
+        settlement_price = np.where(np.isnan(settlement_price), self.price, settlement_price)
+        evaluation = evaluate_positions(settlement_price, self.long_amount, self.short_amount,
+                                        self.long_cost, self.short_cost, self.value,
+                                        self.multiplier, self.margin_rate)
+        day_profit = self.today_profit + evaluation.float_pnl_added
+        self.price[:] = settlement_price
+        self.long_margin[:] = evaluation.long_margin
+        self.short_margin[:] = evaluation.short_margin
+        self.profit[:] = evaluation.profit
+        self.value[:] = evaluation.value
+        self.settlement_price[:] = settlement_price
+        self.pre_settlement_price[:] = settlement_price
+        self.today_long_open[:] = 0.
+        self.today_short_open[:] = 0.
+        self.today_profit[:] = 0.
+        return day_profit
+
+    def settle_days(self, settlement_prices):
+        """
+        Settle positions held through days, one roll per day.
+
+        Args:
+            settlement_prices(array): settlement prices of shape (days, N)
+
+        Returns:
+            array: profit of each day, of shape (days, N)
+        """
+        settlement_prices = np.asarray(settlement_prices, dtype=np.float64)
+        day_profits = np.empty(settlement_prices.shape)
+        for day, settlement_price in enumerate(settlement_prices):
+            day_profits[day] = self.settle(settlement_price)
+        return day_profits
+
+    @property
+    def total_margin(self):
+        """
+        Total margin of each position.
+        """
+        return self.long_margin + self.short_margin
+
+
+__all__ = [
+    'SettlementEngine'
+]
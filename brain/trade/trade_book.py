@@ -0,0 +1,400 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Trade book.
+#     Desc: append-only columnar store of trades.
+# **********************************************************************************#
+"""
+import numpy as np
+from datetime import datetime
+
+
+TRADE_BOOK_DTYPE = np.dtype([
+    ('order_id', np.int64),
+    ('symbol', np.int32),
+    ('portfolio_id', np.int32),
+    ('direction', np.int8),
+    ('offset_flag', np.int8),
+    ('transact_amount', np.float64),
+    ('transact_price', np.float64),
+    ('filled_time', 'datetime64[us]'),
+    ('commission', np.float64),
+    ('slippage', np.float64)
+])
+CATEGORICAL_FIELDS = ['symbol', 'portfolio_id']
+NO_ORDER_ID = -1
+OBJECT_ORDER_ID = -2
+OFFSET_FLAG_CODES = {'open': 1, 'close': -1, None: 0}
+OFFSET_FLAGS = {1: 'open', -1: 'close', 0: None}
+
+
+class TradeView(object):
+    """
+    Lightweight view of one trade of a trade book, with the attributes of Trade and MetaTrade.
+    """
+    __slots__ = ['book', 'row']
+
+    def __init__(self, book, row):
+        """
+        Args:
+            book(TradeBook): trade book
+            row(int): row of the trade
+        """
+        self.book = book
+        self.row = row
+
+    def __getattr__(self, attribute):
+        if attribute in TRADE_BOOK_DTYPE.names:
+            return self.book.value(self.row, attribute)
+        raise AttributeError(attribute)
+
+    def to_dict(self):
+        """
+        To dict, a copy of the stored values.
+        """
+        return {attribute: self.book.value(self.row, attribute) for attribute in TRADE_BOOK_DTYPE.names}
+
+    def to_mongodb_item(self):
+        """
+        To mongodb item
+        """
+        return self.to_dict()
+
+    def __repr__(self):
+        return "Trade(symbol: {}, direction: {}, offset_flag: {}, transact_amount: {}, transact_price: {}, " \
+               "filled_time: {}, commission: {}, slippage: {})"\
+            .format(self.symbol, self.direction, self.offset_flag, self.transact_amount, self.transact_price,
+                    self.filled_time, self.commission, self.slippage)
+
+
+class TradeBook(object):
+    """
+    Append-only columnar trade book: one structured array row per trade, of TRADE_BOOK_DTYPE.
+
+    Integer order ids are stored as they are and missing ones as -1, other order ids are kept apart
+    by row. symbol and portfolio_id are stored as categorical codes, offset flags as 1/-1, missing
+    commission and slippage as NaN and missing filled time as NaT, filled times are read back as
+    datetime. Rows grow by doubling, indexing the book returns TradeView objects and aggregations
+    by symbol or portfolio work on columns.
+    """
+    def __init__(self, capacity=1024):
+        """
+        Args:
+            capacity(int): initial number of rows
+        """
+        self.size = 0
+        self._rows = np.zeros(capacity, dtype=TRADE_BOOK_DTYPE)
+        self._categories = {field: list() for field in CATEGORICAL_FIELDS}
+        self._codes = {field: dict() for field in CATEGORICAL_FIELDS}
+        self._object_order_ids = dict()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        """
+        Trade view of a row, or the column of all rows as a view.
+        """
+        if isinstance(item, str):
+            return self._rows[item][:self.size]
+        row = range(self.size)[item]
+        return TradeView(self, row)
+
+    def __iter__(self):
+        return (TradeView(self, row) for row in range(self.size))
+
+    @property
+    def nbytes(self):
+        """
+        Bytes of the stored rows.
+        """
+        return self.size * TRADE_BOOK_DTYPE.itemsize
+
+    def categories(self, field):
+        """
+        Categories of a categorical field, indexed by code.
+
+        Args:
+            field(string): symbol or portfolio_id
+
+        Returns:
+            list: categories
+        """
+        return self._categories[field]
+
+    def _code(self, field, value):
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._categories[field])
+            self._categories[field].append(value)
+        return code
+
+    def _reserve(self, rows):
+        """
+        Make room for rows, doubling the rows if full.
+        """
+        required = self.size + rows
+        if required <= len(self._rows):
+            return
+        grown = np.zeros(max(required, 2 * len(self._rows)), dtype=TRADE_BOOK_DTYPE)
+        grown[:self.size] = self._rows[:self.size]
+        self._rows = grown
+
+    def _order_id(self, row, order_id):
+        """
+        Stored order id, integer order ids are stored as they are.
+        """
+        if order_id is None:
+            return NO_ORDER_ID
+        if isinstance(order_id, (int, np.integer)) and order_id >= 0:
+            return order_id
+        self._object_order_ids[row] = order_id
+        return OBJECT_ORDER_ID
+
+    def _row(self, row, order_id=None, symbol=None, direction=None, offset_flag=None, transact_amount=None,
+             transact_price=None, filled_time=None, commission=None, slippage=None, portfolio_id=None):
+        """
+        Stored row of trade attributes.
+        """
+        return (self._order_id(row, order_id), self._code('symbol', symbol),
+                self._code('portfolio_id', portfolio_id), direction or 0, OFFSET_FLAG_CODES[offset_flag],
+                np.nan if transact_amount is None else transact_amount,
+                np.nan if transact_price is None else transact_price,
+                np.datetime64('NaT') if filled_time is None else filled_time,
+                np.nan if commission is None else commission, np.nan if slippage is None else slippage)
+
+    def record(self, order_id=None, symbol=None, direction=None, offset_flag=None, transact_amount=None,
+               transact_price=None, filled_time=None, commission=None, slippage=None, portfolio_id=None):
+        """
+        Record one trade by its attributes, without creating a Trade object.
+
+        Args:
+            order_id(object): order id
+            symbol(string): symbol
+            direction(int): 1 for buy and -1 for sell
+            offset_flag(string): 'open' or 'close'
+            transact_amount(float): transact amount
+            transact_price(float): transact price
+            filled_time(datetime or string): filled time
+            commission(float): commission
+            slippage(float): slippage
+            portfolio_id(string): portfolio id of MetaTrade
+
+        Returns:
+            TradeView: recorded trade
+        """
+        self._reserve(1)
+        self._rows[self.size] = self._row(self.size, order_id, symbol, direction, offset_flag, transact_amount,
+                                          transact_price, filled_time, commission, slippage, portfolio_id)
+        self.size += 1
+        return TradeView(self, self.size - 1)
+
+    def append(self, trade):
+        """
+        Append a Trade or MetaTrade.
+
+        Args:
+            trade(Trade): trade
+        """
+        self.extend([trade])
+
+    def extend(self, trades):
+        """
+        Append Trade, MetaTrade or trade dict items in one block.
+
+        Args:
+            trades(list): trades
+        """
+        rows = list()
+        for trade in trades:
+            item = trade if isinstance(trade, dict) else trade.to_dict()
+            rows.append(self._row(self.size + len(rows),
+                                  **{key: value for key, value in item.items() if key in TRADE_BOOK_DTYPE.names}))
+        self._reserve(len(rows))
+        self._rows[self.size:self.size + len(rows)] = np.array(rows, dtype=TRADE_BOOK_DTYPE)
+        self.size += len(rows)
+
+    def value(self, row, field):
+        """
+        Stored value of a field of one trade, in the type of Trade attributes.
+
+        Args:
+            row(int): row
+            field(string): field
+
+        Returns:
+            object: value
+        """
+        value = self._rows[row][field]
+        if field in CATEGORICAL_FIELDS:
+            return self._categories[field][value]
+        if field == 'order_id':
+            return self._order_ids([int(value)], [row])[0]
+        if field == 'offset_flag':
+            return OFFSET_FLAGS[int(value)]
+        if field == 'direction':
+            return int(value)
+        if field == 'filled_time':
+            return None if np.isnat(value) else value.astype(datetime)
+        return None if np.isnan(value) else float(value)
+
+    def _order_ids(self, values, rows):
+        """
+        Order ids of stored values of rows.
+        """
+        return [value if value >= 0 else None if value == NO_ORDER_ID else self._object_order_ids[row]
+                for value, row in zip(values, rows)]
+
+    @classmethod
+    def from_query(cls, query_data):
+        """
+        Recover a trade book from query data in bulk.
+
+        Args:
+            query_data(list of dict): trade items, as MetaTrade.to_mongodb_item
+
+        Returns:
+            TradeBook: trade book
+        """
+        book = cls(capacity=max(len(query_data), 1))
+        book.extend(query_data)
+        return book
+
+    def to_mongodb_item(self):
+        """
+        To mongodb items in bulk, one dict per trade, with filled times as datetime.
+
+        Returns:
+            list of dict: trade items
+        """
+        columns = list()
+        for field in TRADE_BOOK_DTYPE.names:
+            values = self[field]
+            if field in CATEGORICAL_FIELDS:
+                categories = self._categories[field]
+                columns.append([categories[_] for _ in values.tolist()])
+            elif field == 'order_id':
+                columns.append(self._order_ids(values.tolist(), range(self.size)))
+            elif field == 'offset_flag':
+                columns.append([OFFSET_FLAGS[_] for _ in values.tolist()])
+            elif field == 'filled_time':
+                # datetime64[us] 转为 datetime, NaT 转为 None
+                columns.append(values.astype(datetime).tolist())
+            elif field == 'direction':
+                columns.append(values.tolist())
+            else:
+                columns.append([None if _ != _ else _ for _ in values.tolist()])
+        return [dict(zip(TRADE_BOOK_DTYPE.names, row)) for row in zip(*columns)]
+
+    def _multipliers(self, multiplier):
+        """
+        Multiplier of each trade, by symbol if a dict is given.
+        """
+        if not isinstance(multiplier, dict):
+            return multiplier
+        symbols = np.array([multiplier.get(_, 1.) for _ in self._categories['symbol']], dtype=np.float64)
+        return symbols[self['symbol']] if symbols.size else 1.
+
+    def _aggregate(self, values, by):
+        """
+        Sum values of trades by symbol or portfolio_id.
+        """
+        categories = self._categories[by]
+        sums = np.bincount(self[by], weights=values, minlength=len(categories))
+        return dict(zip(categories, sums.tolist()))
+
+    def turnover(self, by='symbol', multiplier=1.):
+        """
+        Traded market value by symbol or portfolio.
+
+        Args:
+            by(string): 'symbol' or 'portfolio_id'
+            multiplier(float or dict): contract multiplier, or key-->symbol, value-->multiplier
+
+        Returns:
+            dict: key-->symbol or portfolio id, value-->turnover
+        """
+        return self._aggregate(self['transact_amount'] * self['transact_price'] * self._multipliers(multiplier), by)
+
+    def costs(self, by='symbol'):
+        """
+        Commission and slippage by symbol or portfolio.
+
+        Args:
+            by(string): 'symbol' or 'portfolio_id'
+
+        Returns:
+            dict: key-->symbol or portfolio id, value-->costs
+        """
+        return self._aggregate(np.nan_to_num(self['commission']) + np.nan_to_num(self['slippage']), by)
+
+    def realized_pnl(self, by='symbol', multiplier=1.):
+        """
+        Realized profit and loss of close trades against the average open cost of each position,
+        the same as the realized_pnl of backtest_signals, by symbol or portfolio. Trades without
+        offset flag are skipped.
+
+        Rows are grouped by (portfolio, symbol, long short) with one stable sort. Holdings are group
+        cumsums floored at zero, and the opens between two closes are summed into one segment, whose
+        average cost only needs the previous one when it adds to a partly closed position.
+
+        Args:
+            by(string): 'symbol' or 'portfolio_id'
+            multiplier(float or dict): contract multiplier, or key-->symbol, value-->multiplier
+
+        Returns:
+            dict: key-->symbol or portfolio id, value-->realized profit and loss
+        """
+        pnl = np.zeros(self.size)
+        offset = self['offset_flag']
+        if (offset == -1).any():
+            rows = np.flatnonzero(offset != 0)
+            is_close = offset[rows] == -1
+            long_short = np.where(is_close, -self['direction'][rows], self['direction'][rows])
+            group = (self['portfolio_id'][rows].astype(np.int64) * len(self._categories['symbol']) +
+                     self['symbol'][rows]) * 2 + (long_short == 1)
+            order = np.argsort(group.astype(np.min_scalar_type(group.max())), kind='stable')
+            rows, is_close, long_short, group = rows[order], is_close[order], long_short[order], group[order]
+            amount, price = self['transact_amount'][rows], self['transact_price'][rows]
+            new_group = np.ones(rows.size, dtype=bool)
+            new_group[1:] = group[1:] != group[:-1]
+
+            # 组内持仓累计, 平仓超出持仓时归零
+            flow = np.where(is_close, -amount, amount)
+            holding = np.empty(rows.size)
+            bounds = np.flatnonzero(new_group).tolist() + [rows.size]
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                walk = np.cumsum(flow[start:end])
+                holding[start:end] = walk - np.minimum(np.minimum.accumulate(walk), 0.)
+            held = np.where(new_group, 0., np.roll(holding, 1))
+
+            # 每段为两笔平仓之间的连续开仓, 加仓到未平完的持仓上时依赖上一段的平均成本
+            starts = new_group.copy()
+            starts[1:] |= is_close[:-1]
+            segment = np.cumsum(starts) - 1
+            opened = np.bincount(segment, weights=np.where(is_close, 0., amount))
+            opened_value = np.bincount(segment, weights=np.where(is_close, 0., amount * price))
+            segment_held = held[starts]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cost = np.where(opened > 0, opened_value / opened, 0.)
+            last_open = np.maximum.accumulate(np.where(opened > 0, np.arange(opened.size), -1))
+            chained = np.flatnonzero((opened > 0) & (segment_held > 0))
+            if chained.size:
+                cost = cost.tolist()
+                for index, previous, position, open_amount, open_value in zip(
+                        chained.tolist(), last_open[chained - 1].tolist(), segment_held[chained].tolist(),
+                        opened[chained].tolist(), opened_value[chained].tolist()):
+                    cost[index] = (cost[previous] * position + open_value) / (position + open_amount)
+                cost = np.array(cost)
+
+            close = np.flatnonzero(is_close)
+            close_cost = np.where(held[close] > 0, cost[np.maximum(last_open[segment[close]], 0)], 0.)
+            pnl[rows[close]] = long_short[close] * (price[close] - close_cost) * amount[close]
+        return self._aggregate(pnl * self._multipliers(multiplier), by)
+
+__all__ = [
+    'TradeBook',
+    'TradeView',
+    'TRADE_BOOK_DTYPE'
+]
@@ -4,33 +4,65 @@
 #     File: Action space.
 # **********************************************************************************#
 """
-import random
+import numpy as np
 from gym import Space
 from . base import (
     LongShort,
-    TradingAction
+    TradingActionCode,
+    TRADING_ACTIONS,
+    TRADING_ACTION_CODES
 )
 
 
+LONG_SHORT_VALUES = np.array([LongShort.LONG, LongShort.SHORT])
+TRADING_ACTION_NAMES = np.array(TRADING_ACTIONS)
+
+
+def masked_choice(random_state, n, num_choices, mask=None):
+    """
+    Draw choices uniformly among the feasible ones.
+
+    Args:
+        random_state(Generator): random generator
+        n(int): number of draws
+        num_choices(int): number of choices
+        mask(array): feasibility mask of shape (num_choices,) or (n, num_choices), all feasible if None
+
+    Returns:
+        array: choice indices, -1 where no choice is feasible
+    """
+    if mask is None:
+        return random_state.integers(0, num_choices, size=n)
+    mask = np.broadcast_to(np.asarray(mask, dtype=bool), (n, num_choices))
+    counts = mask.sum(axis=-1)
+    ranks = (random_state.random(n) * counts).astype(np.int64)
+    choices = (np.cumsum(mask, axis=-1) > ranks[:, None]).argmax(axis=-1)
+    return np.where(counts > 0, choices, -1)
+
+
 class LongShortSpace(Space):
     """
     Long/short discrete space.
     """
-    def __init__(self):
-        super(LongShortSpace, self).__init__(dtype=int)
+    def __init__(self, seed=None):
+        super(LongShortSpace, self).__init__(dtype=int, seed=seed)
 
-    def sample(self):
+    def sample(self, n=None, mask=None):
         """
-        Generate random long short sample.
+        Generate random long short samples.
+
+        Args:
+            n(int): number of samples, one sample if None
+            mask(array): feasibility mask of [LONG, SHORT], of shape (2,) or (n, 2)
 
         Returns:
-            int: 1:LONG / -1:SHORT
+            int or array: 1:LONG / -1:SHORT, 0 where nothing is feasible
         """
-        sample_map = {
-            0: LongShort.LONG,
-            1: LongShort.SHORT
-        }
-        return sample_map[random.randint(0, 1)]
+        if n is None and mask is None:
+            return int(LONG_SHORT_VALUES[self.np_random.integers(len(LONG_SHORT_VALUES))])
+        choices = masked_choice(self.np_random, 1 if n is None else n, len(LONG_SHORT_VALUES), mask=mask)
+        samples = np.where(choices >= 0, LONG_SHORT_VALUES[choices], 0)
+        return int(samples[0]) if n is None else samples
 
     def contains(self, target):
         """
@@ -52,42 +84,125 @@ class TradingActionSpace(Space):
     """
     Trading action space.
     """
-    def __init__(self):
-        super(TradingActionSpace, self).__init__(dtype=str)
+    def __init__(self, seed=None):
+        super(TradingActionSpace, self).__init__(dtype=str, seed=seed)
+
+    def sample(self, n=None, mask=None, codes=False):
+        """
+        Generate random trading action samples.
+
+        Args:
+            n(int): number of samples, one sample if None
+            mask(array): feasibility mask indexed by action code, of shape (5,) or (n, 5)
+            codes(boolean): return action codes instead of action names
 
-    def sample(self):
+        Returns:
+            str or int or array: BUY/SELL/SHORT/COVER/FAIR, FAIR where nothing is feasible
+        """
+        if n is None and mask is None:
+            choice = int(self.np_random.integers(len(TRADING_ACTIONS)))
+            return choice if codes else TRADING_ACTIONS[choice]
+        choices = masked_choice(self.np_random, 1 if n is None else n, len(TRADING_ACTIONS), mask=mask)
+        choices = np.where(choices >= 0, choices, TradingActionCode.FAIR)
+        if n is None:
+            return int(choices[0]) if codes else TRADING_ACTIONS[choices[0]]
+        return choices if codes else TRADING_ACTION_NAMES[choices]
+
+    @staticmethod
+    def feasible_mask(state, price, change_percent=0.1):
         """
-        Generate random trading action sample.
+        Feasibility mask of trading actions on portfolio state, by the rules of trading_action_transition:
+        actions trading nothing are infeasible, except FAIR.
+
+        Args:
+            state(PortfolioState): portfolio state
+            price(float): current price
+            change_percent(float): position change percent
 
         Returns:
-            str: BUY/SELL/SHORT/COVER/FAIR
+            array: boolean mask indexed by action code
         """
-        sample_map = {
-            0: TradingAction.BUY,
-            1: TradingAction.SELL,
-            2: TradingAction.SHORT,
-            3: TradingAction.COVER,
-            4: TradingAction.FAIR
-        }
-        return sample_map[random.randint(0, 4)]
+        state = state.copy()
+        state.evaluate(price)
+        delta_cash = state.portfolio_value * change_percent
+        can_open = state.position_proportion <= 1 - change_percent and \
+            bool(state.feasible_open_quantity(margin_cash=delta_cash))
+        can_sell = bool(state.feasible_close_quantity(target_cash=delta_cash, long_short='long'))
+        can_cover = bool(state.feasible_close_quantity(target_cash=delta_cash, long_short='short'))
+        mask = np.ones(len(TRADING_ACTIONS), dtype=bool)
+        mask[TradingActionCode.BUY] = mask[TradingActionCode.SHORT] = can_open
+        mask[TradingActionCode.SELL] = can_sell
+        mask[TradingActionCode.COVER] = can_cover
+        return mask
 
     def contains(self, target):
         """
         Contains the target input or not.
 
         Args:
-            target(string): target action.
+            target(string or int): target action name or code.
 
         Returns:
             boolean: contains or not.
         """
-        return TradingAction.has_value(target)
+        try:
+            return target in TRADING_ACTION_CODES
+        except TypeError:
+            return False
 
     def __repr__(self):
         return "TradingActionSpace(BUY/SELL/SHORT/COVER/FAIR)"
 
 
+class TargetPositionSpace(Space):
+    """
+    Continuous target position space, an action is the target signed exposure: the margin
+    proportion of portfolio value held as long (positive) or short (negative) position.
+    """
+    def __init__(self, max_exposure=1., seed=None):
+        """
+        Args:
+            max_exposure(float): maximum absolute exposure
+            seed(int): random seed
+        """
+        super(TargetPositionSpace, self).__init__(shape=(), dtype=np.float64, seed=seed)
+        self.max_exposure = max_exposure
+
+    def sample(self, n=None):
+        """
+        Generate uniform random target exposures.
+
+        Args:
+            n(int): number of samples, one sample if None
+
+        Returns:
+            float or array: target exposures
+        """
+        samples = self.np_random.uniform(-self.max_exposure, self.max_exposure, size=n)
+        return float(samples) if n is None else samples
+
+    def contains(self, target):
+        """
+        Contains the target exposure or not.
+
+        Args:
+            target(float): target exposure.
+
+        Returns:
+            boolean: contains or not.
+        """
+        try:
+            return bool(-self.max_exposure <= target <= self.max_exposure)
+        except (TypeError, ValueError):
+            return False
+
+    def __repr__(self):
+        return "TargetPositionSpace([-{0}, {0}])".format(self.max_exposure)
+
+
 __all__ = [
     'LongShortSpace',
-    'TradingActionSpace'
+    'TradingActionSpace',
+    'TargetPositionSpace',
+    'masked_choice'
 ]
@@ -4,33 +4,166 @@
 #     File: Observer.
 # **********************************************************************************#
 """
+import numpy as np
+from utils.exceptions import *
 from .. loader.database_api import *
+from .. const import (
+    BAR_QUOTE_DAILY_FIELDS,
+    BAR_QUOTE_MINUTE_FIELDS
+)
 
 
 class BarQuote(object):
     """
     Observer who provide real-time observations.
+
+    History bars are kept in one contiguous float array of shape (fields, bars), each
+    observation is a view of the last `window` bars at the cursor, so no bar data is
+    copied while stepping or replaying episodes. Bars loaded from a BarStore are a (fields, bars)
+    view of its shared memory-mapped stacked file, so observations are views of the page cache.
+    Technical features of an attached FeatureEngine are updated incrementally on each push.
     """
-    def __init__(self, bar_dict=None):
+    def __init__(self, bar_dict=None, window=1, time_index=None, feature_engine=None, price_field='closePrice'):
         """
         Initialize the bar dict information.
 
         Args:
-            bar_dict(dict): bar dict
+            bar_dict(dict): bar dict, key-->field, value-->1-D history array
+            window(int): number of bars in each observation
+            time_index(array): bar time labels
+            feature_engine(FeatureEngine): feature engine of technical features
+            price_field(string): field of the trading and mark-to-market price
+        """
+        self.window = window
+        self.price_field = price_field
+        self.feature_engine = feature_engine
+        self.fields = list()
+        self.bars = np.empty((0, 0))
+        self.bar_dict = dict()
+        self._columns = list()
+        self.time_index = time_index
+        self.cursor = window - 2
+        if bar_dict:
+            self._set_bars(bar_dict, time_index=time_index)
+
+    def __len__(self):
+        return len(self._columns[0]) if self._columns else 0
+
+    def __copy__(self):
+        """
+        History arrays are read-only, copies share them and only own the cursor and feature state.
+        """
+        bar_quote = self.__class__.__new__(self.__class__)
+        bar_quote.__dict__.update(self.__dict__)
+        if self.feature_engine is not None:
+            bar_quote.feature_engine = self.feature_engine.copy()
+        return bar_quote
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    @property
+    def observation(self):
+        """
+        Observation of the last `window` bars at the cursor, shape (fields, window).
         """
-        self.bar_dict = bar_dict or dict()
+        start, end = self.cursor - self.window + 1, self.cursor + 1
+        return self.bars[:, start:end]
 
-    def load_history(self, **kwargs):
+    @property
+    def exhausted(self):
         """
-        Load data from history data.
+        Whether all history bars have been pushed.
+        """
+        return self.cursor >= len(self) - 1
+
+    @property
+    def features(self):
+        """
+        Technical features at the cursor, None if no feature engine is attached.
+        """
+        if self.feature_engine is None:
+            return None
+        return self.feature_engine.sync(self.bar_dict, self.cursor)
+
+    def feature_history(self):
+        """
+        Technical features of all history bars, shape (features, bars).
+
+        Returns:
+            array: feature values
+        """
+        return self.feature_engine.bulk(self.bar_dict)
+
+    def current(self, field=None):
+        """
+        Current bar value of the field.
 
         Args:
-            **kwargs:
+            field(string): field name, price_field by default
 
         Returns:
+            float: value
+        """
+        return self.bar_dict[field or self.price_field][self.cursor]
 
+    def load_history(self, data=None, symbol=None, trading_days=None, fields=None, freq='d', bar_store=None):
         """
-        self.bar_dict
+        Load data from history data, history is converted to arrays only once.
+
+        Args:
+            data(dict): output of load_futures_daily_data or load_futures_minute_data,
+                        loaded through them by symbol and trading_days if not given
+            symbol(string): futures symbol
+            trading_days(list of datetime): trading days
+            fields(list of string): numeric fields to load
+            freq(string): 'd' for daily data, otherwise minute data
+            bar_store(BarStore): local bar store, history is read from its memory-mapped files if given
+
+        Returns:
+            BarQuote: self
+        """
+        daily = freq == 'd'
+        fields = list(fields or (BAR_QUOTE_DAILY_FIELDS if daily else BAR_QUOTE_MINUTE_FIELDS))
+        if bar_store is not None:
+            bars, time_index = bar_store.stacked(symbol, trading_days, fields=fields, freq=freq)
+            self._set_bars(dict(zip(fields, bars)), time_index=time_index, bars=bars)
+            return self
+        if data is not None:
+            fields = [_ for _ in fields if _ in data]
+        elif daily:
+            data = load_futures_daily_data([symbol], trading_days, attributes=fields)
+        else:
+            data = load_futures_minute_data([symbol], trading_days, field=fields + ['tradeTime'], freq=freq)
+        if daily:
+            bar_dict = {field: data[field][symbol].to_numpy(dtype=np.float64) for field in fields}
+            time_index = data[fields[0]].index.to_numpy()
+        else:
+            bar_dict = {field: np.concatenate([np.asarray(_, dtype=np.float64) for _ in data[field][symbol]])
+                        for field in fields}
+            time_index = np.concatenate([np.asarray(_) for _ in data['tradeTime'][symbol]]) \
+                if 'tradeTime' in data else None
+        self._set_bars(bar_dict, time_index=time_index)
+        return self
+
+    def slice(self, start, end):
+        """
+        Bar quote of history bars in [start, end), sharing the history arrays without copy.
+
+        Args:
+            start(int): first bar index
+            end(int): end bar index, exclusive
+
+        Returns:
+            BarQuote: bar quote of the bars
+        """
+        bar_quote = self.__copy__()
+        bar_quote.bars = self.bars[:, start:end]
+        bar_quote.bar_dict = {field: bar_quote.bars[index] for index, field in enumerate(self.fields)}
+        bar_quote._columns = [bar_quote.bar_dict[_] for _ in self.fields]
+        bar_quote.time_index = self.time_index[start:end] if self.time_index is not None else None
+        bar_quote.cursor = self.window - 2
+        return bar_quote
 
     def push(self, **kwargs):
         """
@@ -42,18 +175,64 @@ class BarQuote(object):
         Returns:
             object: observation
         """
-        raise NotImplementedError
+        if self.exhausted:
+            raise Exceptions.BAR_QUOTE_EXHAUSTED
+        self.cursor += 1
+        if self.feature_engine is not None:
+            self.feature_engine.sync(self.bar_dict, self.cursor)
+        return self.observation
+
+    def advance(self, bars):
+        """
+        Push the following bars at once, features are synced at the last bar only.
+
+        Args:
+            bars(int): number of bars, truncated to the remaining bars
+
+        Returns:
+            array: observations of the pushed bars, shape (bars, fields, window)
+        """
+        bars = min(bars, len(self) - 1 - self.cursor)
+        start = self.cursor + 2 - self.window
+        index = np.arange(start, start + bars)[:, None] + np.arange(self.window)
+        observations = self.bars[:, index].swapaxes(0, 1)
+        self.cursor += bars
+        if self.feature_engine is not None and bars:
+            self.feature_engine.sync(self.bar_dict, self.cursor)
+        return observations
 
-    def reset(self, **kwargs):
+    def reset(self, start=None, **kwargs):
         """
         Reset the observer.
         Args:
+            start(int): bar index of the initial observation, window - 1 by default
             **kwargs(**dict): key-word arguments
 
         Returns:
             object: observation
         """
-        raise NotImplementedError
+        self.cursor = self.window - 1 if start is None else max(start, self.window - 1)
+        return self.observation
+
+    def _set_bars(self, bar_dict, time_index=None, bars=None):
+        """
+        Set bars by bar dict.
+
+        Args:
+            bar_dict(dict): bar dict, key-->field, value-->1-D history array
+            time_index(array): bar time labels
+            bars(array): read-only (fields, bars) array of the fields of bar dict kept without copy,
+                         e.g. a memory-mapped stacked file, stacked from bar dict if None
+        """
+        self.fields = list(bar_dict)
+        if bars is None:
+            bars = np.ascontiguousarray(np.vstack([bar_dict[_] for _ in self.fields]), dtype=np.float64)
+            bars.setflags(write=False)
+        self.bars = bars
+        self.bar_dict = {field: self.bars[index] for index, field in enumerate(self.fields)}
+        self._columns = [self.bar_dict[_] for _ in self.fields]
+        self.time_index = time_index
+        self.cursor = self.window - 2
 
 
 __all__ = [
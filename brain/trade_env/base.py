@@ -4,6 +4,7 @@
 #     File:
 # **********************************************************************************#
 """
+import numpy as np
 from .. core.enums import BaseEnums
 
 
@@ -26,7 +27,74 @@ class TradingAction(BaseEnums):
     FAIR = 'FAIR'       # hold
 
 
+class TradingActionCode(BaseEnums):
+    """
+    Integer codes of trading actions, emitted by agents.
+    """
+    BUY = 0
+    SELL = 1
+    SHORT = 2
+    COVER = 3
+    FAIR = 4
+
+
+# lookup tables indexed by trading action code
+TRADING_ACTIONS = (TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT, TradingAction.COVER,
+                   TradingAction.FAIR)
+ACTION_DIRECTIONS = (1, -1, -1, 1, 0)
+ACTION_OFFSETS = (1, -1, 1, -1, 0)     # 1: open, -1: close, 0: hold
+ACTION_LONG_SHORT = ('long', 'long', 'short', 'short', None)
+TRADING_ACTION_CODES = dict([(name, code) for code, name in enumerate(TRADING_ACTIONS)] +
+                            [(code, code) for code in range(len(TRADING_ACTIONS))])
+_SORTED_ACTIONS = np.array(sorted(TRADING_ACTIONS))
+_SORTED_ACTION_CODES = np.array([TRADING_ACTION_CODES[_] for _ in _SORTED_ACTIONS])
+
+
+def encode_action(action):
+    """
+    Trading action code of action name or code.
+
+    Args:
+        action(string or int): trading action name or code
+
+    Returns:
+        int: trading action code, -1 if invalid
+    """
+    try:
+        return TRADING_ACTION_CODES.get(action, -1)
+    except TypeError:
+        return -1
+
+
+def encode_actions(actions):
+    """
+    Vectorized trading action codes of action names or codes.
+
+    Args:
+        actions(array): trading action names or codes
+
+    Returns:
+        array: trading action codes, -1 if invalid
+    """
+    actions = np.asarray(actions)
+    if actions.dtype.kind in 'iu':
+        return np.where((actions >= 0) & (actions < len(TRADING_ACTIONS)), actions, -1)
+    if actions.dtype.kind not in 'US':
+        return np.array([encode_action(_) for _ in actions.ravel()], dtype=int).reshape(actions.shape)
+    actions = actions.astype(_SORTED_ACTIONS.dtype) if actions.dtype.kind == 'S' else actions
+    position = np.minimum(np.searchsorted(_SORTED_ACTIONS, actions), len(_SORTED_ACTIONS) - 1)
+    return np.where(_SORTED_ACTIONS[position] == actions, _SORTED_ACTION_CODES[position], -1)
+
+
 __all__ = [
     'LongShort',
-    'TradingAction'
+    'TradingAction',
+    'TradingActionCode',
+    'TRADING_ACTIONS',
+    'TRADING_ACTION_CODES',
+    'ACTION_DIRECTIONS',
+    'ACTION_OFFSETS',
+    'ACTION_LONG_SHORT',
+    'encode_action',
+    'encode_actions'
 ]
@@ -0,0 +1,390 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Batch state file.
+# **********************************************************************************#
+"""
+from __future__ import division
+import numpy as np
+from .. trade.position import evaluate_positions
+
+
+class BatchPortfolioState(object):
+    """
+    Portfolio states of N environments kept in contiguous arrays,
+    following the accounting of PortfolioState and FuturesPosition.
+    """
+    __slots__ = [
+        'margin_cash',
+        'portfolio_value',
+        'price',
+        'long_amount',
+        'short_amount',
+        'long_cost',
+        'short_cost',
+        'long_margin',
+        'short_margin',
+        'value',
+        'profit',
+        'multiplier',
+        'margin_rate',
+        '_init_checkpoint'
+    ]
+    state_fields = [
+        'margin_cash',
+        'portfolio_value',
+        'price',
+        'long_amount',
+        'short_amount',
+        'long_cost',
+        'short_cost',
+        'long_margin',
+        'short_margin',
+        'value',
+        'profit',
+        'multiplier',
+        'margin_rate'
+    ]
+
+    def __init__(self, **arrays):
+        """
+        Initialize the batch portfolio state.
+
+        Args:
+            **arrays(**dict): key-word arrays of state_fields, each of shape (N,)
+        """
+        size = max(np.size(arrays.get(field, 0)) for field in self.state_fields)
+        for field in self.state_fields:
+            array = np.empty(size, dtype=np.float64)
+            array[:] = arrays.get(field, 0)
+            setattr(self, field, array)
+        self._init_checkpoint = self.checkpoint()
+
+    @classmethod
+    def from_configs(cls, num_envs=1,
+                     position_base=0,
+                     cost_base=0,
+                     margin_cash=0,
+                     multiplier=1,
+                     margin_rate=1.):
+        """
+        Generate from configs, same as PortfolioState.from_configs for each environment.
+
+        Args:
+            num_envs(int): number of environments
+            position_base(int or array): initial position base amount
+            cost_base(float or array): initial cost base price
+            margin_cash(float or array): margin cash
+            multiplier(int or array): contract multiplier
+            margin_rate(float or array): contract margin rate
+
+        Returns:
+            BatchPortfolioState: instance
+        """
+        shape = (num_envs,)
+        position_base = np.broadcast_to(np.asarray(position_base, dtype=np.float64), shape)
+        cost_base = np.broadcast_to(np.asarray(cost_base, dtype=np.float64), shape)
+        multiplier = np.broadcast_to(np.asarray(multiplier, dtype=np.float64), shape)
+        margin_rate = np.broadcast_to(np.asarray(margin_rate, dtype=np.float64), shape)
+        long_amount = np.where(position_base > 0, position_base, 0)
+        short_amount = np.where(position_base < 0, -position_base, 0)
+        long_margin = long_amount * cost_base * multiplier * margin_rate
+        short_margin = short_amount * cost_base * multiplier * margin_rate
+        return cls(margin_cash=margin_cash,
+                   portfolio_value=margin_cash + (long_margin + short_margin),
+                   price=cost_base,
+                   long_amount=long_amount,
+                   short_amount=short_amount,
+                   long_margin=long_margin,
+                   short_margin=short_margin,
+                   value=np.abs(position_base * cost_base * multiplier),
+                   multiplier=multiplier,
+                   margin_rate=margin_rate)
+
+    @classmethod
+    def from_states(cls, states):
+        """
+        Generate from a list of PortfolioState.
+
+        Args:
+            states(list of PortfolioState): portfolio states
+
+        Returns:
+            BatchPortfolioState: instance
+        """
+        arrays = {
+            'margin_cash': [_.margin_cash for _ in states],
+            'portfolio_value': [_.portfolio_value for _ in states],
+            'price': [_.position_holding.price or 0 for _ in states],
+            'multiplier': [_.multiplier for _ in states],
+            'margin_rate': [_.margin_rate for _ in states]
+        }
+        for field in ['long_amount', 'short_amount', 'long_cost', 'short_cost',
+                      'long_margin', 'short_margin', 'value', 'profit']:
+            arrays[field] = [getattr(_.position_holding, field) for _ in states]
+        return cls(**arrays)
+
+    def __len__(self):
+        return self.margin_cash.size
+
+    @property
+    def total_margin(self):
+        """
+        Total margin.
+        """
+        return self.long_margin + self.short_margin
+
+    @property
+    def position_proportion(self):
+        """
+        The proportion of position holding margin.
+        """
+        portfolio_value = self.portfolio_value
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(portfolio_value != 0, self.total_margin / portfolio_value, 0.)
+
+    def evaluate(self, price, mask=None):
+        """
+        Evaluate portfolio value according to price input.
+
+        Args:
+            price(float or array): price
+            mask(array of boolean): environments to be evaluated, all by default
+
+        Returns:
+            array: float profit and loss added
+        """
+        float_pnl_added = self._evaluate_position(price, mask)
+        self.portfolio_value += float_pnl_added
+        self.margin_cash[:] = self.portfolio_value - self.total_margin
+        return float_pnl_added
+
+    def update(self, direction, offset, amount, price, costs=None):
+        """
+        Update positions according to a batch of trades, zero amount means no trade.
+
+        Args:
+            direction(array): trade direction, 1 or -1
+            offset(array): offset flag, 1 for open and -1 for close
+            amount(array): transact amount
+            price(float or array): transact price
+            costs(array): commission and slippage of trades, deducted from portfolio values
+
+        Returns:
+            array: portfolio profit and loss
+        """
+        price = np.broadcast_to(np.asarray(price, dtype=np.float64), self.price.shape)
+        traded = amount != 0
+        is_open = traded & (offset == 1)
+        is_close = traded & (offset == -1)
+        open_long = is_open & (direction == 1)
+        open_short = is_open & (direction == -1)
+        close_short = is_close & (direction == 1)
+        close_long = is_close & (direction == -1)
+
+        # 先计算平仓盈亏, 开仓前更新持仓浮动盈亏
+        close_pnl = np.where(is_close, -direction * (price - self.price) * amount * self.multiplier, 0.)
+        open_pnl = self._evaluate_position(price, mask=is_open)
+        trade_mv = offset * direction * amount * self.multiplier
+
+        long_amount = self.long_amount + amount
+        short_amount = self.short_amount + amount
+        with np.errstate(divide='ignore', invalid='ignore'):
+            long_cost = np.where(long_amount != 0,
+                                 (self.long_cost * self.long_amount + amount * price) / long_amount, 0.)
+            short_cost = np.where(short_amount != 0,
+                                  (self.short_cost * self.short_amount + amount * price) / short_amount, 0.)
+        np.copyto(self.long_cost, long_cost, where=open_long)
+        np.copyto(self.long_amount, long_amount, where=open_long)
+        np.copyto(self.short_cost, short_cost, where=open_short)
+        np.copyto(self.short_amount, short_amount, where=open_short)
+        np.copyto(self.short_amount, self.short_amount - amount, where=close_short)
+        np.copyto(self.long_amount, self.long_amount - amount, where=close_long)
+        np.copyto(self.value, self.value + price * trade_mv, where=is_open)
+        np.copyto(self.value, self.value - price * trade_mv, where=close_short)
+        np.copyto(self.value, self.value - self.price * trade_mv, where=close_long)
+        # 平仓后更新持仓浮动盈亏增量
+        close_pnl += self._evaluate_position(price, mask=is_close)
+
+        no_long = traded & (self.long_amount == 0)
+        no_short = traded & (self.short_amount == 0)
+        self.long_cost[no_long] = 0
+        self.long_margin[no_long] = 0
+        self.short_cost[no_short] = 0
+        self.short_margin[no_short] = 0
+        self._evaluate_position(price, mask=traded)
+
+        portfolio_value_added = np.where(is_open, open_pnl, close_pnl)
+        if costs is not None:
+            portfolio_value_added = portfolio_value_added - costs
+        self.portfolio_value += portfolio_value_added
+        self.margin_cash[:] = self.portfolio_value - self.total_margin
+        return portfolio_value_added
+
+    def update_row(self, index, direction, offset, amount, price, cost=0.):
+        """
+        Update the position of one environment according to a trade, the same float operations as update
+        on a batch where only this environment trades, without the array overhead of the whole batch.
+
+        Args:
+            index(int): environment index
+            direction(int): trade direction, 1 or -1
+            offset(int): offset flag, 1 for open and -1 for close
+            amount(float): transact amount, non zero
+            price(float): transact price
+            cost(float): commission and slippage of the trade, deducted from portfolio value
+
+        Returns:
+            float: portfolio profit and loss
+        """
+        price = float(price)
+        multiplier = self.multiplier.item(index)
+        trade_mv = offset * direction * amount * multiplier
+        if offset == 1:
+            portfolio_value_added = self._evaluate_row(index, price)
+            if direction == 1:
+                amount_field, cost_field = self.long_amount, self.long_cost
+            else:
+                amount_field, cost_field = self.short_amount, self.short_cost
+            holding = amount_field.item(index)
+            total = holding + amount
+            cost_field[index] = (cost_field.item(index) * holding + amount * price) / total if total != 0 else 0.
+            amount_field[index] = total
+            self.value[index] = self.value.item(index) + price * trade_mv
+        else:
+            # 先计算平仓盈亏, 平仓后更新持仓浮动盈亏增量
+            last_price = self.price.item(index)
+            portfolio_value_added = -direction * (price - last_price) * amount * multiplier
+            if direction == 1:
+                self.short_amount[index] = self.short_amount.item(index) - amount
+                self.value[index] = self.value.item(index) - price * trade_mv
+            else:
+                self.long_amount[index] = self.long_amount.item(index) - amount
+                self.value[index] = self.value.item(index) - last_price * trade_mv
+            portfolio_value_added += self._evaluate_row(index, price)
+        if self.long_amount.item(index) == 0:
+            self.long_cost[index] = 0
+            self.long_margin[index] = 0
+        if self.short_amount.item(index) == 0:
+            self.short_cost[index] = 0
+            self.short_margin[index] = 0
+        self._evaluate_row(index, price)
+        portfolio_value_added -= cost
+        self.portfolio_value[index] = portfolio_value = self.portfolio_value.item(index) + portfolio_value_added
+        self.margin_cash[index] = portfolio_value - (self.long_margin.item(index) + self.short_margin.item(index))
+        return portfolio_value_added
+
+    def feasible_open_quantity(self, margin_cash=None):
+        """
+        The reference open quantities that could be opened.
+
+        Args:
+            margin_cash(array): available margin cash, zero falls back to current margin cash
+
+        Returns:
+            array: feasible open quantity
+        """
+        margin_cash = self.margin_cash if margin_cash is None else \
+            np.where(margin_cash != 0, margin_cash, self.margin_cash)
+        valid = (self.margin_rate != 0) & (self.multiplier != 0) & (self.price != 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quantity = np.trunc(margin_cash / self.margin_rate / self.multiplier / self.price)
+        return np.where(valid, quantity, 0.)
+
+    def feasible_close_quantity(self, target_cash=None, long_short='long'):
+        """
+        The reference close quantities according to target_cash input and max_holding.
+
+        Args:
+            target_cash(array): target cash, zero falls back to current margin cash
+            long_short(string): long or short
+
+        Returns:
+            array: feasible close quantity
+        """
+        holding_quantity = self.long_amount if long_short == 'long' else self.short_amount
+        return np.minimum(self.feasible_open_quantity(margin_cash=target_cash), holding_quantity)
+
+    def checkpoint(self):
+        """
+        Checkpoint of all environments as one array of shape (len(state_fields), N).
+
+        Returns:
+            array: checkpoint
+        """
+        return np.vstack([getattr(self, field) for field in self.state_fields])
+
+    def restore(self, checkpoint, mask=None):
+        """
+        Restore states from checkpoint in place.
+
+        Args:
+            checkpoint(array): checkpoint generated by self.checkpoint
+            mask(array of boolean): environments to be restored, all by default
+        """
+        for index, field in enumerate(self.state_fields):
+            np.copyto(getattr(self, field), checkpoint[index], where=True if mask is None else mask)
+
+    def reset(self, mask=None):
+        """
+        Reset states to the initial values.
+
+        Args:
+            mask(array of boolean): environments to be reset, all by default
+        """
+        self.restore(self._init_checkpoint, mask=mask)
+
+    def _evaluate_position(self, price, mask=None):
+        """
+        Update price, margin and profit of positions, return the incremental floating earning.
+
+        Args:
+            price(float or array): reference price
+            mask(array of boolean): environments to be evaluated, all by default
+
+        Returns:
+            array: float profit and loss added
+        """
+        price = np.broadcast_to(np.asarray(price, dtype=np.float64), self.price.shape)
+        evaluation = evaluate_positions(price, self.long_amount, self.short_amount, self.long_cost,
+                                        self.short_cost, self.value, self.multiplier, self.margin_rate)
+        if mask is None:
+            mask = True
+        np.copyto(self.price, price, where=mask)
+        np.copyto(self.long_margin, evaluation.long_margin, where=mask)
+        np.copyto(self.short_margin, evaluation.short_margin, where=mask)
+        np.copyto(self.profit, evaluation.profit, where=mask)
+        np.copyto(self.value, evaluation.value, where=mask)
+        return np.where(mask, evaluation.float_pnl_added, 0.)
+
+    def _evaluate_row(self, index, price):
+        """
+        Update price, margin and profit of the position of one environment, the same float operations as
+        evaluate_positions, return the incremental floating earning.
+
+        Args:
+            index(int): environment index
+            price(float): reference price
+
+        Returns:
+            float: float profit and loss added
+        """
+        long_amount, short_amount = self.long_amount.item(index), self.short_amount.item(index)
+        multiplier, margin_rate = self.multiplier.item(index), self.margin_rate.item(index)
+        long_market_value = price * long_amount * multiplier
+        short_market_value = price * short_amount * multiplier
+        long_cost, short_cost = self.long_cost.item(index), self.short_cost.item(index)
+        cost_value = multiplier * (long_cost * long_amount - short_cost * short_amount)
+        evaluated_value = long_market_value - short_market_value
+        value = self.value.item(index)
+        self.price[index] = price
+        self.long_margin[index] = long_market_value * margin_rate
+        self.short_margin[index] = short_market_value * margin_rate
+        self.profit[index] = evaluated_value - cost_value
+        self.value[index] = evaluated_value
+        return evaluated_value - (cost_value if value == 0 else value)
+
+
+__all__ = [
+    'BatchPortfolioState'
+]
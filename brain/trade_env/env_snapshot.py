@@ -34,6 +34,27 @@ class EnvSnapshot(SlottedObject):
         self.next_state = next_state
         self.reward = reward
 
+    def checkpoint(self):
+        """
+        Checkpoint of current snapshot as a flat tuple, next_state is not captured.
+
+        Returns:
+            tuple: action, reward and the state checkpoint fields
+        """
+        state_checkpoint = self.state.checkpoint() if self.state is not None else tuple()
+        return (self.action, self.reward) + state_checkpoint
+
+    def restore(self, checkpoint):
+        """
+        Restore snapshot from checkpoint in place.
+
+        Args:
+            checkpoint(tuple): checkpoint generated by self.checkpoint
+        """
+        self.action, self.reward = checkpoint[:2]
+        if self.state is not None:
+            self.state.restore(checkpoint[2:])
+
     def reset(self, **kwargs):
         """
         Reset the snapshot to default value.
@@ -0,0 +1,132 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Episode sampler.
+# **********************************************************************************#
+"""
+import numpy as np
+from utils.exceptions import *
+
+
+class EpisodeSampler(object):
+    """
+    Random-start episode sampler over the history of one bar quote.
+
+    Episodes are (start, length) in bar indices, drawn in bulk with integer offset math,
+    and handed to environments as bar quotes sharing the history arrays.
+    """
+    def __init__(self, bar_quote, length, max_length=None, calendar=None, day_offsets=None, seed=None):
+        """
+        Args:
+            bar_quote(BarQuote): bar quote with the full history loaded
+            length(int): episode length in bars, the minimum length if max_length is given
+            max_length(int): maximum episode length in bars, fixed length if None
+            calendar(TradingCalendar): trading calendar of the history bars
+            day_offsets(array): first bar index of each trading day of the calendar, one bar per day if None
+            seed(int): random seed
+        """
+        self.bar_quote = bar_quote
+        self.min_length = length
+        self.max_length = max_length or length
+        self.warm_up = bar_quote.window - 1
+        self.calendar = calendar
+        self.day_offsets = np.arange(len(bar_quote)) if day_offsets is None else np.asarray(day_offsets)
+        self.random_state = np.random.default_rng(seed)
+        if self.max_length < self.min_length or self.warm_up + self.max_length > len(bar_quote):
+            raise Exceptions.INVALID_EPISODE_LENGTH
+
+    def sample(self, n, start=None, end=None):
+        """
+        Draw episodes whose bars are all in history.
+
+        Args:
+            n(int): number of episodes
+            start(string or datetime): earliest trading day of episodes, requires calendar
+            end(string or datetime): latest trading day of episodes, requires calendar
+
+        Returns:
+            array, array: episode start bar indices and lengths
+        """
+        low, high = self.warm_up, len(self.bar_quote)
+        if start is not None:
+            low = max(low, int(self.day_offsets[self.calendar.index(start)]))
+        if end is not None:
+            stop = self.calendar.trading_days(end=end).size
+            high = min(high, int(self.day_offsets[stop]) if stop < len(self.day_offsets) else high)
+        if high - low < self.max_length:
+            raise Exceptions.INVALID_EPISODE_LENGTH
+        lengths = self.random_state.integers(self.min_length, self.max_length + 1, size=n)
+        starts = self.random_state.integers(low, high - lengths + 1)
+        return starts, lengths
+
+    def bar_index(self, date):
+        """
+        Bar index of the first bar of the trading day.
+
+        Args:
+            date(string or datetime or array): date or dates
+
+        Returns:
+            int or array: bar index
+        """
+        return self.day_offsets[self.calendar.index(date)]
+
+    def trading_day(self, bar_index):
+        """
+        Trading day of the bar.
+
+        Args:
+            bar_index(int or array): bar index
+
+        Returns:
+            datetime64 or array: trading day
+        """
+        return self.calendar.dates[np.searchsorted(self.day_offsets, bar_index, side='right') - 1]
+
+    def episode(self, start, length):
+        """
+        Bar quote of the episode with its warm-up bars, sharing the history arrays.
+
+        Args:
+            start(int): first bar index of the episode
+            length(int): episode length in bars
+
+        Returns:
+            BarQuote: bar quote, the first push observes the bar at start
+        """
+        return self.bar_quote.slice(start - self.warm_up, start + length)
+
+    def assign(self, env, start, length):
+        """
+        Reset the environment on the episode, the initial observation is the window ending at the bar
+        at start and the following steps observe the bars after it.
+
+        Args:
+            env(FuturesMarketEnv): environment
+            start(int): first bar index of the episode
+            length(int): episode length in bars
+
+        Returns:
+            object: initial observation
+        """
+        env.bar_quote = self.episode(start, length)
+        return env.reset()
+
+    def batch(self, starts, length, field='closePrice'):
+        """
+        Field values of episodes with the same length, e.g. prices of VectorFuturesMarketEnv.
+
+        Args:
+            starts(array): first bar indices of episodes
+            length(int): episode length in bars
+            field(string): field name
+
+        Returns:
+            array: values of shape (episodes, length)
+        """
+        return self.bar_quote.bar_dict[field][np.asarray(starts)[:, None] + np.arange(length)]
+
+
+__all__ = [
+    'EpisodeSampler'
+]
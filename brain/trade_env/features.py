@@ -0,0 +1,321 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Technical feature engine.
+# **********************************************************************************#
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.exceptions import *
+
+
+EMA_BLOCK_EXPONENT = 200
+
+
+def _exponential_moving_average(values, alpha):
+    """
+    Exponential moving average seeded by the first value, vectorized by blocks whose
+    decay factors stay within float range.
+
+    Args:
+        values(array): 1-D values
+        alpha(float): smoothing factor
+
+    Returns:
+        array: exponential moving average
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if alpha >= 1 or not len(values):
+        return values.copy()
+    beta = 1. - alpha
+    block = max(1, int(EMA_BLOCK_EXPONENT / -np.log10(beta)))
+    result = np.empty_like(values)
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        exponents = np.arange(len(chunk))
+        weighted = np.cumsum(chunk * beta ** -exponents)
+        result[start:start + block] = beta ** exponents * (beta * previous + alpha * weighted)
+        previous = result[start + len(chunk) - 1]
+    return result
+
+
+class _RollingIndicator(object):
+    """
+    Indicator on the rolling mean and standard deviation of one input series. Rolling state
+    is a ring buffer with Welford mean and squared deviations, so each bar costs O(1).
+    """
+    lag = 0
+
+    def __init__(self, field, window):
+        self.field = field
+        self.window = window
+        self._ring = np.empty(window)
+        self._position = 0
+        self._count = 0
+        self._mean = 0.
+        self._m2 = 0.
+
+    def input_at(self, bar_dict, index):
+        """
+        Input value at bar index.
+        """
+        return bar_dict[self.field][index]
+
+    def inputs(self, bar_dict, start, end):
+        """
+        Input values of bar indices in [start, end).
+        """
+        return np.asarray(bar_dict[self.field][start:end], dtype=np.float64)
+
+    def output(self, x, mean, std):
+        """
+        Indicator value by the last input, the rolling mean and standard deviation.
+        """
+        raise NotImplementedError
+
+    def _value(self, x):
+        if self._count < self.window:
+            return np.nan
+        return self.output(x, self._mean, np.sqrt(max(self._m2, 0.) / self.window))
+
+    def update(self, bar_dict, index):
+        """
+        Feed the input of bar index, which must follow the last fed one.
+        """
+        if index < self.lag:
+            return np.nan
+        x = self.input_at(bar_dict, index)
+        if self._count < self.window:
+            self._ring[self._count] = x
+            self._count += 1
+            delta = x - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (x - self._mean)
+        else:
+            old = self._ring[self._position]
+            self._ring[self._position] = x
+            self._position = (self._position + 1) % self.window
+            mean = self._mean + (x - old) / self.window
+            self._m2 += (x - old) * (x - mean + old - self._mean)
+            self._mean = mean
+        return self._value(x)
+
+    def rebuild(self, bar_dict, index):
+        """
+        Rebuild the rolling state at bar index from the last `window` inputs, in O(window).
+        """
+        start = max(self.lag, index - self.window + 1)
+        x = self.inputs(bar_dict, start, index + 1) if index >= start else np.empty(0)
+        self._count, self._position = len(x), 0
+        self._ring[:len(x)] = x
+        self._mean = x.mean() if len(x) else 0.
+        self._m2 = float(((x - self._mean) ** 2).sum())
+        return self._value(x[-1]) if len(x) else np.nan
+
+    def bulk(self, bar_dict, length):
+        """
+        Indicator values of all bars at once.
+        """
+        result = np.full(length, np.nan)
+        x = self.inputs(bar_dict, self.lag, length)
+        if len(x) >= self.window:
+            windows = sliding_window_view(x, self.window)
+            result[self.lag + self.window - 1:] = self.output(x[self.window - 1:], windows.mean(axis=-1),
+                                                              windows.std(axis=-1))
+        return result
+
+
+class MovingAverage(_RollingIndicator):
+    """
+    Simple moving average of the field.
+    """
+    def output(self, x, mean, std):
+        return mean
+
+
+class ZScore(_RollingIndicator):
+    """
+    Z-score of the field within its rolling window, 0 if the window is flat.
+    """
+    def output(self, x, mean, std):
+        return np.divide(x - mean, std, out=np.zeros_like(np.asarray(x - mean, dtype=np.float64)),
+                         where=np.asarray(std) > 0)[()]
+
+
+class Volatility(_RollingIndicator):
+    """
+    Rolling standard deviation of the simple returns of the field.
+    """
+    lag = 1
+
+    def input_at(self, bar_dict, index):
+        values = bar_dict[self.field]
+        return values[index] / values[index - 1] - 1.
+
+    def inputs(self, bar_dict, start, end):
+        values = np.asarray(bar_dict[self.field][start - 1:end], dtype=np.float64)
+        return values[1:] / values[:-1] - 1.
+
+    def output(self, x, mean, std):
+        return std
+
+
+class AverageTrueRange(_RollingIndicator):
+    """
+    Rolling mean of the true range, with the field as close price.
+    """
+    high_field = 'highPrice'
+    low_field = 'lowPrice'
+
+    def input_at(self, bar_dict, index):
+        high, low = bar_dict[self.high_field][index], bar_dict[self.low_field][index]
+        if index == 0:
+            return high - low
+        pre_close = bar_dict[self.field][index - 1]
+        return max(high, pre_close) - min(low, pre_close)
+
+    def inputs(self, bar_dict, start, end):
+        high = np.asarray(bar_dict[self.high_field][start:end], dtype=np.float64)
+        low = np.asarray(bar_dict[self.low_field][start:end], dtype=np.float64)
+        pre_close = np.asarray(bar_dict[self.field][max(start - 1, 0):end - 1], dtype=np.float64)
+        if not start:
+            pre_close = np.concatenate([[np.nan], pre_close])
+        return np.fmax(high, pre_close) - np.fmin(low, pre_close)
+
+    def output(self, x, mean, std):
+        return mean
+
+
+class ExponentialMovingAverage(object):
+    """
+    Exponential moving average of the field with smoothing factor 2 / (window + 1).
+    """
+    def __init__(self, field, window, cache=None):
+        self.field = field
+        self.window = window
+        self.alpha = 2. / (window + 1)
+        self._cache = cache if cache is not None else dict()
+        self._value = np.nan
+
+    def update(self, bar_dict, index):
+        x = bar_dict[self.field][index]
+        self._value = x if index == 0 else self._value + self.alpha * (x - self._value)
+        return self._value
+
+    def rebuild(self, bar_dict, index):
+        """
+        Exponential moving average depends on the whole history, which is computed once and cached.
+        """
+        if index < 0:
+            self._value = np.nan
+            return self._value
+        values = bar_dict[self.field]
+        key = (self.field, self.window)
+        if key not in self._cache or self._cache[key][0] is not values:
+            self._cache[key] = (values, _exponential_moving_average(values, self.alpha))
+        self._value = self._cache[key][1][index]
+        return self._value
+
+    def bulk(self, bar_dict, length):
+        return _exponential_moving_average(bar_dict[self.field][:length], self.alpha)
+
+
+INDICATORS = {
+    'ma': MovingAverage,
+    'ema': ExponentialMovingAverage,
+    'atr': AverageTrueRange,
+    'volatility': Volatility,
+    'zscore': ZScore,
+}
+
+
+class FeatureEngine(object):
+    """
+    Technical features of bar history, e.g. [('ma', 'closePrice', 20), ('atr', 'closePrice', 14)].
+
+    Rolling state is fed bar by bar as the cursor advances, so the cost of each step does
+    not depend on the windows. Jumping the cursor, e.g. by reset or restore, rebuilds the
+    state from the last window bars. Bulk mode computes the features of a whole history at once.
+    """
+    def __init__(self, features):
+        """
+        Args:
+            features(list of tuple): features as (indicator, field, window), indicator in INDICATORS
+        """
+        for indicator, _, window in features:
+            if indicator not in INDICATORS or window < 1:
+                raise Exceptions.INVALID_FEATURE
+        self.features = [tuple(_) for _ in features]
+        self._ema_cache = dict()
+        self._indicators = [self._create(*_) for _ in self.features]
+        self.values = np.full(len(self.features), np.nan)
+        self.cursor = None
+        self._bar_dict = None
+
+    @property
+    def names(self):
+        """
+        Feature names, e.g. 'ma_closePrice_20'.
+        """
+        return ['{}_{}_{}'.format(*_) for _ in self.features]
+
+    def _create(self, indicator, field, window):
+        if indicator == 'ema':
+            return ExponentialMovingAverage(field, window, cache=self._ema_cache)
+        return INDICATORS[indicator](field, window)
+
+    def copy(self):
+        """
+        Engine of the same features with its own rolling state, sharing the cached history features.
+        """
+        engine = self.__class__.__new__(self.__class__)
+        engine.features = self.features
+        engine._ema_cache = self._ema_cache
+        engine._indicators = [engine._create(*_) for _ in self.features]
+        engine.values = np.full(len(self.features), np.nan)
+        engine.cursor = None
+        engine._bar_dict = None
+        return engine
+
+    def sync(self, bar_dict, cursor):
+        """
+        Features of the bar at cursor.
+
+        Args:
+            bar_dict(dict): bar dict, key-->field, value-->1-D history array
+            cursor(int): bar index
+
+        Returns:
+            array: feature values, overwritten by the next sync
+        """
+        if cursor == self.cursor and bar_dict is self._bar_dict:
+            return self.values
+        if self.cursor is not None and cursor == self.cursor + 1 and bar_dict is self._bar_dict:
+            for index, indicator in enumerate(self._indicators):
+                self.values[index] = indicator.update(bar_dict, cursor)
+        else:
+            for index, indicator in enumerate(self._indicators):
+                self.values[index] = indicator.rebuild(bar_dict, cursor)
+        self.cursor, self._bar_dict = cursor, bar_dict
+        return self.values
+
+    def bulk(self, bar_dict):
+        """
+        Features of all history bars at once, for offline training.
+
+        Args:
+            bar_dict(dict): bar dict, key-->field, value-->1-D history array
+
+        Returns:
+            array: feature values of shape (features, bars)
+        """
+        length = len(next(iter(bar_dict.values()))) if bar_dict else 0
+        return np.vstack([_.bulk(bar_dict, length) for _ in self._indicators]) \
+            if self._indicators else np.empty((0, length))
+
+
+__all__ = [
+    'FeatureEngine',
+    'INDICATORS'
+]
@@ -4,18 +4,24 @@
 #     File: Market environment.
 # **********************************************************************************#
 """
+import numpy as np
 from gym import Env
-from copy import deepcopy
+from copy import copy
 from utils.exceptions import *
+from utils.profiler import PhaseProfiler
 from . action_space import TradingActionSpace
 from . env_snapshot import EnvSnapshot
 from . step_info import StepInfo
 from . bar_quote import BarQuote
 from . state import PortfolioState
+from . state_transition import mark_to_market_path
 from .. trade import FuturesPosition
 from .. const import DEFAULT_MARGIN_CASH
 
 
+STEP_PHASES = ['bar_quote', 'state_transition', 'reward_calculator', 'step_info']
+
+
 class FuturesMarketEnv(Env):
     """
     Base market environment inherited by gym Env.
@@ -23,6 +29,8 @@ class FuturesMarketEnv(Env):
     action_space = TradingActionSpace()
     env_snapshot = EnvSnapshot()
     bar_quote = BarQuote()
+    profiler = None
+    action_repeat = 1
 
     def __init__(self, **kwargs):
         """
@@ -38,17 +46,25 @@ class FuturesMarketEnv(Env):
             'action_space',
             'observation_space',
             'env_snapshot',
-            'bar_quote'
+            'bar_quote',
+            'profiler',
+            'action_repeat'
         }
         if not set(kwargs).issubset(set(valid_parameters)):
             raise Exceptions.INVALID_INITIALIZE_PARAMETERS
         for item in kwargs.items():
             setattr(self, *item)
-        self._init_setting = {_: deepcopy(getattr(self, _, None)) for _ in valid_parameters}
+        if 'action_space' not in kwargs:
+            self.action_space = TradingActionSpace()
+        if 'env_snapshot' not in kwargs:
+            self.env_snapshot = EnvSnapshot()
+        if 'bar_quote' not in kwargs:
+            self.bar_quote = copy(self.bar_quote)
+        self._init_checkpoint = self.checkpoint()
 
     @classmethod
     def from_configs(cls, margin_cash=None, symbol=None,
-                     multiplier=1, margin_rate=1., reward_range=None):
+                     multiplier=1, margin_rate=1., reward_range=None, bar_quote=None, action_repeat=None):
         """
         Instantiated by some parameter configs.
 
@@ -58,6 +74,8 @@ class FuturesMarketEnv(Env):
             multiplier(int): multiplier
             margin_rate(float): margin rate
             reward_range(tuple): reward range as (min, max)
+            bar_quote(BarQuote): bar quote
+            action_repeat(int): number of bars stepped by each action
 
         Returns:
             FuturesMarketEnv: instance
@@ -74,10 +92,15 @@ class FuturesMarketEnv(Env):
             'env_snapshot': env_snapshot,
         }
         if reward_range:
-            kwargs.update(reward_range)
+            kwargs['reward_range'] = reward_range
+        if bar_quote is not None:
+            kwargs['bar_quote'] = bar_quote
+        if action_repeat:
+            kwargs['action_repeat'] = action_repeat
         return cls(**kwargs)
 
-    def step(self, action, state_transition=None, reward_calculator=None, done_condition=None):
+    def step(self, action, state_transition=None, reward_calculator=None, done_condition=None, repeat=None,
+             batch_reward_calculator=None):
         """
         Run one time step of the environment's dynamics. When end of
         episode is reached, you are responsible for calling `reset()`
@@ -85,11 +108,21 @@ class FuturesMarketEnv(Env):
 
         Accepts an action and returns a tuple (observation, reward, done, info).
 
+        With action repeat, e.g. the refresh rate of a strategy, the action is applied on the first
+        bar only and the following bars are marked to market at the price field of the bar quote.
+        reward_calculator is called bar by bar with the PortfolioState and the observation of each
+        bar. If batch_reward_calculator is given, the bars are marked in one vectorized pass instead
+        and it is called once with a BatchPortfolioState of the bar states and the stacked bar
+        observations, as the reward calculator of VectorFuturesMarketEnv. The done condition is
+        checked on the cumulative reward of the last bar.
+
         Args:
             action(object): an action provided from policy makers
             state_transition(func): state transition function with it's inputs are action and current state
             reward_calculator(func): reward calculating function
             done_condition(func): done condition
+            repeat(int): number of bars stepped by the action, self.action_repeat by default
+            batch_reward_calculator(func): vectorized reward calculating function of repeated bars
 
         Returns:
             StepInfo: step info instance
@@ -99,33 +132,138 @@ class FuturesMarketEnv(Env):
         state_transition = state_transition or (lambda a, s: s)
         reward_calculator = reward_calculator or (lambda n_s, o: 0)
         done_condition = done_condition or (lambda r: not (self.reward_range[0] <= r <= self.reward_range[1]))
+        repeat = repeat or self.action_repeat
 
+        profiler = self.profiler
+        if profiler is not None:
+            clock = profiler.clock
+            start = clock()
         bar_data = self.bar_quote.push()
+        if profiler is not None:
+            end = clock()
+            profiler.record('bar_quote', end - start)
+            start = end
         state = self.env_snapshot.state
         next_state = state_transition(action, state)
-        current_reward = reward_calculator(next_state, bar_data)
+        if profiler is not None:
+            end = clock()
+            profiler.record('state_transition', end - start)
+            start = end
+        reward = self.env_snapshot.reward + reward_calculator(next_state, bar_data)
+        if profiler is not None:
+            end = clock()
+            profiler.record('reward_calculator', end - start)
+            start = end
+        if repeat > 1 and not self.bar_quote.exhausted:
+            reward, bar_data = self._fast_forward(repeat - 1, next_state, reward, reward_calculator,
+                                                  batch_reward_calculator)
+            if profiler is not None:
+                end = clock()
+                profiler.record('fast_forward', end - start)
+                start = end
         self.env_snapshot.action = action
         self.env_snapshot.state = next_state
-        self.env_snapshot.reward += current_reward
+        self.env_snapshot.reward = reward
 
         done = done_condition(self.env_snapshot.reward)
+        features = getattr(self.bar_quote, 'features', None)
         step_info_parameters = {
             'observation': bar_data,
             'reward': self.env_snapshot.reward,
             'done': done,
-            'info': dict()
+            'info': dict() if features is None else {'features': features}
         }
         step_info = StepInfo(**step_info_parameters)
+        if profiler is not None:
+            profiler.record('step_info', clock() - start)
         return step_info
 
+    def _fast_forward(self, bars, state, reward, reward_calculator, batch_reward_calculator=None):
+        """
+        Push the following bars without any action, marking the state to market at each bar,
+        in one vectorized pass if batch_reward_calculator is given.
+
+        Args:
+            bars(int): number of bars
+            state(PortfolioState): portfolio state after the action
+            reward(float): cumulative reward after the action
+            reward_calculator(func): reward calculating function of one bar
+            batch_reward_calculator(func): vectorized reward calculating function
+
+        Returns:
+            tuple: cumulative reward and observation of the last bar
+        """
+        cursor = self.bar_quote.cursor
+        observations = self.bar_quote.advance(bars)
+        prices = self.bar_quote.bar_dict[self.bar_quote.price_field][cursor + 1:self.bar_quote.cursor + 1]
+        if batch_reward_calculator is None:
+            for price, observation in zip(prices.tolist(), observations):
+                if state is not None:
+                    state.evaluate(price)
+                reward += reward_calculator(state, observation)
+            return reward, observations[-1]
+        path_states = None
+        if state is not None:
+            path_states = mark_to_market_path(state, prices)
+        accumulated = np.empty(len(observations) + 1)
+        accumulated[0] = reward
+        accumulated[1:] = batch_reward_calculator(path_states, observations)
+        # 逐bar累加奖励, 与逐步step的累计奖励一致
+        reward = float(np.cumsum(accumulated)[-1])
+        return reward, observations[-1]
+
+    def enable_profiling(self, profiler=None):
+        """
+        Record wall time of step phases: bar_quote, state_transition, reward_calculator and step_info,
+        plus fast_forward of the repeated bars with action repeat.
+
+        Args:
+            profiler(PhaseProfiler): profiler, a new one by default
+
+        Returns:
+            PhaseProfiler: profiler
+        """
+        self.profiler = profiler or PhaseProfiler(STEP_PHASES)
+        return self.profiler
+
+    def disable_profiling(self):
+        """
+        Stop recording step phases.
+        """
+        self.profiler = None
+
     def reset(self):
         """
-        Resets the state of the environment and returns an initial observation.
+        Resets the state of the environment and returns an initial observation, the first window
+        of the bar quote as BarQuote.reset, the following steps observe the bars after it.
 
         Returns:
              observation(object): the initial observation of the space.
         """
-        self.__dict__.update(self._init_setting)
+        self.restore(self._init_checkpoint)
+        reset = getattr(self.bar_quote, 'reset', None)
+        return None if reset is None else reset()
+
+    def checkpoint(self):
+        """
+        Checkpoint of the environment as a flat tuple: bar quote cursor followed by
+        the env snapshot checkpoint, cheap enough for branching and rewinding to any bar.
+
+        Returns:
+            tuple: checkpoint
+        """
+        return (getattr(self.bar_quote, 'cursor', None),) + self.env_snapshot.checkpoint()
+
+    def restore(self, checkpoint):
+        """
+        Restore the environment from checkpoint in place, without any deepcopy.
+
+        Args:
+            checkpoint(tuple): checkpoint generated by self.checkpoint
+        """
+        if checkpoint[0] is not None:
+            self.bar_quote.cursor = checkpoint[0]
+        self.env_snapshot.restore(checkpoint[1:])
 
     def render(self, mode='human'):
         """Renders the environment.
@@ -189,7 +327,7 @@ class FuturesMarketEnv(Env):
               'seed'. Often, the main seed equals the provided 'seed', but
               this won't be true if seed=None, for example.
         """
-        return
+        return self.action_space.seed(seed)
 
     @property
     def unwrapped(self):
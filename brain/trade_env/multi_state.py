@@ -0,0 +1,176 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Multi-symbol state file.
+# **********************************************************************************#
+"""
+from __future__ import division
+import numpy as np
+from . batch_state import BatchPortfolioState
+
+
+class MultiSymbolPortfolioState(object):
+    """
+    One portfolio trading a universe of futures contracts with shared margin cash.
+
+    Positions of all symbols live in the arrays of a BatchPortfolioState, one row for each
+    symbol, whose rows account the profit and loss of their symbol only. Portfolio value
+    and margin cash are shared by the whole universe.
+    """
+    __slots__ = [
+        'symbols',
+        'positions',
+        'margin_cash',
+        'portfolio_value',
+        '_init_checkpoint'
+    ]
+
+    def __init__(self, symbols, positions, margin_cash=0, portfolio_value=None):
+        """
+        Initialize the multi-symbol portfolio state.
+
+        Args:
+            symbols(list of string): symbols of the universe
+            positions(BatchPortfolioState): positions, one row for each symbol
+            margin_cash(float): margin cash
+            portfolio_value(float): portfolio value, margin cash plus total margin by default
+        """
+        self.symbols = list(symbols)
+        self.positions = positions
+        self.margin_cash = float(margin_cash)
+        self.portfolio_value = self.margin_cash + self.total_margin if portfolio_value is None \
+            else float(portfolio_value)
+        self._init_checkpoint = self.checkpoint()
+
+    @classmethod
+    def from_configs(cls, symbols,
+                     position_base=0,
+                     cost_base=0,
+                     margin_cash=0,
+                     multiplier=1,
+                     margin_rate=1.):
+        """
+        Generate from configs.
+
+        Args:
+            symbols(list of string): symbols of the universe
+            position_base(int or array): initial position base amount of each symbol
+            cost_base(float or array): initial cost base price of each symbol
+            margin_cash(float): margin cash
+            multiplier(int or array): contract multiplier of each symbol
+            margin_rate(float or array): contract margin rate of each symbol
+
+        Returns:
+            MultiSymbolPortfolioState: instance
+        """
+        positions = BatchPortfolioState.from_configs(num_envs=len(symbols),
+                                                     position_base=position_base,
+                                                     cost_base=cost_base,
+                                                     multiplier=multiplier,
+                                                     margin_rate=margin_rate)
+        positions.portfolio_value[:] = 0
+        positions.margin_cash[:] = 0
+        positions._init_checkpoint = positions.checkpoint()
+        return cls(symbols, positions, margin_cash=margin_cash)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def total_margin(self):
+        """
+        Total margin of the universe.
+        """
+        return float(self.positions.total_margin.sum())
+
+    @property
+    def position_proportion(self):
+        """
+        The proportion of position holding margin.
+        """
+        return self.total_margin / self.portfolio_value if self.portfolio_value else 0.
+
+    def evaluate(self, price):
+        """
+        Evaluate portfolio value of the whole universe according to prices.
+
+        Args:
+            price(array): price of each symbol
+
+        Returns:
+            float: float profit and loss added
+        """
+        float_pnl_added = float(self.positions.evaluate(price).sum())
+        self.portfolio_value += float_pnl_added
+        self.margin_cash = self.portfolio_value - self.total_margin
+        return float_pnl_added
+
+    def update(self, direction, offset, amount, price, costs=None):
+        """
+        Update positions according to trades of all symbols, zero amount means no trade.
+
+        Args:
+            direction(array): trade direction, 1 or -1
+            offset(array): offset flag, 1 for open and -1 for close
+            amount(array): transact amount
+            price(array): transact price
+            costs(array): commission and slippage of trades, deducted from portfolio value
+
+        Returns:
+            float: portfolio profit and loss
+        """
+        portfolio_value_added = float(self.positions.update(direction, offset, amount, price, costs=costs).sum())
+        self.portfolio_value += portfolio_value_added
+        self.margin_cash = self.portfolio_value - self.total_margin
+        return portfolio_value_added
+
+    def update_row(self, index, direction, offset, amount, price, cost=0.):
+        """
+        Update the position of one symbol according to its trade, the same as update where only this symbol
+        trades.
+
+        Args:
+            index(int): symbol index
+            direction(int): trade direction, 1 or -1
+            offset(int): offset flag, 1 for open and -1 for close
+            amount(float): transact amount, non zero
+            price(float): transact price
+            cost(float): commission and slippage of the trade, deducted from portfolio value
+
+        Returns:
+            float: portfolio profit and loss
+        """
+        portfolio_value_added = self.positions.update_row(index, direction, offset, amount, price, cost=cost)
+        self.portfolio_value += portfolio_value_added
+        self.margin_cash = self.portfolio_value - self.total_margin
+        return portfolio_value_added
+
+    def checkpoint(self):
+        """
+        Checkpoint as one flat array: margin cash, portfolio value, then the position arrays.
+
+        Returns:
+            array: checkpoint
+        """
+        return np.concatenate([[self.margin_cash, self.portfolio_value], self.positions.checkpoint().ravel()])
+
+    def restore(self, checkpoint):
+        """
+        Restore the state from checkpoint in place.
+
+        Args:
+            checkpoint(array): checkpoint generated by self.checkpoint
+        """
+        self.margin_cash, self.portfolio_value = float(checkpoint[0]), float(checkpoint[1])
+        self.positions.restore(checkpoint[2:].reshape(len(self.positions.state_fields), -1))
+
+    def reset(self):
+        """
+        Reset the state to the initial values.
+        """
+        self.restore(self._init_checkpoint)
+
+
+__all__ = [
+    'MultiSymbolPortfolioState'
+]
@@ -0,0 +1,126 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Multi-symbol market environment.
+# **********************************************************************************#
+"""
+import numpy as np
+from gym import Env
+from utils.exceptions import *
+from . action_space import TradingActionSpace
+from . multi_state import MultiSymbolPortfolioState
+from . state_transition import multi_symbol_action_transition
+from . step_info import StepInfo
+from .. const import DEFAULT_MARGIN_CASH
+
+
+class MultiSymbolFuturesMarketEnv(Env):
+    """
+    Market environment of one portfolio trading a universe of futures contracts with shared margin,
+    stepped by a vector of per-symbol trading actions.
+    """
+    action_space = TradingActionSpace()
+
+    def __init__(self, prices, state, change_percent=0.1,
+                 reward_calculator=None, done_condition=None, reward_range=None):
+        """
+        Initialize the multi-symbol environment.
+
+        Args:
+            prices(array): bar prices of shape (symbols, T)
+            state(MultiSymbolPortfolioState): initial portfolio state
+            change_percent(float): position change percent of each trading action
+            reward_calculator(func): reward function with inputs state and observation
+            done_condition(func): done condition with input cumulative reward
+            reward_range(tuple): reward range as (min, max)
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if prices.ndim != 2 or prices.shape[0] != len(state):
+            raise Exceptions.INVALID_INITIALIZE_PARAMETERS
+        if reward_range:
+            self.reward_range = reward_range
+        self.prices = prices
+        self.state = state
+        self.change_percent = change_percent
+        self.reward_calculator = reward_calculator or (lambda n_s, o: 0)
+        self.done_condition = done_condition or (lambda r: not (self.reward_range[0] <= r <= self.reward_range[1]))
+        self.cursor = -1
+        self.reward = 0
+        self.action_space = TradingActionSpace()
+
+    @classmethod
+    def from_configs(cls, prices, symbols, margin_cash=None, multiplier=1, margin_rate=1., **kwargs):
+        """
+        Instantiated by some parameter configs.
+
+        Args:
+            prices(array): bar prices of shape (symbols, T)
+            symbols(list of string): symbols of the universe
+            margin_cash(float): initial margin cash
+            multiplier(int or array): multiplier of each symbol
+            margin_rate(float or array): margin rate of each symbol
+            **kwargs(**dict): other key-word arguments of the environment
+
+        Returns:
+            MultiSymbolFuturesMarketEnv: instance
+        """
+        state = MultiSymbolPortfolioState.from_configs(symbols,
+                                                       margin_cash=margin_cash or DEFAULT_MARGIN_CASH,
+                                                       multiplier=multiplier,
+                                                       margin_rate=margin_rate)
+        return cls(prices, state, **kwargs)
+
+    def step(self, actions):
+        """
+        Run one time step of the portfolio.
+
+        Args:
+            actions(array of string or int): trading actions, one for each symbol
+
+        Returns:
+            StepInfo: step info whose observation is the prices of all symbols
+        """
+        if self.cursor >= self.prices.shape[1] - 1:
+            raise Exceptions.BAR_QUOTE_EXHAUSTED
+        self.cursor += 1
+        observation = self.prices[:, self.cursor]
+        next_state = multi_symbol_action_transition(actions, self.state, observation,
+                                                    change_percent=self.change_percent)
+        self.reward += self.reward_calculator(next_state, observation)
+        done = bool(self.done_condition(self.reward)) or self.cursor >= self.prices.shape[1] - 1
+        info = {
+            'portfolio_value': next_state.portfolio_value,
+            'margin_cash': next_state.margin_cash
+        }
+        return StepInfo(observation=observation, reward=self.reward, done=done, info=info)
+
+    def reset(self):
+        """
+        Resets the state of the environment.
+        """
+        self.state.reset()
+        self.cursor = -1
+        self.reward = 0
+
+    def render(self, mode='human'):
+        raise NotImplementedError
+
+    def close(self):
+        return
+
+    def seed(self, seed=None):
+        """
+        Seed the action space sampler.
+
+        Args:
+            seed(int): random seed
+
+        Returns:
+            list: seeds used
+        """
+        return self.action_space.seed(seed)
+
+
+__all__ = [
+    'MultiSymbolFuturesMarketEnv'
+]
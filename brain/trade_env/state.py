@@ -75,6 +75,41 @@ class PortfolioState(SlottedObject):
         """
         return self.position_holding.total_margin / self.portfolio_value if self.portfolio_value else 0
 
+    def copy(self):
+        """
+        Slot-wise copy, a cheap replacement of deepcopy.
+
+        Returns:
+            PortfolioState: copied state
+        """
+        state = self.__class__.__new__(self.__class__)
+        state.margin_cash = self.margin_cash
+        state.position_holding = self.position_holding.copy()
+        state.portfolio_value = self.portfolio_value
+        state.multiplier = self.multiplier
+        state.margin_rate = self.margin_rate
+        return state
+
+    def checkpoint(self):
+        """
+        Checkpoint of current state as a flat tuple, which can be used to undo later transitions.
+
+        Returns:
+            tuple: margin cash, portfolio value, multiplier, margin rate and the position checkpoint fields
+        """
+        return (self.margin_cash, self.portfolio_value, self.multiplier, self.margin_rate) + \
+            self.position_holding.checkpoint()
+
+    def restore(self, checkpoint):
+        """
+        Restore state from checkpoint in place.
+
+        Args:
+            checkpoint(tuple): checkpoint generated by self.checkpoint
+        """
+        self.margin_cash, self.portfolio_value, self.multiplier, self.margin_rate = checkpoint[:4]
+        self.position_holding.restore(checkpoint[4:])
+
     def evaluate(self, price=None):
         """
         Evaluate portfolio value according to price input.
@@ -106,7 +141,9 @@ class PortfolioState(SlottedObject):
         multiplier = multiplier or self.multiplier
         margin_rate = margin_rate or self.margin_rate
         portfolio_added = self.position_holding.update(trade=trade, multiplier=multiplier, margin_rate=margin_rate)
-        self.portfolio_value += portfolio_added
+        # 手续费与滑点从组合价值中扣除
+        costs = (trade.commission or 0) + (trade.slippage or 0)
+        self.portfolio_value += portfolio_added - costs
         self.margin_cash = self.portfolio_value - self.position_holding.total_margin
 
     def feasible_open_quantity(self, margin_cash=None):
@@ -4,85 +4,356 @@
 #     File:
 # **********************************************************************************#
 """
-from copy import deepcopy
+import numpy as np
 from . base import (
-    TradingAction
+    ACTION_DIRECTIONS,
+    ACTION_OFFSETS,
+    ACTION_LONG_SHORT,
+    TradingActionCode,
+    encode_action,
+    encode_actions
 )
+from . batch_state import BatchPortfolioState
 from .. trade.trade import Trade
 
 
-def trading_action_transition(action, state, price, change_percent=0.1):
+_ACTION_DIRECTIONS = np.array(ACTION_DIRECTIONS)
+_ACTION_OFFSETS = np.array(ACTION_OFFSETS)
+
+
+def _trade(state, direction, offset_flag, quantity, price, commission=None, slippage=None):
+    """
+    Trade of the portfolio state symbol filled at price, with costs charged on its market value.
+    """
+    market_value = quantity * price * state.multiplier
+    return Trade(order_id=None,
+                 symbol=state.position_holding.symbol,
+                 direction=direction,
+                 offset_flag=offset_flag,
+                 transact_amount=quantity,
+                 transact_price=price,
+                 filled_time=None,
+                 commission=commission.calculate_futures_commission(market_value, offset_flag) if commission else 0,
+                 slippage=slippage.calculate_futures_slippage(market_value) if slippage else 0)
+
+
+def _trade_costs(offset, amount, price, multiplier, commission=None, slippage=None):
+    """
+    Commission and slippage of a batch of trades, same as the costs of _trade, None without costs.
+    """
+    if commission is None and slippage is None:
+        return None
+    market_value = amount * price * multiplier
+    costs = 0.
+    if commission is not None:
+        costs = costs + commission.calculate_futures_commissions(market_value, offset)
+    if slippage is not None:
+        costs = costs + slippage.calculate_futures_slippages(market_value)
+    return costs
+
+
+def trading_action_transition(action, state, price, change_percent=0.1, inplace=False,
+                              commission=None, slippage=None):
     """
     Trading action transition function.
 
     Args:
-        action(string): Trading actions
+        action(string or int): Trading action name or code
         state(PortfolioState): portfolio state
         price(float): current price
         change_percent(float): position change percent
+        inplace(boolean): whether to mutate the input state in place instead of a slot-wise copy,
+                          use state.checkpoint() and state.restore() to undo the transition
+        commission(Commission): commission charged on trades, free if None
+        slippage(Slippage): slippage charged on trades, free if None
 
     Returns:
         PortfolioState: updated portfolio state
     """
-    next_state = deepcopy(state)
+    next_state = state if inplace else state.copy()
     next_state.evaluate(price)
     reference_position_proportion = next_state.position_proportion
     reference_portfolio_value = next_state.portfolio_value
     delta_cash = reference_portfolio_value * change_percent
 
-    if action in [TradingAction.BUY, TradingAction.SHORT]:
+    code = encode_action(action)
+    offset = ACTION_OFFSETS[code] if code >= 0 else 0
+    if offset == 1:
         if reference_position_proportion > 1 - change_percent:
             return next_state
-        open_quantity = next_state.feasible_open_quantity(margin_cash=delta_cash)
-        if open_quantity:
-            if action == TradingAction.BUY:
-                trade = Trade(order_id=None,
-                              symbol=next_state.position_holding.symbol,
-                              direction=1,
-                              offset_flag='open',
-                              transact_amount=open_quantity,
-                              transact_price=price,
-                              filled_time=None,
-                              commission=0,
-                              slippage=0)
-                next_state.update(trade)
-            else:
-                trade = Trade(order_id=None,
-                              symbol=next_state.position_holding.symbol,
-                              direction=-1,
-                              offset_flag='open',
-                              transact_amount=open_quantity,
-                              transact_price=price,
-                              filled_time=None,
-                              commission=0,
-                              slippage=0)
-                next_state.update(trade)
-    elif action in [TradingAction.SELL, TradingAction.COVER]:
-        if action == TradingAction.SELL:
-            close_quantity = next_state.feasible_close_quantity(target_cash=delta_cash, long_short='long')
-            if close_quantity:
-                trade = Trade(order_id=None,
-                              symbol=next_state.position_holding.symbol,
-                              direction=-1,
-                              offset_flag='close',
-                              transact_amount=close_quantity,
-                              transact_price=price,
-                              filled_time=None,
-                              commission=0,
-                              slippage=0)
-                next_state.update(trade)
-        else:
-            close_quantity = next_state.feasible_close_quantity(target_cash=delta_cash, long_short='short')
-            if close_quantity:
-                trade = Trade(order_id=None,
-                              symbol=next_state.position_holding.symbol,
-                              direction=1,
-                              offset_flag='close',
-                              transact_amount=close_quantity,
-                              transact_price=price,
-                              filled_time=None,
-                              commission=0,
-                              slippage=0)
-                next_state.update(trade)
+        quantity = next_state.feasible_open_quantity(margin_cash=delta_cash)
+    elif offset == -1:
+        quantity = next_state.feasible_close_quantity(target_cash=delta_cash, long_short=ACTION_LONG_SHORT[code])
+    else:
+        quantity = 0
+    if quantity:
+        next_state.update(_trade(next_state, ACTION_DIRECTIONS[code], 'open' if offset == 1 else 'close',
+                                 quantity, price, commission=commission, slippage=slippage))
+    next_state.evaluate(price)
+    return next_state
+
+
+def _feasible_quantities(portfolio_value, margin_cash, total_margin, price,
+                         long_amount, short_amount, multiplier, margin_rate, change_percent):
+    """
+    Quantities traded by each trading action on evaluated batch portfolio arrays,
+    by the rules of trading_action_transition.
+
+    Returns:
+        array: quantities of shape (N, number of trading actions), indexed by action code
+    """
+    delta_cash = portfolio_value * change_percent
+    cash = np.where(delta_cash != 0, delta_cash, margin_cash)
+    valid = (margin_rate != 0) & (multiplier != 0) & (price != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position_proportion = np.where(portfolio_value != 0, total_margin / portfolio_value, 0.)
+        quantity = np.where(valid, np.trunc(cash / margin_rate / multiplier / price), 0.)
+    quantities = np.zeros((quantity.size, len(ACTION_OFFSETS)))
+    open_quantity = np.where(position_proportion > 1 - change_percent, 0., quantity)
+    quantities[:, TradingActionCode.BUY] = open_quantity
+    quantities[:, TradingActionCode.SHORT] = open_quantity
+    quantities[:, TradingActionCode.SELL] = np.minimum(quantity, long_amount)
+    quantities[:, TradingActionCode.COVER] = np.minimum(quantity, short_amount)
+    return quantities
+
+
+def batch_feasible_actions(state, price, change_percent=0.1):
+    """
+    Feasible quantities and mask of all trading actions for all environments in one pass,
+    same rules as trading_action_transition, without mutating the state.
+
+    Args:
+        state(BatchPortfolioState): batch portfolio state
+        price(float or array): current price
+        change_percent(float): position change percent
+
+    Returns:
+        array, array: quantities and boolean mask of shape (N, number of trading actions), indexed by
+                      action code, actions trading nothing are infeasible except FAIR
+    """
+    price = np.broadcast_to(np.asarray(price, dtype=np.float64), state.price.shape)
+    multiplier, margin_rate = state.multiplier, state.margin_rate
+    long_market_value = price * state.long_amount * multiplier
+    short_market_value = price * state.short_amount * multiplier
+    cost_value = multiplier * (state.long_cost * state.long_amount - state.short_cost * state.short_amount)
+    value = np.where(state.value == 0, cost_value, state.value)
+    portfolio_value = state.portfolio_value + (long_market_value - short_market_value - value)
+    total_margin = long_market_value * margin_rate + short_market_value * margin_rate
+    quantities = _feasible_quantities(portfolio_value, portfolio_value - total_margin, total_margin, price,
+                                      state.long_amount, state.short_amount, multiplier, margin_rate,
+                                      change_percent)
+    mask = quantities != 0
+    mask[:, TradingActionCode.FAIR] = True
+    return quantities, mask
+
+
+def batch_trading_action_transition(actions, state, price, change_percent=0.1, commission=None, slippage=None):
+    """
+    Vectorized trading action transition, same rules as trading_action_transition
+    applied to all environments of the batch state in place.
+
+    Args:
+        actions(array of string or int): trading action names or codes, one for each environment
+        state(BatchPortfolioState): batch portfolio state
+        price(float or array): current price
+        change_percent(float): position change percent
+        commission(Commission): commission charged on trades, free if None
+        slippage(Slippage): slippage charged on trades, free if None
+
+    Returns:
+        BatchPortfolioState: updated batch portfolio state
+    """
+    codes = encode_actions(actions)
+    state.evaluate(price)
+    quantities = _feasible_quantities(state.portfolio_value, state.margin_cash, state.total_margin, state.price,
+                                      state.long_amount, state.short_amount, state.multiplier,
+                                      state.margin_rate, change_percent)
+    valid = codes >= 0
+    is_open = np.where(valid, _ACTION_OFFSETS[codes], 0) == 1
+    saturated = is_open & (state.position_proportion > 1 - change_percent)
+    amount = np.where(valid, quantities[np.arange(codes.size), codes], 0.)
+    direction = np.where(valid, _ACTION_DIRECTIONS[codes], 0)
+    offset = np.where(is_open, 1, -1)
+    state.update(direction, offset, amount, price,
+                 costs=_trade_costs(offset, amount, state.price, state.multiplier, commission, slippage))
+    state.evaluate(price, mask=~saturated)
+    return state
+
+
+def multi_symbol_action_transition(actions, state, price, change_percent=0.1, commission=None, slippage=None):
+    """
+    Trading action transition of one portfolio over a universe of symbols in place, each symbol follows
+    the rules of trading_action_transition against the shared portfolio value, and opens of all symbols
+    together use at most the shared margin cash.
+
+    Args:
+        actions(array of string or int): trading action names or codes, one for each symbol
+        state(MultiSymbolPortfolioState): multi-symbol portfolio state
+        price(array): current price of each symbol
+        change_percent(float): position change percent
+        commission(Commission): commission charged on trades, free if None
+        slippage(Slippage): slippage charged on trades, free if None
+
+    Returns:
+        MultiSymbolPortfolioState: updated multi-symbol portfolio state
+    """
+    codes = encode_actions(actions)
+    state.evaluate(price)
+    positions, size = state.positions, len(state)
+    quantities = _feasible_quantities(np.full(size, state.portfolio_value), np.full(size, state.margin_cash),
+                                      np.full(size, state.total_margin), positions.price,
+                                      positions.long_amount, positions.short_amount, positions.multiplier,
+                                      positions.margin_rate, change_percent)
+    valid = codes >= 0
+    is_open = np.where(valid, _ACTION_OFFSETS[codes], 0) == 1
+    amount = np.where(valid, quantities[np.arange(size), codes], 0.)
+    opening = is_open & (amount != 0)
+    delta_cash = state.portfolio_value * change_percent
+    if opening.any() and opening.sum() * delta_cash > state.margin_cash:
+        budget = max(state.margin_cash, 0.) / opening.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shared = np.trunc(budget / positions.margin_rate / positions.multiplier / positions.price)
+        amount = np.where(opening, np.minimum(amount, shared), amount)
+    direction = np.where(valid, _ACTION_DIRECTIONS[codes], 0)
+    offset = np.where(is_open, 1, -1)
+    state.update(direction, offset, amount, price,
+                 costs=_trade_costs(offset, amount, positions.price, positions.multiplier, commission, slippage))
+    state.evaluate(price)
+    return state
+
+
+def _target_amounts(target, portfolio_value, price, multiplier, margin_rate):
+    """
+    Signed position amount whose margin is the target proportion of portfolio value.
+    """
+    unit = price * multiplier * margin_rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(unit != 0, np.trunc(target * portfolio_value / unit), 0.)
+
+
+def target_position_transition(target, state, price, inplace=False, commission=None, slippage=None):
+    """
+    Rebalance the portfolio to the target signed exposure in one step: close the opposite and
+    surplus positions first, then open the missing amount within the margin cash.
+
+    Args:
+        target(float): target exposure, signed margin proportion of portfolio value, positive for long
+        state(PortfolioState): portfolio state
+        price(float): current price
+        inplace(boolean): whether to mutate the input state in place instead of a slot-wise copy
+        commission(Commission): commission charged on trades, free if None
+        slippage(Slippage): slippage charged on trades, free if None
+
+    Returns:
+        PortfolioState: updated portfolio state
+    """
+    next_state = state if inplace else state.copy()
+    next_state.evaluate(price)
+    position = next_state.position_holding
+    target_amount = int(_target_amounts(target, next_state.portfolio_value, price,
+                                        next_state.multiplier, next_state.margin_rate))
+    target_long, target_short = max(target_amount, 0), max(-target_amount, 0)
+    legs = [(-1, 'close', position.long_amount - target_long),
+            (1, 'close', position.short_amount - target_short)]
+    for direction, offset_flag, quantity in legs:
+        if quantity > 0:
+            next_state.update(_trade(next_state, direction, offset_flag, quantity, price,
+                                     commission=commission, slippage=slippage))
+    open_quantity = max(next_state.feasible_open_quantity(), 0)
+    legs = [(1, 'open', min(target_long - position.long_amount, open_quantity)),
+            (-1, 'open', min(target_short - position.short_amount, open_quantity))]
+    for direction, offset_flag, quantity in legs:
+        if quantity > 0:
+            next_state.update(_trade(next_state, direction, offset_flag, quantity, price,
+                                     commission=commission, slippage=slippage))
     next_state.evaluate(price)
     return next_state
+
+
+def batch_target_position_transition(targets, state, price, commission=None, slippage=None):
+    """
+    Vectorized target_position_transition applied to all environments of the batch state in place.
+
+    Args:
+        targets(array): target exposures, one for each environment
+        state(BatchPortfolioState): batch portfolio state
+        price(float or array): current price
+        commission(Commission): commission charged on trades, free if None
+        slippage(Slippage): slippage charged on trades, free if None
+
+    Returns:
+        BatchPortfolioState: updated batch portfolio state
+    """
+    state.evaluate(price)
+    target_amount = _target_amounts(np.asarray(targets, dtype=np.float64), state.portfolio_value,
+                                    state.price, state.multiplier, state.margin_rate)
+    target_long, target_short = np.maximum(target_amount, 0), np.maximum(-target_amount, 0)
+    close_long = np.maximum(state.long_amount - target_long, 0)
+    close_short = np.maximum(state.short_amount - target_short, 0)
+    state.update(-1, -1, close_long, price, costs=_trade_costs(-1, close_long, state.price, state.multiplier,
+                                                                commission, slippage))
+    state.update(1, -1, close_short, price, costs=_trade_costs(-1, close_short, state.price, state.multiplier,
+                                                                commission, slippage))
+    open_quantity = np.maximum(state.feasible_open_quantity(), 0)
+    open_long = np.minimum(np.maximum(target_long - state.long_amount, 0), open_quantity)
+    open_short = np.minimum(np.maximum(target_short - state.short_amount, 0), open_quantity)
+    state.update(1, 1, open_long, price, costs=_trade_costs(1, open_long, state.price, state.multiplier,
+                                                             commission, slippage))
+    state.update(-1, 1, open_short, price, costs=_trade_costs(1, open_short, state.price, state.multiplier,
+                                                               commission, slippage))
+    state.evaluate(price)
+    return state
+
+
+def mark_to_market_path(state, prices):
+    """
+    Mark the portfolio state to market along a path of prices in one vectorized pass,
+    same as evaluating it at each price in turn, the state is left at the last price in place.
+
+    Args:
+        state(PortfolioState): portfolio state
+        prices(array): prices of the following bars
+
+    Returns:
+        BatchPortfolioState: portfolio states after each bar, one row for each price
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    size = prices.size
+    position = state.position_holding
+    multiplier, margin_rate = state.multiplier, state.margin_rate
+    long_market_value = prices * position.long_amount * multiplier
+    short_market_value = prices * position.short_amount * multiplier
+    cost_value = multiplier * (position.long_cost * position.long_amount - position.short_cost * position.short_amount)
+    values = long_market_value - short_market_value
+    previous_values = np.empty(size)
+    previous_values[0], previous_values[1:] = position.value, values[:-1]
+    previous_values[previous_values == 0] = cost_value
+    # 逐bar累加, 与逐步evaluate的浮点结果一致
+    accumulated = np.empty(size + 1)
+    accumulated[0] = state.portfolio_value
+    np.subtract(values, previous_values, out=accumulated[1:])
+    portfolio_value = np.cumsum(accumulated)[1:]
+    long_margin = long_market_value * margin_rate
+    short_margin = short_market_value * margin_rate
+    constants = np.empty((6, size))
+    constants.T[:] = (position.long_amount, position.short_amount, position.long_cost, position.short_cost,
+                      multiplier, margin_rate)
+    # 路径状态仅用于计算奖励, 跳过BatchPortfolioState初始化时的checkpoint
+    path = BatchPortfolioState.__new__(BatchPortfolioState)
+    path.margin_cash = portfolio_value - (long_margin + short_margin)
+    path.portfolio_value = portfolio_value
+    path.price = prices
+    path.long_amount, path.short_amount, path.long_cost, path.short_cost, path.multiplier, path.margin_rate = \
+        constants
+    path.long_margin = long_margin
+    path.short_margin = short_margin
+    path.value = values
+    path.profit = values - cost_value
+    position.price = float(prices[-1])
+    position.long_margin = float(long_margin[-1])
+    position.short_margin = float(short_margin[-1])
+    position.profit = float(path.profit[-1])
+    position.value = float(values[-1])
+    state.portfolio_value = float(portfolio_value[-1])
+    state.margin_cash = float(path.margin_cash[-1])
+    return path
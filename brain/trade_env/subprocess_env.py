@@ -0,0 +1,146 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Subprocess vectorized market environment.
+# **********************************************************************************#
+"""
+import numpy as np
+from utils.concurrent import PersistentProcessPool
+from utils.exceptions import Exceptions
+from . base import encode_actions
+from . step_info import StepInfo
+from . state_transition import trading_action_transition
+
+
+COMMAND_RESET = 0
+COMMAND_STEP = 1
+
+
+def default_env_step(env, action):
+    """
+    Step a FuturesMarketEnv by trading_action_transition at the close price of the pushed bar.
+
+    Args:
+        env(FuturesMarketEnv): environment
+        action(int): trading action code
+
+    Returns:
+        StepInfo: step info
+    """
+    state_transition = (lambda a, s: trading_action_transition(a, s, env.bar_quote.current(), inplace=True))
+    return env.step(action, state_transition=state_transition)
+
+
+def _write_observation(row, observation):
+    """
+    Write observation into its shared row, zeros if it is None.
+    """
+    if observation is None:
+        row[:] = 0
+    elif np.size(observation) != row.size:
+        raise Exceptions.INVALID_OBSERVATION_SIZE
+    else:
+        row[:] = np.reshape(observation, row.shape)
+
+
+def _env_worker_initializer(arrays, env_fn, step_fn, env_indices):
+    """
+    Build the environments owned by one worker, and return its command handler.
+
+    Args:
+        arrays(SharedArrays): shared arrays
+        env_fn(func): environment factory with input the environment index
+        step_fn(func): step function with inputs environment and action code
+        env_indices(list of int): indices of environments owned by the worker
+
+    Returns:
+        func: command handler
+    """
+    envs = [env_fn(index) for index in env_indices]
+    observations, rewards, dones, actions = \
+        arrays['observations'], arrays['rewards'], arrays['dones'], arrays['actions']
+
+    def handler(command):
+        if command == COMMAND_RESET:
+            for index, env in zip(env_indices, envs):
+                _write_observation(observations[index], env.reset())
+                rewards[index], dones[index] = 0, False
+        elif command == COMMAND_STEP:
+            for index, env in zip(env_indices, envs):
+                step_info = step_fn(env, int(actions[index]))
+                done = bool(step_info.done) or getattr(env.bar_quote, 'exhausted', False)
+                _write_observation(observations[index], step_info.observation)
+                rewards[index], dones[index] = step_info.reward, done
+                if done:
+                    env.reset()
+
+    return handler
+
+
+class SubprocessVectorEnv(object):
+    """
+    Vectorized environments stepped by long-lived worker processes, each owning several
+    FuturesMarketEnv instances. Actions, observations, rewards and dones are exchanged
+    through one shared memory block, stepping all environments costs one synchronization.
+    """
+    def __init__(self, env_fn, num_envs, observation_shape, num_workers=None, step_fn=None, timeout=None):
+        """
+        Args:
+            env_fn(func): picklable environment factory with input the environment index
+            num_envs(int): number of environments
+            observation_shape(tuple): shape of one observation
+            num_workers(int): number of worker processes, cpu count by default
+            step_fn(func): picklable step function with inputs environment and action code
+            timeout(float): timeout of each synchronization
+        """
+        num_workers = min(num_envs, num_workers or PersistentProcessPool.DEFAULT_PROCESSORS)
+        specs = {
+            'observations': ((num_envs,) + tuple(observation_shape), np.float64),
+            'rewards': ((num_envs,), np.float64),
+            'dones': ((num_envs,), np.bool_),
+            'actions': ((num_envs,), np.int64)
+        }
+        args_batch = [(env_fn, step_fn or default_env_step, list(indices))
+                      for indices in np.array_split(np.arange(num_envs), num_workers)]
+        self.num_envs = num_envs
+        self._pool = PersistentProcessPool(_env_worker_initializer, args_batch, specs, timeout=timeout)
+
+    def step(self, actions):
+        """
+        Step all environments, environments which are done are reset automatically.
+        Returned arrays are views of the shared memory and are overwritten by the next step.
+
+        Args:
+            actions(list of string or int): trading action names or codes, one for each environment
+
+        Returns:
+            StepInfo: step info whose observation, reward and done are arrays of length N
+        """
+        self._pool.arrays['actions'][:] = encode_actions(actions)
+        self._pool.execute(COMMAND_STEP)
+        return StepInfo(observation=self._pool.arrays['observations'],
+                        reward=self._pool.arrays['rewards'],
+                        done=self._pool.arrays['dones'],
+                        info=dict())
+
+    def reset(self):
+        """
+        Reset all environments.
+
+        Returns:
+            array: initial observations
+        """
+        self._pool.execute(COMMAND_RESET)
+        return self._pool.arrays['observations']
+
+    def close(self):
+        """
+        Stop the workers.
+        """
+        self._pool.close()
+
+
+__all__ = [
+    'SubprocessVectorEnv',
+    'default_env_step'
+]
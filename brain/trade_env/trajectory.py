@@ -0,0 +1,217 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Trajectory recorder.
+# **********************************************************************************#
+"""
+import os
+import glob
+import numpy as np
+from utils.exceptions import *
+from . base import encode_action, encode_actions
+
+
+TRAJECTORY_COLUMNS = [
+    'observation',
+    'action',
+    'reward',
+    'done',
+    'portfolio_value',
+    'margin_cash',
+    'long_amount',
+    'short_amount'
+]
+SCALAR_COLUMN_DTYPES = {
+    'reward': np.float64,
+    'done': np.bool_,
+    'portfolio_value': np.float64,
+    'margin_cash': np.float64,
+    'long_amount': np.float64,
+    'short_amount': np.float64
+}
+
+
+class TrajectoryRecorder(object):
+    """
+    Trajectory recorder appending steps into preallocated columns, which grow by doubling.
+
+    Full chunks are flushed to compressed .npz files, {directory}/{prefix}_{chunk}.npz,
+    and load_trajectory concatenates them back into columns.
+    """
+    def __init__(self, observation_shape=None, capacity=1024, directory=None, chunk_size=None,
+                 prefix='trajectory', action_dtype=None, observation_dtype=np.float64):
+        """
+        Args:
+            observation_shape(tuple): shape of one observation, inferred from the first step if None
+            capacity(int): initial number of rows
+            directory(string): directory of flushed chunks, kept in memory if None
+            chunk_size(int): number of rows of each flushed chunk, flushed manually if None
+            prefix(string): file prefix of chunks
+            action_dtype(dtype): dtype of actions, inferred from the first step if None: int8 for trading
+                                 action names or codes, float64 for float actions such as target exposures
+            observation_dtype(dtype): dtype of observations
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.prefix = prefix
+        self.action_dtype = None if action_dtype is None else np.dtype(action_dtype)
+        self.observation_dtype = np.dtype(observation_dtype)
+        self.observation_shape = None if observation_shape is None else tuple(observation_shape)
+        self.size = 0
+        self.chunks = 0
+        self._columns = dict()
+        if self.observation_shape is not None and self.action_dtype is not None:
+            self._allocate(self.observation_shape)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, column):
+        """
+        Recorded rows of the column which are not flushed yet, as a view.
+        """
+        return self._columns[column][:self.size]
+
+    def _allocate(self, observation_shape, action_dtype=None):
+        self.observation_shape = observation_shape
+        if self.action_dtype is None:
+            self.action_dtype = np.dtype(action_dtype)
+        self._columns = {
+            'observation': np.empty((self.capacity,) + observation_shape, dtype=self.observation_dtype),
+            'action': np.empty(self.capacity, dtype=self.action_dtype)
+        }
+        for column, dtype in SCALAR_COLUMN_DTYPES.items():
+            self._columns[column] = np.empty(self.capacity, dtype=dtype)
+
+    def _reserve(self, rows):
+        """
+        Make room for rows, doubling the columns if full.
+        """
+        required = self.size + rows
+        if required <= self.capacity:
+            return
+        capacity = max(required, 2 * self.capacity)
+        for column, values in self._columns.items():
+            grown = np.empty((capacity,) + values.shape[1:], dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self._columns[column] = grown
+        self.capacity = capacity
+
+    def append(self, observation, action, reward, done, portfolio_value, margin_cash, long_amount, short_amount):
+        """
+        Append rows of steps, all inputs are scalars of one step or arrays of the same length.
+
+        Args:
+            observation(array): observations
+            action(array): actions, trading action names are stored as codes
+            reward(array): rewards
+            done(array): done flags
+            portfolio_value(array): portfolio values
+            margin_cash(array): margin cash
+            long_amount(array): long position amounts
+            short_amount(array): short position amounts
+        """
+        action = np.asarray(action)
+        rows = action.size if action.ndim else 1
+        observation = np.asarray(observation, dtype=self.observation_dtype)
+        if action.dtype.kind in 'USO':
+            action = np.asarray(encode_actions(action) if action.ndim else encode_action(action.item()))
+        if not self._columns:
+            shape = self.observation_shape or (observation.shape[1:] if action.ndim else observation.shape)
+            self._allocate(tuple(shape), np.float64 if action.dtype.kind == 'f' else np.int8)
+        if action.dtype.kind == 'f' and self.action_dtype.kind != 'f':
+            raise Exceptions.INVALID_ACTION_DTYPE
+        self._reserve(rows)
+        start, end = self.size, self.size + rows
+        self._columns['observation'][start:end] = observation.reshape((rows,) + self.observation_shape)
+        self._columns['action'][start:end] = action
+        self._columns['reward'][start:end] = reward
+        self._columns['done'][start:end] = done
+        self._columns['portfolio_value'][start:end] = portfolio_value
+        self._columns['margin_cash'][start:end] = margin_cash
+        self._columns['long_amount'][start:end] = long_amount
+        self._columns['short_amount'][start:end] = short_amount
+        self.size = end
+        if self.chunk_size and self.size >= self.chunk_size:
+            self.flush()
+
+    def record(self, step_info, env_snapshot):
+        """
+        Record one step of FuturesMarketEnv.
+
+        Args:
+            step_info(StepInfo): step info returned by the step
+            env_snapshot(EnvSnapshot): environment snapshot after the step
+        """
+        state = env_snapshot.state
+        position = state.position_holding
+        self.append(step_info.observation, env_snapshot.action, step_info.reward, step_info.done,
+                    state.portfolio_value, state.margin_cash, position.long_amount, position.short_amount)
+
+    def record_batch(self, step_info, actions, state):
+        """
+        Record one step of VectorFuturesMarketEnv, one row for each environment. Portfolio columns
+        are taken from the info of the step, collected before done environments are reset, and from
+        the state only if missing.
+
+        Args:
+            step_info(StepInfo): step info returned by the step
+            actions(array): actions of the step
+            state(BatchPortfolioState): batch portfolio state after the step
+        """
+        info = step_info.info
+        self.append(step_info.observation, actions, step_info.reward, step_info.done,
+                    info.get('portfolio_value', state.portfolio_value), info.get('margin_cash', state.margin_cash),
+                    info.get('long_amount', state.long_amount), info.get('short_amount', state.short_amount))
+
+    def flush(self):
+        """
+        Write recorded rows to a compressed chunk file and clear them from memory.
+
+        Returns:
+            string: chunk file path, None if nothing to flush
+        """
+        if not self.size or self.directory is None:
+            return None
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = os.path.join(self.directory, '{}_{:05d}.npz'.format(self.prefix, self.chunks))
+        np.savez_compressed(path, **{column: self[column] for column in TRAJECTORY_COLUMNS})
+        self.chunks += 1
+        self.size = 0
+        return path
+
+    def close(self):
+        """
+        Flush the remaining rows.
+        """
+        self.flush()
+
+
+def load_trajectory(directory, prefix='trajectory'):
+    """
+    Load flushed chunks of a trajectory.
+
+    Args:
+        directory(string): directory of chunks
+        prefix(string): file prefix of chunks
+
+    Returns:
+        dict: key-->column, value-->array of all rows
+    """
+    paths = sorted(glob.glob(os.path.join(directory, '{}_*.npz'.format(prefix))))
+    chunks = list()
+    for path in paths:
+        with np.load(path) as data:
+            chunks.append({column: data[column] for column in TRAJECTORY_COLUMNS})
+    if not chunks:
+        return dict()
+    return {column: np.concatenate([_[column] for _ in chunks]) for column in TRAJECTORY_COLUMNS}
+
+
+__all__ = [
+    'TrajectoryRecorder',
+    'load_trajectory',
+    'TRAJECTORY_COLUMNS'
+]
@@ -0,0 +1,154 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Vectorized market environment.
+# **********************************************************************************#
+"""
+import numpy as np
+from gym import Env
+from utils.exceptions import *
+from . action_space import TradingActionSpace
+from . batch_state import BatchPortfolioState
+from . state_transition import batch_trading_action_transition
+from . step_info import StepInfo
+from .. const import DEFAULT_MARGIN_CASH
+
+
+class VectorFuturesMarketEnv(Env):
+    """
+    N futures market environments stepped at once, with portfolio states kept in arrays.
+    Each environment follows FuturesMarketEnv stepped with trading_action_transition.
+    """
+    action_space = TradingActionSpace()
+
+    def __init__(self, prices, state, change_percent=0.1,
+                 reward_calculator=None, done_condition=None, reward_range=None, state_transition=None):
+        """
+        Initialize the vectorized environment.
+
+        Args:
+            prices(array): bar prices of shape (N, T), or (T,) shared by all environments
+            state(BatchPortfolioState): initial batch portfolio state of N environments
+            change_percent(float): position change percent of each trading action
+            reward_calculator(func): vectorized reward function with inputs batch state and observations
+            done_condition(func): vectorized done condition with input cumulative rewards
+            reward_range(tuple): reward range as (min, max)
+            state_transition(func): vectorized state transition with inputs actions, batch state and
+                                    observations, batch_trading_action_transition by default
+        """
+        num_envs = len(state)
+        prices = np.asarray(prices, dtype=np.float64)
+        if prices.ndim == 1:
+            prices = np.broadcast_to(prices, (num_envs, prices.size))
+        if prices.shape[0] != num_envs:
+            raise Exceptions.INVALID_INITIALIZE_PARAMETERS
+        if reward_range:
+            self.reward_range = reward_range
+        self.prices = prices
+        self.state = state
+        self.change_percent = change_percent
+        self.state_transition = state_transition or \
+            (lambda a, s, o: batch_trading_action_transition(a, s, o, change_percent=self.change_percent))
+        self.reward_calculator = reward_calculator or (lambda n_s, o: np.zeros(num_envs))
+        self.done_condition = done_condition or \
+            (lambda r: ~((self.reward_range[0] <= r) & (r <= self.reward_range[1])))
+        self.cursor = np.full(num_envs, -1, dtype=np.int64)
+        self.rewards = np.zeros(num_envs)
+        self._env_index = np.arange(num_envs)
+        self.action_space = TradingActionSpace()
+
+    @classmethod
+    def from_configs(cls, prices, num_envs=1, margin_cash=None,
+                     multiplier=1, margin_rate=1., **kwargs):
+        """
+        Instantiated by some parameter configs, same as FuturesMarketEnv.from_configs for each environment.
+
+        Args:
+            prices(array): bar prices of shape (N, T) or (T,)
+            num_envs(int): number of environments
+            margin_cash(float or array): initial margin cash
+            multiplier(int or array): multiplier
+            margin_rate(float or array): margin rate
+            **kwargs(**dict): other key-word arguments of the environment
+
+        Returns:
+            VectorFuturesMarketEnv: instance
+        """
+        margin_cash = DEFAULT_MARGIN_CASH if margin_cash is None else margin_cash
+        state = BatchPortfolioState.from_configs(num_envs=num_envs,
+                                                 margin_cash=margin_cash,
+                                                 multiplier=multiplier,
+                                                 margin_rate=margin_rate)
+        return cls(prices, state, **kwargs)
+
+    @property
+    def num_envs(self):
+        """
+        Number of environments.
+        """
+        return len(self.state)
+
+    def step(self, actions):
+        """
+        Run one time step of all environments, environments which are done are reset automatically
+        after their step info is collected.
+
+        Args:
+            actions(array): actions, one for each environment
+
+        Returns:
+            StepInfo: step info whose observation, reward and done are arrays of length N
+        """
+        self.cursor += 1
+        observations = self.prices[self._env_index, self.cursor]
+        next_state = self.state_transition(actions, self.state, observations)
+        self.rewards += self.reward_calculator(next_state, observations)
+        rewards = self.rewards.copy()
+        dones = self.done_condition(rewards) | (self.cursor >= self.prices.shape[1] - 1)
+        info = {
+            'portfolio_value': next_state.portfolio_value.copy(),
+            'margin_cash': next_state.margin_cash.copy(),
+            'long_amount': next_state.long_amount.copy(),
+            'short_amount': next_state.short_amount.copy()
+        }
+        if dones.any():
+            self.reset(mask=dones)
+        return StepInfo(observation=observations, reward=rewards, done=dones, info=info)
+
+    def reset(self, mask=None):
+        """
+        Resets the state of the environments.
+
+        Args:
+            mask(array of boolean): environments to be reset, all by default
+        """
+        self.state.reset(mask=mask)
+        if mask is None:
+            self.cursor[:] = -1
+            self.rewards[:] = 0
+        else:
+            self.cursor[mask] = -1
+            self.rewards[mask] = 0
+
+    def render(self, mode='human'):
+        raise NotImplementedError
+
+    def close(self):
+        return
+
+    def seed(self, seed=None):
+        """
+        Seed the action space sampler.
+
+        Args:
+            seed(int): random seed
+
+        Returns:
+            list: seeds used
+        """
+        return self.action_space.seed(seed)
+
+
+__all__ = [
+    'VectorFuturesMarketEnv'
+]
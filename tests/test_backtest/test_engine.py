@@ -0,0 +1,138 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test backtest engine.
+# **********************************************************************************#
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from unittest import TestCase
+from utils.exceptions import Exceptions
+from brain.backtest.engine import BacktestEngine
+
+
+def daily_data(prices):
+    """
+    Daily data in the output format of load_futures_daily_data.
+    """
+    index = [str(_.date()) for _ in pd.bdate_range('2019-01-01', periods=len(next(iter(prices.values()))))]
+    return {'closePrice': pd.DataFrame(prices, index=index)}
+
+
+def minute_data(symbol_times, days=3):
+    """
+    Minute data in the output format of load_futures_minute_data, bar times of each symbol given by minutes.
+    """
+    index = ['2019-01-0{}'.format(day + 2) for day in range(days)]
+    times, closes = dict(), dict()
+    for symbol, minutes in symbol_times.items():
+        times[symbol] = [np.array(['{} {:02d}:{:02d}'.format(date, 9 + _ // 60, _ % 60) for _ in minutes])
+                         for date in index]
+        closes[symbol] = [100. + day + np.arange(len(minutes)) for day in range(days)]
+    return {'closePrice': pd.DataFrame(closes, index=index), 'tradeTime': pd.DataFrame(times, index=index)}
+
+
+class TestBacktestEngine(TestCase):
+
+    def test_daily_backtest(self):
+        """
+        Test daily backtest with history views of the bars before the cursor, filled at the cursor close.
+        """
+        random_state = np.random.RandomState(3)
+        prices = np.round(3000 + np.cumsum(random_state.normal(0, 15, 120)))
+        data = daily_data({'RB1905': prices, 'HC1905': prices + 100})
+        targets = list()
+
+        def handle_data(context):
+            history = context.history(window=10, symbol='RB1905')
+            self.assertTrue(np.shares_memory(history, engine.bars))
+            self.assertEqual(history[-1], prices[context.cursor - 1])
+            self.assertEqual(context.current_price('RB1905'), prices[context.cursor - 1])
+            target = 0 if len(history) < 10 else (2 if history[-1] > history.mean() else -3)
+            context.order_to('RB1905', target)
+            targets.append(target)
+
+        config = {
+            'start': '2019-01-15',
+            'universe': ['RB1905', 'HC1905'],
+            'capital_base': 1e6,
+            'handle_data': handle_data,
+            'max_history_window': (10, 241)
+        }
+        engine = BacktestEngine(config, data=data, multiplier=10, margin_rate=0.1, fields=['closePrice'])
+        result = engine.run()
+        self.assertEqual(len(result['portfolio_value']), 110)
+        self.assertEqual(str(result['trading_days'][0]), '2019-01-15')
+        np.testing.assert_array_equal(result['positions'][:, 0], targets)
+        positions, closes = np.array(targets, dtype=float), prices[10:]
+        expected = 1e6 + np.concatenate([[0.], np.cumsum(positions[:-1] * np.diff(closes) * 10)])
+        np.testing.assert_allclose(result['portfolio_value'], expected, rtol=1e-12)
+        np.testing.assert_allclose(result['margin_cash'], expected - np.abs(positions) * closes * 10 * 0.1,
+                                   rtol=1e-12)
+
+    def test_minute_backtest(self):
+        """
+        Test minute bars of symbols are aligned and handle_data runs on refresh bars only.
+        """
+        data = minute_data({'RB1905': range(0, 30), 'HC1905': range(10, 40)})
+        calls = list()
+
+        def handle_data(context):
+            calls.append(context.now)
+            if len(calls) == 1:
+                context.order('HC1905', 1)
+
+        engine = BacktestEngine({'freq': 'm', 'universe': ['RB1905', 'HC1905'], 'refresh_rate': (2, 5),
+                                 'handle_data': handle_data}, data=data, fields=['closePrice'])
+        self.assertEqual(engine.bars.shape, (1, 2, 120))
+        self.assertTrue(np.isnan(engine.bars[0, 1, :10]).all() and np.isnan(engine.bars[0, 0, 30:40]).all())
+        result = engine.run()
+        self.assertEqual(len(calls), 16)
+        self.assertEqual(str(calls[0]), '2019-01-02T09:04')
+        self.assertEqual(len(result['trades']), 0)
+        self.assertEqual(str(calls[2]), '2019-01-02T09:14')
+        np.testing.assert_array_equal(result['positions'][:, 1], [0, 0, 0])
+
+        def handle_data(context):
+            if context.current_price('HC1905') and not context.position('HC1905'):
+                context.order('HC1905', 1)
+
+        engine = BacktestEngine({'freq': 'm', 'universe': ['RB1905', 'HC1905'], 'handle_data': handle_data,
+                                 'capital_base': 1e4}, data=data, fields=['closePrice'])
+        result = engine.run()
+        self.assertEqual(result['trades'][0].transact_price, 101.)
+        self.assertEqual(result['trades'][0].filled_time, datetime(2019, 1, 2, 9, 11))
+        np.testing.assert_array_equal(result['portfolio_value'], [1e4 + 28, 1e4 + 29, 1e4 + 30])
+
+    def test_post_trading_day_orders(self):
+        """
+        Test orders of post_trading_day are queued and filled at the close of the next refresh bar.
+        """
+        prices = 3000. + np.arange(12) * 10 * (-1) ** np.arange(12)
+        data = daily_data({'RB1905': prices, 'HC1905': prices + 100})
+        signals = list()
+
+        def post_trading_day(context):
+            close = context.history(window=1, symbol='RB1905')[-1]
+            self.assertEqual(close, prices[context.cursor])
+            signals.append(close)
+            self.assertEqual(context.order_to('RB1905', 1 if len(signals) % 2 else -1), [])
+            context.order_to('RB1905', 1 if len(signals) % 2 else -1)
+
+        engine = BacktestEngine({'universe': ['RB1905', 'HC1905'], 'capital_base': 1e6,
+                                 'post_trading_day': post_trading_day, 'max_history_window': 1},
+                                data=data, fields=['closePrice'])
+        result = engine.run()
+        trades = result['trades']
+        self.assertEqual(len(engine.pending), 1)
+        self.assertEqual([_.transact_price for _ in trades][::2], list(prices[1:]))
+        self.assertNotIn(signals[0], [_.transact_price for _ in trades])
+        np.testing.assert_array_equal(result['positions'][1:, 0], [1, -1] * 5 + [1])
+
+    def test_invalid_config(self):
+        """
+        Test unknown config keys are rejected.
+        """
+        with self.assertRaises(type(Exceptions.INVALID_BACKTEST_CONFIG)):
+            BacktestEngine({'unknown': 1}, data=daily_data({'RB1905': np.ones(3)}))
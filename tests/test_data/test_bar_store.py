@@ -0,0 +1,106 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test bar store.
+# **********************************************************************************#
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from unittest import TestCase, mock
+from brain.loader import database_api
+from brain.loader.bar_store import BarStore
+from brain.trade_env.bar_quote import BarQuote
+
+
+TRADING_DAYS = [datetime(2018, 3, 1) + timedelta(_) for _ in range(10)]
+
+
+def _fake_daily_loader(universe, trading_days, attributes=None):
+    """
+    Synthetic daily loader with the output of load_futures_daily_data.
+    """
+    index = pd.Index([_.strftime('%Y-%m-%d') for _ in trading_days], name='tradeDate')
+    base = np.array([_.day for _ in trading_days], dtype=float)
+    return {attribute: pd.DataFrame({symbol: base + 100 * position for position, symbol in enumerate(universe)},
+                                    index=index)
+            for attribute in attributes}
+
+
+def _fake_minute_loader(universe, trading_days, field=None, freq='m'):
+    """
+    Synthetic minute loader with the output of load_futures_minute_data, two bars per day.
+    """
+    index = [_.strftime('%Y-%m-%d') for _ in trading_days]
+    result = dict()
+    for name in field:
+        values = dict()
+        for symbol in universe:
+            if name == 'tradeTime':
+                values[symbol] = [np.array(['{} 09:01'.format(_), '{} 09:02'.format(_)]) for _ in index]
+            else:
+                values[symbol] = [np.array([day.day, day.day + 0.5]) for day in trading_days]
+        result[name] = pd.DataFrame(values, index=index, columns=universe)
+    return result
+
+
+class TestBarStore(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = BarStore(root=self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_daily_fill_and_read(self):
+        """
+        Test daily data is filled once and read back from memory maps.
+        """
+        with mock.patch.object(database_api, 'load_futures_daily_data', side_effect=_fake_daily_loader) as loader:
+            data = self.store.load_futures_daily_data(['RB1810', 'RM809'], TRADING_DAYS[:6], ['closePrice'])
+            data = self.store.load_futures_daily_data(['RB1810', 'RM809'], TRADING_DAYS[:6], ['closePrice'])
+            self.assertEqual(loader.call_count, 1)
+            self.store.load_futures_daily_data(['RB1810'], TRADING_DAYS[4:], ['closePrice'])
+            self.assertEqual(loader.call_count, 2)
+        np.testing.assert_array_equal(data['closePrice']['RM809'].values, [101, 102, 103, 104, 105, 106])
+        self.assertEqual(list(data['closePrice'].index[:1]), ['2018-03-01'])
+        bar_dict, dates, offsets = self.store.read('RB1810', ['closePrice'], start=TRADING_DAYS[2])
+        self.assertIsInstance(bar_dict['closePrice'].base, np.memmap)
+        np.testing.assert_array_equal(bar_dict['closePrice'], np.arange(3, 11))
+        self.assertEqual(len(dates), 8)
+        self.store.write('RB1810', {'closePrice': [0.]}, TRADING_DAYS[:1])
+        np.testing.assert_array_equal(bar_dict['closePrice'], np.arange(3, 11))
+        versions = [_ for _ in os.listdir(os.path.join(self.root, 'd', 'RB1810')) if _.startswith('v')]
+        self.assertEqual(len(versions), 2)
+        self.assertEqual(self.store.read('RB1810', ['closePrice'])[0]['closePrice'][0], 0.)
+
+    def test_versions_of_lowercase_symbols(self):
+        """
+        Test versions of symbols sorting after the version prefix survive the first writes.
+        """
+        for value in [1., 2., 3.]:
+            self.store.write('zn1902', {'closePrice': [value]}, TRADING_DAYS[:1])
+            bar_dict, dates, _ = self.store.read('zn1902', ['closePrice'])
+            np.testing.assert_array_equal(bar_dict['closePrice'], [value])
+        versions = [_ for _ in os.listdir(os.path.join(self.root, 'd', 'zn1902')) if _.startswith('v')]
+        self.assertEqual(len(versions), 2)
+
+    def test_minute_fill_and_bar_quote(self):
+        """
+        Test minute data is stored by days and served to BarQuote without copy.
+        """
+        with mock.patch.object(database_api, 'load_futures_minute_data', side_effect=_fake_minute_loader):
+            data = self.store.load_futures_minute_data(['RB1810'], TRADING_DAYS[:3],
+                                                       field=['closePrice', 'barTime'], freq='m')
+            bar_quote = BarQuote(window=3).load_history(symbol='RB1810', trading_days=TRADING_DAYS[:3],
+                                                        fields=['closePrice'], freq='m', bar_store=self.store)
+        np.testing.assert_array_equal(data['closePrice']['RB1810']['2018-03-02'], [2, 2.5])
+        self.assertEqual(list(data['barTime']['RB1810']['2018-03-03']), ['09:01', '09:02'])
+        self.assertEqual(len(bar_quote), 6)
+        np.testing.assert_array_equal(bar_quote.push(), [[1, 1.5, 2]])
+        self.assertIsInstance(bar_quote.observation.base, np.memmap)
+        self.assertEqual(bar_quote.time_index[0], np.datetime64('2018-03-01T09:01'))
@@ -0,0 +1,94 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test continuous contract.
+# **********************************************************************************#
+"""
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from unittest import TestCase, mock
+from brain.loader import database_api
+from brain.loader.bar_store import BarStore
+from brain.loader.continuous import ContinuousContractBuilder
+
+
+TRADING_DAYS = [datetime(2018, 9, 3) + timedelta(_) for _ in range(12)]
+CONTRACT_OFFSETS = {'RB1810': 100., 'RB1901': 110.}
+
+
+def _fake_daily_loader(universe, trading_days, attributes=None):
+    """
+    Synthetic daily loader, prices of each contract rise by 1 each day from its offset.
+    """
+    index = pd.Index([_.strftime('%Y-%m-%d') for _ in trading_days], name='tradeDate')
+    days = np.array([(_ - TRADING_DAYS[0]).days for _ in trading_days], dtype=float)
+    return {attribute: pd.DataFrame({symbol: CONTRACT_OFFSETS[symbol] + days for symbol in universe}, index=index)
+            for attribute in attributes}
+
+
+def _fake_main_contract_loader(contract_objects=None, trading_days=None, start=None, end=None):
+    """
+    Synthetic main contract loader, RB rolls from RB1810 to RB1901 on the sixth day.
+    """
+    index = [str(_)[:10] for _ in trading_days]
+    tickers = ['RB1810' if (pd.Timestamp(_) - TRADING_DAYS[0]).days < 5 else 'RB1901' for _ in trading_days]
+    return pd.DataFrame({'RB': tickers}, index=pd.Index(index, name='tradeDate'))
+
+
+class TestContinuousContract(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = BarStore(root=self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_build_and_cache(self):
+        """
+        Test main contracts are stitched, back-adjusted and extended only for new days.
+        """
+        with mock.patch.object(database_api, 'load_futures_daily_data', side_effect=_fake_daily_loader), \
+                mock.patch.object(database_api, 'load_futures_main_contract',
+                                  side_effect=_fake_main_contract_loader) as main_loader:
+            builder = ContinuousContractBuilder(self.store)
+            series = builder.build('RBM0', TRADING_DAYS[:8], fields=['closePrice', 'volume'])
+            np.testing.assert_array_equal(series['roll_index'], [5])
+            self.assertEqual(list(series['contracts'][4:6]), ['RB1810', 'RB1901'])
+            np.testing.assert_allclose(series['bars']['closePrice'],
+                                       np.concatenate([(100. + np.arange(5)) * 114. / 104.,
+                                                       110. + np.arange(5, 8)]))
+            np.testing.assert_array_equal(series['bars']['volume'][4:6], [104., 115.])
+            builder.build('RBM0', TRADING_DAYS[2:8], fields=['closePrice', 'volume'])
+            self.assertEqual(main_loader.call_count, 1)
+            series = ContinuousContractBuilder(self.store, method='difference').build(
+                'RBM0', TRADING_DAYS, fields=['closePrice', 'volume'])
+            self.assertEqual(main_loader.call_count, 2)
+            self.assertEqual(len(main_loader.call_args[1]['trading_days']), 4)
+            np.testing.assert_array_equal(series['bars']['closePrice'],
+                                          np.concatenate([110. + np.arange(5), 110. + np.arange(5, 12)]))
+            data = self.store.load_futures_daily_data(['RBM0', 'RB1810', 'RBM1'], TRADING_DAYS, ['closePrice'])
+        self.assertEqual(list(data['closePrice'].columns), ['RBM0', 'RB1810'])
+        np.testing.assert_allclose(data['closePrice']['RBM0'].values[-1], 121.)
+
+    def test_backfill_and_new_fields(self):
+        """
+        Test backfilled days re-stitch the next cached day and new fields re-stitch all cached days.
+        """
+        with mock.patch.object(database_api, 'load_futures_daily_data', side_effect=_fake_daily_loader), \
+                mock.patch.object(database_api, 'load_futures_main_contract', side_effect=_fake_main_contract_loader):
+            builder = ContinuousContractBuilder(self.store)
+            builder.build('RBM0', TRADING_DAYS[5:], fields=['closePrice', 'volume'])
+            builder.build('RBM0', TRADING_DAYS[:5], fields=['closePrice'])
+            series = builder.build('RBM0', TRADING_DAYS, fields=['closePrice'])
+            expected = np.concatenate([(100. + np.arange(5)) * 114. / 104., 110. + np.arange(5, 12)])
+            np.testing.assert_allclose(series['bars']['closePrice'], expected)
+            builder.build('RBM0', TRADING_DAYS[3:5], fields=['openPrice'])
+            series = builder.build('RBM0', TRADING_DAYS, fields=['openPrice', 'volume'])
+        np.testing.assert_allclose(series['bars']['openPrice'], expected)
+        np.testing.assert_array_equal(series['bars']['volume'], np.concatenate([100. + np.arange(5),
+                                                                                110. + np.arange(5, 12)]))
+        self.assertEqual(list(series['contracts']), ['RB1810'] * 5 + ['RB1901'] * 7)
@@ -2,12 +2,20 @@
 # **********************************************************************************#
 #     File:  Test action space.
 # **********************************************************************************#
+import numpy as np
 from unittest import TestCase
 from brain.trade_env.action_space import (
     LongShortSpace,
     TradingActionSpace
 )
-from brain.trade_env.base import TradingAction
+from brain.trade_env.base import (
+    TradingAction,
+    TradingActionCode,
+    encode_action,
+    encode_actions
+)
+from brain.trade_env.market_env import FuturesMarketEnv
+from brain.trade_env.state import PortfolioState
 
 
 class TestActionSpace(TestCase):
@@ -33,3 +41,42 @@ class TestActionSpace(TestCase):
         print(action_space.contains(TradingAction.SHORT))
         print(action_space.contains(TradingAction.COVER))
         print(action_space.contains(TradingAction.FAIR))
+
+    def test_trading_action_codes(self):
+        """
+        Test integer action codes are accepted along with names.
+        """
+        action_space = TradingActionSpace()
+        self.assertTrue(action_space.contains(TradingActionCode.COVER))
+        self.assertFalse(action_space.contains(5))
+        self.assertFalse(action_space.contains('__module__'))
+        self.assertEqual(encode_action(TradingAction.SHORT), TradingActionCode.SHORT)
+        self.assertEqual(encode_action('HOLD'), -1)
+        self.assertEqual(list(encode_actions(['SELL', 'FAIR', 'HOLD'])), [1, 4, -1])
+        self.assertEqual(list(encode_actions(np.array([0, 3, 7]))), [0, 3, -1])
+
+    def test_batch_sample_with_mask(self):
+        """
+        Test batch samples are reproducible and never infeasible.
+        """
+        action_space = TradingActionSpace(seed=7)
+        samples = action_space.sample(10000, codes=True)
+        self.assertEqual(set(samples.tolist()), {0, 1, 2, 3, 4})
+        np.testing.assert_array_equal(TradingActionSpace(seed=7).sample(10000, codes=True), samples)
+        self.assertIn(action_space.sample(), ['BUY', 'SELL', 'SHORT', 'COVER', 'FAIR'])
+
+        state = PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=5e5)
+        mask = TradingActionSpace.feasible_mask(state, 21000)
+        self.assertEqual(mask.tolist(), [True, False, True, False, True])
+        samples = action_space.sample(1000, mask=mask)
+        self.assertFalse(np.isin(samples, [TradingAction.SELL, TradingAction.COVER]).any())
+        masks = np.zeros((3, 5), dtype=bool)
+        masks[0, TradingActionCode.COVER] = True
+        self.assertEqual(action_space.sample(3, mask=masks, codes=True).tolist(), [3, 4, 4])
+        self.assertEqual(LongShortSpace(seed=0).sample(4, mask=[False, True]).tolist(), [-1] * 4)
+
+        market_env = FuturesMarketEnv()
+        market_env.seed(3)
+        first = market_env.action_space.sample(100)
+        market_env.seed(3)
+        np.testing.assert_array_equal(market_env.action_space.sample(100), first)
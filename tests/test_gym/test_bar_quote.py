@@ -0,0 +1,79 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test bar quote.
+# **********************************************************************************#
+"""
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from unittest import TestCase
+from brain.trade_env.bar_quote import BarQuote
+
+
+def _daily_data(length=20):
+    """
+    Synthetic output of load_futures_daily_data.
+    """
+    index = pd.Index(['2018{:04d}'.format(_) for _ in range(101, 101 + length)], name='tradeDate')
+    close = 3000 + np.arange(length, dtype=float)
+    return {
+        'closePrice': pd.DataFrame({'RB1810': close, 'RM809': close / 2}, index=index),
+        'openPrice': pd.DataFrame({'RB1810': close - 1, 'RM809': close / 2 - 1}, index=index),
+    }
+
+
+def _minute_data(days=3, bars=4):
+    """
+    Synthetic output of load_futures_minute_data.
+    """
+    index = ['2018-06-{:02d}'.format(_) for _ in range(11, 11 + days)]
+    close = [np.arange(bars, dtype=float) + 10 * day for day in range(days)]
+    trade_time = [np.array(['{} 09:{:02d}'.format(day, _) for _ in range(bars)]) for day in index]
+    return {
+        'closePrice': pd.DataFrame({'RB1810': close}, index=index),
+        'tradeTime': pd.DataFrame({'RB1810': trade_time}, index=index),
+    }
+
+
+class TestBarQuote(TestCase):
+
+    def test_daily_window_views(self):
+        """
+        Test daily observations are zero-copy windows.
+        """
+        bar_quote = BarQuote(window=5).load_history(_daily_data(), symbol='RB1810',
+                                                    fields=['openPrice', 'closePrice'])
+        observation = bar_quote.push()
+        self.assertEqual(observation.shape, (2, 5))
+        self.assertTrue(np.shares_memory(observation, bar_quote.bars))
+        np.testing.assert_array_equal(observation[1], 3000 + np.arange(5))
+        observation = bar_quote.push()
+        np.testing.assert_array_equal(observation[1], 3001 + np.arange(5))
+        self.assertEqual(bar_quote.current('closePrice'), 3005)
+        self.assertEqual(bar_quote.time_index[bar_quote.cursor], '20180106')
+        while not bar_quote.exhausted:
+            bar_quote.push()
+        self.assertRaises(Exception, bar_quote.push)
+        np.testing.assert_array_equal(bar_quote.reset()[1], 3000 + np.arange(5))
+
+    def test_minute_history(self):
+        """
+        Test minute history is flattened into one array.
+        """
+        bar_quote = BarQuote(window=2).load_history(_minute_data(), symbol='RB1810',
+                                                    fields=['closePrice'], freq='m')
+        self.assertEqual(len(bar_quote), 12)
+        self.assertEqual(bar_quote.time_index[4], '2018-06-12 09:00')
+        np.testing.assert_array_equal(bar_quote.bar_dict['closePrice'][3:6], [3, 10, 11])
+
+    def test_deepcopy_shares_history(self):
+        """
+        Test copies share the read-only history.
+        """
+        bar_quote = BarQuote(window=3).load_history(_daily_data(), symbol='RM809')
+        copied = deepcopy(bar_quote)
+        copied.push()
+        self.assertIs(copied.bars, bar_quote.bars)
+        self.assertNotEqual(copied.cursor, bar_quote.cursor)
+        self.assertFalse(bar_quote.bars.flags.writeable)
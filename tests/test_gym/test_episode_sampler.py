@@ -0,0 +1,56 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test episode sampler.
+# **********************************************************************************#
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from unittest import TestCase
+from brain.loader.trading_calendar import TradingCalendar
+from brain.trade_env.bar_quote import BarQuote
+from brain.trade_env.episode_sampler import EpisodeSampler
+from brain.trade_env.market_env import FuturesMarketEnv
+
+
+TRADING_DAYS = pd.bdate_range('2018-01-01', periods=250).to_pydatetime().tolist()
+
+
+class TestEpisodeSampler(TestCase):
+
+    def setUp(self):
+        self.calendar = TradingCalendar(TRADING_DAYS)
+        self.bar_quote = BarQuote(bar_dict={'closePrice': np.arange(250, dtype=float)}, window=5)
+        self.sampler = EpisodeSampler(self.bar_quote, 20, max_length=40, calendar=self.calendar, seed=0)
+
+    def test_calendar(self):
+        """
+        Test calendar lookups match the trading days.
+        """
+        self.assertEqual(self.calendar.index('2018-01-06'), 5)
+        self.assertEqual(self.calendar.shift('2018-01-03', 3), datetime(2018, 1, 8))
+        self.assertEqual(self.calendar.shift(datetime(2018, 1, 8), 3, forward=False), datetime(2018, 1, 3))
+        self.assertEqual(len(self.calendar.trading_days('2018-01-02', '2018-01-09')), 6)
+
+    def test_sample_and_episode(self):
+        """
+        Test episodes are within history and their bar quotes view the history.
+        """
+        starts, lengths = self.sampler.sample(10000)
+        self.assertTrue((starts >= 4).all() and (starts + lengths <= 250).all())
+        self.assertTrue((lengths >= 20).all() and (lengths <= 40).all())
+        starts, _ = self.sampler.sample(1000, start='2018-03-01', end='2018-06-29')
+        days = self.sampler.trading_day(starts)
+        self.assertTrue((days >= np.datetime64('2018-03-01')).all())
+        self.assertEqual(self.sampler.bar_index('2018-01-08'), 5)
+
+        episode = self.sampler.episode(100, 20)
+        self.assertTrue(np.shares_memory(episode.bars, self.bar_quote.bars))
+        np.testing.assert_array_equal(episode.push(), [[96, 97, 98, 99, 100]])
+        env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='RB1810', bar_quote=self.bar_quote)
+        observation = self.sampler.assign(env, 200, 20)
+        np.testing.assert_array_equal(observation, [[196, 197, 198, 199, 200]])
+        self.assertEqual(env.step('FAIR').observation[0, -1], 201)
+        np.testing.assert_array_equal(self.sampler.batch([3, 7], 3), [[3, 4, 5], [7, 8, 9]])
+        self.assertRaises(Exception, EpisodeSampler, self.bar_quote, 300)
@@ -0,0 +1,76 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test feature engine.
+# **********************************************************************************#
+"""
+import numpy as np
+from copy import copy
+from unittest import TestCase
+from brain.trade_env.bar_quote import BarQuote
+from brain.trade_env.features import FeatureEngine
+
+
+FEATURES = [('ma', 'closePrice', 5), ('ema', 'closePrice', 10), ('atr', 'closePrice', 14),
+            ('volatility', 'closePrice', 20), ('zscore', 'closePrice', 20), ('ema', 'openPrice', 1)]
+
+
+def _bar_dict(length=300):
+    """
+    Synthetic random walk bars.
+    """
+    random_state = np.random.RandomState(1)
+    close = 3000 + np.cumsum(random_state.normal(0, 10, size=length))
+    open_price = close + random_state.normal(0, 3, size=length)
+    return {
+        'openPrice': open_price,
+        'highPrice': np.maximum(open_price, close) + random_state.uniform(0, 5, size=length),
+        'lowPrice': np.minimum(open_price, close) - random_state.uniform(0, 5, size=length),
+        'closePrice': close,
+    }
+
+
+class TestFeatureEngine(TestCase):
+
+    def test_incremental_matches_bulk(self):
+        """
+        Test features fed bar by bar match the bulk features and the naive definitions.
+        """
+        bar_dict = _bar_dict()
+        bar_quote = BarQuote(bar_dict=bar_dict, feature_engine=FeatureEngine(FEATURES))
+        bulk = bar_quote.feature_history()
+        self.assertEqual(bulk.shape, (len(FEATURES), 300))
+        incremental = list()
+        while not bar_quote.exhausted:
+            bar_quote.push()
+            incremental.append(bar_quote.features.copy())
+        np.testing.assert_allclose(np.array(incremental).T, bulk, rtol=1e-9, atol=1e-12)
+
+        close = bar_dict['closePrice']
+        np.testing.assert_allclose(bulk[0, 4:], [close[_ - 4:_ + 1].mean() for _ in range(4, 300)])
+        self.assertTrue(np.isnan(bulk[0, :4]).all())
+        ema, alpha = [close[0]], 2. / 11
+        for value in close[1:]:
+            ema.append(ema[-1] + alpha * (value - ema[-1]))
+        np.testing.assert_allclose(bulk[1], ema)
+        returns = close[1:] / close[:-1] - 1
+        self.assertAlmostEqual(bulk[3, 100], returns[80:100].std())
+        self.assertAlmostEqual(bulk[4, 100], (close[100] - close[81:101].mean()) / close[81:101].std())
+        np.testing.assert_array_equal(bulk[5], bar_dict['openPrice'])
+
+    def test_jump_and_copy(self):
+        """
+        Test features are rebuilt when the cursor jumps, and copies own their state.
+        """
+        bar_quote = BarQuote(bar_dict=_bar_dict(), feature_engine=FeatureEngine(FEATURES))
+        bulk = bar_quote.feature_history()
+        bar_quote.reset(start=150)
+        np.testing.assert_allclose(bar_quote.features, bulk[:, 150])
+        copied = copy(bar_quote)
+        for _ in range(30):
+            bar_quote.push()
+        copied.push()
+        np.testing.assert_allclose(bar_quote.features, bulk[:, 180])
+        np.testing.assert_allclose(copied.features, bulk[:, 151])
+        self.assertEqual(FeatureEngine(FEATURES[:1]).names, ['ma_closePrice_5'])
+        self.assertRaises(Exception, FeatureEngine, [('macd', 'closePrice', 5)])
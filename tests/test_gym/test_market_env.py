@@ -4,8 +4,15 @@
 #     File:
 # **********************************************************************************#
 """
+import os
+import json
+import tempfile
+import numpy as np
 from unittest import TestCase
+from brain.trade_env.bar_quote import BarQuote
+from brain.trade_env.base import TradingAction
 from brain.trade_env.market_env import FuturesMarketEnv
+from brain.trade_env.state_transition import trading_action_transition
 
 
 class TestMarketEnv(TestCase):
@@ -16,3 +23,117 @@ class TestMarketEnv(TestCase):
         """
         market_env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902')
         print(market_env)
+
+    def test_checkpoint_and_reset(self):
+        """
+        Test repeated resets and rewinding to a checkpoint.
+        """
+        prices = 21000 + 10 * np.sin(np.arange(30))
+        market_env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                                   bar_quote=BarQuote(bar_dict={'closePrice': prices}))
+        state_transition = (lambda a, s: trading_action_transition(a, s, market_env.bar_quote.current(), inplace=True))
+        reward_calculator = (lambda n_s, o: n_s.portfolio_value - 1e6)
+        actions = [TradingAction.BUY, TradingAction.BUY, TradingAction.SHORT, TradingAction.SELL] * 5
+
+        def run(steps):
+            return [market_env.step(action, state_transition, reward_calculator).reward for action in steps]
+
+        observation = market_env.reset()
+        self.assertEqual(observation.shape, (1, 1))
+        self.assertEqual(observation[0, 0], prices[0])
+        initial = market_env.checkpoint()
+        first_rewards = run(actions[:8])
+        branch = market_env.checkpoint()
+        first_tail = run(actions[8:])
+        market_env.restore(branch)
+        self.assertEqual(run(actions[8:]), first_tail)
+        for _ in range(2):
+            market_env.reset()
+            self.assertEqual(market_env.checkpoint(), initial)
+            self.assertEqual(run(actions[:8]), first_rewards)
+        market_env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902',
+                                                   bar_quote=BarQuote(bar_dict={'closePrice': prices}, window=3))
+        market_env.step(TradingAction.FAIR)
+        np.testing.assert_array_equal(market_env.reset(), [prices[:3]])
+        np.testing.assert_array_equal(market_env.step(TradingAction.FAIR).observation, [prices[1:4]])
+
+    def test_action_repeat(self):
+        """
+        Test repeated steps are the same as stepping the action followed by FAIR bar by bar.
+        """
+        prices = 21000 + 50 * np.sin(np.arange(60) / 3.)
+
+        def make_env():
+            return FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                                 bar_quote=BarQuote(bar_dict={'closePrice': prices}, window=2))
+
+        def transition(env):
+            return lambda a, s: trading_action_transition(a, s, env.bar_quote.current(), inplace=True)
+
+        reward_calculator = (lambda n_s, o: n_s.portfolio_value - 1e6)
+        actions = [TradingAction.BUY, TradingAction.BUY, TradingAction.SELL, TradingAction.SELL,
+                   TradingAction.SHORT, TradingAction.FAIR, TradingAction.COVER] * 2
+        repeat_env, single_env = make_env(), make_env()
+        for action in actions:
+            step_info = repeat_env.step(action, transition(repeat_env), reward_calculator, repeat=4)
+            for bar_action in [action] + [TradingAction.FAIR] * 3:
+                expected = single_env.step(bar_action, transition(single_env), reward_calculator)
+            self.assertEqual(step_info.reward, expected.reward)
+            np.testing.assert_array_equal(step_info.observation, expected.observation)
+            self.assertEqual(repeat_env.checkpoint()[2:], single_env.checkpoint()[2:])
+        self.assertEqual(repeat_env.bar_quote.cursor, 56)
+        step_info = repeat_env.step(TradingAction.FAIR, transition(repeat_env), reward_calculator, repeat=10)
+        self.assertTrue(repeat_env.bar_quote.exhausted)
+        self.assertEqual(step_info.observation[0, -1], prices[-1])
+
+    def test_action_repeat_reward_calculators(self):
+        """
+        Test scalar reward calculators get one state per bar and batch ones the whole path at the price field.
+        """
+        prices = 21000 + 50 * np.sin(np.arange(40) / 3.)
+        bar_dict = {'closePrice': prices + 5, 'settlementPrice': prices}
+
+        def make_env():
+            return FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                                 bar_quote=BarQuote(bar_dict=bar_dict, window=2,
+                                                                    price_field='settlementPrice'))
+
+        def transition(env):
+            return lambda a, s: trading_action_transition(a, s, env.bar_quote.current(), inplace=True)
+
+        reward_calculator = (lambda n_s, o: n_s.position_holding.long_amount * (n_s.portfolio_value - 1e6))
+        batch_reward_calculator = (lambda n_s, o: n_s.long_amount * (n_s.portfolio_value - 1e6))
+        actions = [TradingAction.BUY, TradingAction.BUY, TradingAction.SELL, TradingAction.SELL,
+                   TradingAction.SHORT, TradingAction.FAIR, TradingAction.COVER]
+        scalar_env, batch_env, single_env = make_env(), make_env(), make_env()
+        for action in actions:
+            scalar_info = scalar_env.step(action, transition(scalar_env), reward_calculator, repeat=4)
+            batch_info = batch_env.step(action, transition(batch_env), reward_calculator, repeat=4,
+                                        batch_reward_calculator=batch_reward_calculator)
+            for bar_action in [action] + [TradingAction.FAIR] * 3:
+                expected = single_env.step(bar_action, transition(single_env), reward_calculator)
+            self.assertEqual(scalar_info.reward, expected.reward)
+            self.assertEqual(batch_info.reward, expected.reward)
+            self.assertEqual(batch_env.checkpoint()[2:], single_env.checkpoint()[2:])
+
+    def test_step_profiling(self):
+        """
+        Test step phases are recorded only when profiling is enabled.
+        """
+        market_env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902',
+                                                   bar_quote=BarQuote(bar_dict={'closePrice': np.arange(20.)}))
+        market_env.step(TradingAction.FAIR)
+        profiler = market_env.enable_profiling()
+        for _ in range(10):
+            market_env.step(TradingAction.FAIR)
+        market_env.disable_profiling()
+        market_env.step(TradingAction.FAIR)
+        summary = profiler.summary()
+        self.assertEqual(list(summary), ['bar_quote', 'state_transition', 'reward_calculator', 'step_info'])
+        self.assertTrue(all(item['calls'] == 10 for item in summary.values()))
+        self.assertAlmostEqual(sum(item['share'] for item in summary.values()), 1.)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profile.json')
+            profiler.dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['summary']['bar_quote']['calls'], 10)
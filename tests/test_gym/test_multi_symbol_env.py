@@ -0,0 +1,53 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test multi-symbol market environment.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from brain.trade_env.base import TradingAction
+from brain.trade_env.multi_symbol_env import MultiSymbolFuturesMarketEnv
+from brain.trade_env.state import PortfolioState
+from brain.trade_env.state_transition import trading_action_transition
+
+
+class TestMultiSymbolEnv(TestCase):
+
+    def test_single_symbol_matches_scalar(self):
+        """
+        Test a universe of one symbol follows the scalar transition.
+        """
+        random_state = np.random.RandomState(0)
+        prices = 21000 + np.cumsum(random_state.normal(0, 50, size=(1, 40)), axis=1)
+        actions = random_state.choice([TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT,
+                                       TradingAction.COVER, TradingAction.FAIR], size=40)
+        env = MultiSymbolFuturesMarketEnv.from_configs(prices, ['ZN1902'], margin_cash=5e5,
+                                                       multiplier=5, margin_rate=0.15)
+        state = PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=5e5)
+        for bar, action in enumerate(actions):
+            step_info = env.step([action])
+            trading_action_transition(action, state, prices[0, bar], inplace=True)
+            self.assertAlmostEqual(step_info.info['portfolio_value'], state.portfolio_value, places=6)
+            self.assertEqual(env.state.positions.long_amount[0], state.position_holding.long_amount)
+            self.assertEqual(env.state.positions.short_amount[0], state.position_holding.short_amount)
+        self.assertTrue(step_info.done)
+
+    def test_shared_margin(self):
+        """
+        Test opens of all symbols share the margin cash, and reset restores the portfolio.
+        """
+        num_symbols = 30
+        prices = np.tile(np.linspace(1000, 1100, 10), (num_symbols, 1))
+        env = MultiSymbolFuturesMarketEnv.from_configs(prices, ['S{}'.format(_) for _ in range(num_symbols)],
+                                                       margin_cash=1e6, multiplier=10, margin_rate=0.1)
+        for _ in range(5):
+            step_info = env.step([TradingAction.BUY] * num_symbols)
+            self.assertGreaterEqual(step_info.info['margin_cash'], 0)
+        self.assertTrue((env.state.positions.long_amount > 0).all())
+        self.assertAlmostEqual(env.state.portfolio_value,
+                               1e6 + (env.state.positions.profit.sum()), places=4)
+        self.assertLessEqual(env.state.position_proportion, 1.)
+        env.reset()
+        self.assertEqual(env.state.portfolio_value, 1e6)
+        self.assertEqual(env.state.positions.long_amount.sum(), 0)
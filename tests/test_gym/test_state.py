@@ -4,9 +4,10 @@
 #     File:
 # **********************************************************************************#
 """
+from copy import deepcopy
 from unittest import TestCase
 from brain.trade_env.state import PortfolioState
-from brain.trade_env.base import TradingAction
+from brain.trade_env.base import TradingAction, TradingActionCode
 from brain.trade_env.state_transition import trading_action_transition
 
 
@@ -56,3 +57,42 @@ class TestState(TestCase):
         print(cover_state.margin_cash, cover_state.portfolio_value,
               cover_state.position_proportion, cover_state.position_holding)
         print('\n')
+
+    def test_inplace_transition_and_restore(self):
+        """
+        Test in-place transition equals the copied one and can be undone by checkpoint.
+        """
+        portfolio_state = PortfolioState.from_configs(symbol='ZN1902',
+                                                      multiplier=5,
+                                                      margin_rate=0.15,
+                                                      margin_cash=5e5)
+        actions = [TradingAction.BUY, TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT,
+                   TradingAction.FAIR, TradingAction.COVER]
+        prices = [21100, 21000, 21050, 21000, 20900, 20990]
+        copied_state = portfolio_state
+        for action, price in zip(actions, prices):
+            expected_state = trading_action_transition(action, deepcopy(copied_state), price, inplace=True)
+            copied_state = trading_action_transition(action, copied_state, price)
+            checkpoint = portfolio_state.checkpoint()
+            next_state = trading_action_transition(action, portfolio_state, price, inplace=True)
+            self.assertIs(next_state, portfolio_state)
+            self.assertEqual(copied_state.checkpoint(), expected_state.checkpoint())
+            self.assertEqual(portfolio_state.checkpoint(), expected_state.checkpoint())
+        portfolio_state.restore(checkpoint)
+        self.assertEqual(portfolio_state.checkpoint(), checkpoint)
+        trading_action_transition(actions[-1], portfolio_state, prices[-1], inplace=True)
+        self.assertEqual(portfolio_state.checkpoint(), copied_state.checkpoint())
+
+    def test_transition_by_action_codes(self):
+        """
+        Test action codes transit the same as action names.
+        """
+        by_names = PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=5e5)
+        by_codes = by_names.copy()
+        names = [TradingAction.BUY, TradingAction.SHORT, TradingAction.BUY, TradingAction.SELL,
+                 TradingAction.COVER, TradingAction.FAIR, TradingAction.SELL]
+        for step, name in enumerate(names):
+            price = 21000 + 30 * step
+            trading_action_transition(name, by_names, price, inplace=True)
+            trading_action_transition(getattr(TradingActionCode, name), by_codes, price, inplace=True)
+            self.assertEqual(by_codes.checkpoint(), by_names.checkpoint())
@@ -0,0 +1,124 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test subprocess vectorized market environment.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from utils.exceptions import Exceptions
+from brain.trade_env.bar_quote import BarQuote
+from brain.trade_env.base import TradingAction, encode_action
+from brain.trade_env.market_env import FuturesMarketEnv
+from brain.trade_env.state_transition import trading_action_transition
+from brain.trade_env.subprocess_env import SubprocessVectorEnv
+
+
+NUM_ENVS, LENGTH, WINDOW = 5, 12, 2
+
+
+def _make_env(index):
+    """
+    Environment factory, picklable by workers.
+    """
+    prices = 20000 + 100 * index + 10 * np.sin(np.arange(LENGTH) + index)
+    return FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                         bar_quote=BarQuote(bar_dict={'closePrice': prices}, window=WINDOW))
+
+
+def _step(env, action):
+    """
+    Step function rewarding the profit of portfolio value.
+    """
+    return env.step(action,
+                    state_transition=(lambda a, s: trading_action_transition(a, s, env.bar_quote.current(),
+                                                                             inplace=True)),
+                    reward_calculator=(lambda n_s, o: n_s.portfolio_value - 1e6))
+
+
+def _make_failed_env(index):
+    """
+    Environment factory failing in the last worker.
+    """
+    if index == NUM_ENVS - 1:
+        raise ValueError('failed to build environment {}'.format(index))
+    return _make_env(index)
+
+
+def _failed_step(env, action):
+    """
+    Step function failing on sell actions.
+    """
+    if action == encode_action(TradingAction.SELL):
+        raise ValueError('failed to step')
+    return _step(env, action)
+
+
+class TestSubprocessEnv(TestCase):
+
+    def test_match_in_process_envs(self):
+        """
+        Test subprocess environments match in-process environments, including auto-reset.
+        """
+        random_state = np.random.RandomState(0)
+        actions = random_state.choice([TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT,
+                                       TradingAction.COVER, TradingAction.FAIR], size=(2 * LENGTH, NUM_ENVS))
+        vector_env = SubprocessVectorEnv(_make_env, NUM_ENVS, observation_shape=(1, WINDOW),
+                                         num_workers=2, step_fn=_step, timeout=60)
+        try:
+            vector_env.reset()
+            envs = [_make_env(index) for index in range(NUM_ENVS)]
+            for env in envs:
+                env.reset()
+            for bar in range(len(actions)):
+                step_info = vector_env.step(actions[bar])
+                for index, env in enumerate(envs):
+                    expected = _step(env, actions[bar][index])
+                    np.testing.assert_array_equal(step_info.observation[index], expected.observation)
+                    self.assertEqual(step_info.reward[index], expected.reward)
+                    self.assertEqual(step_info.done[index], env.bar_quote.exhausted)
+                    if env.bar_quote.exhausted:
+                        env.reset()
+        finally:
+            vector_env.close()
+
+    def test_default_workers(self):
+        """
+        Test workers default to the cpu count, capped by the number of environments.
+        """
+        vector_env = SubprocessVectorEnv(_make_env, 2, observation_shape=(1, WINDOW), step_fn=_step, timeout=60)
+        try:
+            self.assertEqual(vector_env.reset().shape, (2, 1, WINDOW))
+            self.assertEqual(vector_env.step([TradingAction.BUY] * 2).observation.shape, (2, 1, WINDOW))
+        finally:
+            vector_env.close()
+
+    def test_worker_failures(self):
+        """
+        Test failures of environment factories and step functions raise with the worker tracebacks.
+        """
+        vector_env = SubprocessVectorEnv(_make_failed_env, NUM_ENVS, observation_shape=(1, WINDOW),
+                                         num_workers=2, step_fn=_step)
+        with self.assertRaises(type(Exceptions.SUBPROCESS_WORKER_FAILED)) as context:
+            vector_env.reset()
+        self.assertIn('failed to build environment 4', context.exception.args[0]['msg'])
+        vector_env.close()
+        vector_env = SubprocessVectorEnv(_make_env, NUM_ENVS, observation_shape=(1, WINDOW),
+                                         num_workers=2, step_fn=_failed_step, timeout=60)
+        try:
+            vector_env.reset()
+            with self.assertRaises(type(Exceptions.SUBPROCESS_WORKER_FAILED)) as context:
+                vector_env.step([TradingAction.BUY] * (NUM_ENVS - 1) + [TradingAction.SELL])
+            self.assertIn('failed to step', context.exception.args[0]['msg'])
+            self.assertEqual(vector_env.step([TradingAction.BUY] * NUM_ENVS).observation.shape,
+                             (NUM_ENVS, 1, WINDOW))
+        finally:
+            vector_env.close()
+        vector_env = SubprocessVectorEnv(_make_env, NUM_ENVS, observation_shape=(1, WINDOW + 1),
+                                         num_workers=2, step_fn=_step, timeout=60)
+        try:
+            with self.assertRaises(type(Exceptions.SUBPROCESS_WORKER_FAILED)) as context:
+                vector_env.reset()
+            self.assertIn('Observation size does not match', context.exception.args[0]['msg'])
+        finally:
+            vector_env.close()
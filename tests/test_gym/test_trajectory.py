@@ -0,0 +1,81 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test trajectory recorder.
+# **********************************************************************************#
+"""
+import os
+import tempfile
+import numpy as np
+from unittest import TestCase
+from utils.exceptions import Exceptions
+from brain.trade_env.bar_quote import BarQuote
+from brain.trade_env.base import TradingAction, TradingActionCode
+from brain.trade_env.market_env import FuturesMarketEnv
+from brain.trade_env.state_transition import trading_action_transition
+from brain.trade_env.trajectory import TrajectoryRecorder, load_trajectory
+from brain.trade_env.vector_env import VectorFuturesMarketEnv
+
+
+class TestTrajectoryRecorder(TestCase):
+
+    def test_record_and_flush(self):
+        """
+        Test scalar steps are recorded into growing columns and flushed chunks load back.
+        """
+        prices = 21000 + 10 * np.sin(np.arange(50))
+        env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                            bar_quote=BarQuote(bar_dict={'closePrice': prices}, window=3))
+        actions = [TradingAction.BUY, TradingAction.SHORT, TradingAction.SELL, TradingAction.FAIR] * 12
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = TrajectoryRecorder(capacity=4, directory=directory, chunk_size=20)
+            values = list()
+            for action in actions:
+                step_info = env.step(action, state_transition=(
+                    lambda a, s: trading_action_transition(a, s, env.bar_quote.current(), inplace=True)))
+                recorder.record(step_info, env.env_snapshot)
+                values.append(env.env_snapshot.state.portfolio_value)
+            self.assertEqual((recorder.chunks, len(recorder)), (2, 8))
+            np.testing.assert_array_equal(recorder['action'][-2:], [TradingActionCode.SELL, TradingActionCode.FAIR])
+            recorder.close()
+            self.assertEqual(len(os.listdir(directory)), 3)
+            trajectory = load_trajectory(directory)
+        self.assertEqual(trajectory['observation'].shape, (48, 1, 3))
+        np.testing.assert_array_equal(trajectory['observation'][5, 0], prices[5:8])
+        np.testing.assert_array_equal(trajectory['portfolio_value'], values)
+        self.assertEqual(trajectory['action'].dtype, np.int8)
+
+    def test_record_batch(self):
+        """
+        Test vectorized steps are recorded one row for each environment.
+        """
+        vector_env = VectorFuturesMarketEnv.from_configs(np.linspace(100, 110, 10), num_envs=3, margin_cash=1e5)
+        recorder = TrajectoryRecorder()
+        for _ in range(4):
+            actions = [TradingActionCode.BUY, TradingActionCode.SHORT, TradingActionCode.FAIR]
+            recorder.record_batch(vector_env.step(actions), actions, vector_env.state)
+        self.assertEqual(len(recorder), 12)
+        np.testing.assert_array_equal(recorder['long_amount'][-3:], vector_env.state.long_amount)
+        np.testing.assert_array_equal(recorder['observation'][:3], [100, 100, 100])
+
+    def test_terminal_rows_and_float_actions(self):
+        """
+        Test terminal rows keep the amounts before auto-reset and float actions keep their dtype.
+        """
+        vector_env = VectorFuturesMarketEnv.from_configs(np.linspace(100, 110, 3), num_envs=2, margin_cash=1e5)
+        recorder = TrajectoryRecorder()
+        for _ in range(3):
+            actions = [TradingActionCode.BUY, TradingActionCode.SHORT]
+            step_info = vector_env.step(actions)
+            recorder.record_batch(step_info, actions, vector_env.state)
+        self.assertTrue(step_info.done.all())
+        np.testing.assert_array_equal(vector_env.state.long_amount, [0, 0])
+        self.assertGreater(recorder['long_amount'][-2], 0)
+        self.assertGreater(recorder['short_amount'][-1], 0)
+        recorder = TrajectoryRecorder()
+        recorder.append([[1., 2.]], [0.35], 0., False, 1e6, 1e6, 0., 0.)
+        self.assertEqual(recorder['action'].dtype, np.float64)
+        self.assertEqual(recorder['action'][0], 0.35)
+        recorder = TrajectoryRecorder(action_dtype=np.int8)
+        with self.assertRaises(type(Exceptions.INVALID_ACTION_DTYPE)):
+            recorder.append([[1., 2.]], [0.35], 0., False, 1e6, 1e6, 0., 0.)
@@ -0,0 +1,193 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test vectorized market environment.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from brain.trade.cost import Commission, Slippage
+from brain.trade_env.action_space import TargetPositionSpace, TradingActionSpace
+from brain.trade_env.base import TradingAction, TRADING_ACTIONS
+from brain.trade_env.batch_state import BatchPortfolioState
+from brain.trade_env.market_env import FuturesMarketEnv
+from brain.trade_env.state import PortfolioState
+from brain.trade_env.state_transition import (
+    batch_feasible_actions,
+    batch_target_position_transition,
+    batch_trading_action_transition,
+    target_position_transition,
+    trading_action_transition
+)
+from brain.trade_env.vector_env import VectorFuturesMarketEnv
+
+
+class _PriceQuote(object):
+    """
+    Bar quote pushing prices one by one.
+    """
+    def __init__(self, prices):
+        self.prices = prices
+        self.cursor = -1
+
+    def push(self):
+        self.cursor += 1
+        return self.prices[self.cursor]
+
+
+class TestVectorEnv(TestCase):
+
+    def test_match_scalar_env(self):
+        """
+        Test vectorized environment matches the scalar environment bar for bar.
+        """
+        random_state = np.random.RandomState(0)
+        num_envs, length = 4, 60
+        prices = 20000 + np.cumsum(random_state.normal(0, 50, size=(num_envs, length)), axis=1)
+        multipliers = np.array([5, 10, 5, 1])
+        margin_rates = np.array([0.15, 0.1, 0.5, 1.])
+        actions = random_state.choice([TradingAction.BUY, TradingAction.SELL, TradingAction.SHORT,
+                                       TradingAction.COVER, TradingAction.FAIR], size=(length, num_envs))
+        actions[:10] = TradingAction.BUY
+        vector_env = VectorFuturesMarketEnv.from_configs(prices, num_envs=num_envs, margin_cash=1e6,
+                                                         multiplier=multipliers, margin_rate=margin_rates)
+        scalar_envs = list()
+        for index in range(num_envs):
+            env = FuturesMarketEnv.from_configs(margin_cash=1e6, symbol='ZN1902',
+                                                multiplier=int(multipliers[index]),
+                                                margin_rate=float(margin_rates[index]))
+            env.bar_quote = _PriceQuote(prices[index])
+            scalar_envs.append(env)
+
+        for bar in range(length):
+            step_info = vector_env.step(actions[bar])
+            for index, env in enumerate(scalar_envs):
+                quote = env.bar_quote
+                scalar_info = env.step(actions[bar][index],
+                                       state_transition=(lambda a, s: trading_action_transition(
+                                           a, s, quote.prices[quote.cursor])))
+                state = env.env_snapshot.state
+                self.assertEqual(step_info.observation[index], scalar_info.observation)
+                self.assertEqual(step_info.reward[index], scalar_info.reward)
+                self.assertEqual(step_info.info['portfolio_value'][index], state.portfolio_value)
+                self.assertEqual(step_info.info['margin_cash'][index], state.margin_cash)
+            self.assertEqual(step_info.done.all(), bar == length - 1)
+
+    def test_auto_reset(self):
+        """
+        Test environments are reset automatically when done.
+        """
+        prices = np.linspace(100, 110, 5)
+        vector_env = VectorFuturesMarketEnv.from_configs(prices, num_envs=3, margin_cash=1e5)
+        for _ in range(5):
+            step_info = vector_env.step([TradingAction.BUY] * 3)
+        self.assertTrue(step_info.done.all())
+        self.assertTrue((vector_env.cursor == -1).all())
+        self.assertTrue((vector_env.state.portfolio_value == 1e5).all())
+        self.assertTrue((vector_env.state.long_amount == 0).all())
+
+    def test_feasible_actions(self):
+        """
+        Test feasible quantities of all actions match the scalar transition.
+        """
+        random_state = np.random.RandomState(1)
+        states = list()
+        for index in range(12):
+            state = PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=5e5)
+            actions = random_state.choice(['BUY', 'SHORT', 'SELL', 'COVER'], size=2 * index, p=[.4, .4, .1, .1])
+            for action in actions:
+                trading_action_transition(action, state, 21000 + random_state.normal(0, 100), inplace=True)
+            states.append(state)
+        batch_state = BatchPortfolioState.from_states(states)
+        checkpoint = batch_state.checkpoint()
+        prices = 21000 + random_state.normal(0, 100, size=len(states))
+        quantities, mask = batch_feasible_actions(batch_state, prices)
+        np.testing.assert_array_equal(batch_state.checkpoint(), checkpoint)
+        for index, state in enumerate(states):
+            for code, action in enumerate(TRADING_ACTIONS):
+                next_state = trading_action_transition(action, state, prices[index])
+                traded = abs(next_state.position_holding.long_amount - state.position_holding.long_amount) + \
+                    abs(next_state.position_holding.short_amount - state.position_holding.short_amount)
+                self.assertEqual(quantities[index, code], traded)
+            np.testing.assert_array_equal(mask[index], TradingActionSpace.feasible_mask(state, prices[index]))
+
+    def test_target_position(self):
+        """
+        Test target exposures are reached in one step, batched transition matches the scalar one.
+        """
+        random_state = np.random.RandomState(2)
+        num_envs, length = 6, 30
+        prices = 21000 + np.cumsum(random_state.normal(0, 50, size=(num_envs, length)), axis=1)
+        targets = TargetPositionSpace(max_exposure=0.8, seed=2).sample((length, num_envs))
+        vector_env = VectorFuturesMarketEnv.from_configs(prices, num_envs=num_envs, margin_cash=1e6, multiplier=5,
+                                                         margin_rate=0.15,
+                                                         state_transition=batch_target_position_transition)
+        states = [PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15, margin_cash=1e6)
+                  for _ in range(num_envs)]
+        for bar in range(length - 1):
+            step_info = vector_env.step(targets[bar])
+            for index, state in enumerate(states):
+                target_position_transition(targets[bar, index], state, prices[index, bar], inplace=True)
+                self.assertEqual(step_info.info['portfolio_value'][index], state.portfolio_value)
+                self.assertEqual(vector_env.state.long_amount[index], state.position_holding.long_amount)
+                self.assertEqual(vector_env.state.short_amount[index], state.position_holding.short_amount)
+                margin = state.position_holding.total_margin
+                self.assertAlmostEqual(np.sign(targets[bar, index]) * margin / state.portfolio_value,
+                                       targets[bar, index], delta=0.02)
+
+    def test_trading_costs(self):
+        """
+        Test commission and slippage are charged the same by the scalar and batched transitions.
+        """
+        random_state = np.random.RandomState(3)
+        num_envs, length = 5, 40
+        prices = 21000 + np.cumsum(random_state.normal(0, 50, size=(num_envs, length)), axis=1)
+        actions = random_state.choice(TRADING_ACTIONS, size=(length, num_envs))
+        targets = TargetPositionSpace(max_exposure=0.8, seed=3).sample((length, num_envs))
+        costs = [(Commission(0.0003, 0.0005), Slippage(0.0001)),
+                 (Commission(5., 3., unit='perShare'), Slippage(10., unit='perShare'))]
+        for commission, slippage in costs:
+            batch_states = [BatchPortfolioState.from_configs(num_envs, margin_cash=1e6, multiplier=5,
+                                                             margin_rate=0.15) for _ in range(3)]
+            states = [[PortfolioState.from_configs(symbol='ZN1902', multiplier=5, margin_rate=0.15,
+                                                   margin_cash=1e6) for _ in range(num_envs)] for _ in range(2)]
+            for bar in range(length):
+                batch_trading_action_transition(actions[bar], batch_states[0], prices[:, bar],
+                                                commission=commission, slippage=slippage)
+                batch_target_position_transition(targets[bar], batch_states[1], prices[:, bar],
+                                                 commission=commission, slippage=slippage)
+                batch_trading_action_transition(actions[bar], batch_states[2], prices[:, bar])
+                for index in range(num_envs):
+                    trading_action_transition(actions[bar, index], states[0][index], prices[index, bar],
+                                              inplace=True, commission=commission, slippage=slippage)
+                    target_position_transition(targets[bar, index], states[1][index], prices[index, bar],
+                                               inplace=True, commission=commission, slippage=slippage)
+                for batch_state, scalar_states in zip(batch_states, states):
+                    np.testing.assert_array_equal(batch_state.portfolio_value,
+                                                  [_.portfolio_value for _ in scalar_states])
+                    np.testing.assert_array_equal(batch_state.margin_cash, [_.margin_cash for _ in scalar_states])
+            self.assertTrue((batch_states[0].portfolio_value < batch_states[2].portfolio_value).all())
+
+    def test_update_row(self):
+        """
+        Test updating one row gives the same states as a batch update where only that row trades.
+        """
+        random_state = np.random.RandomState(5)
+        num_envs = 4
+        batch_state, row_state = [BatchPortfolioState.from_configs(num_envs, position_base=[0, 2, -3, 0],
+                                                                   cost_base=3000., margin_cash=1e6,
+                                                                   multiplier=10, margin_rate=0.1)
+                                  for _ in range(2)]
+        for _ in range(200):
+            index = random_state.randint(num_envs)
+            direction, offset = random_state.choice([1, -1]), random_state.choice([1, -1])
+            holding = batch_state.short_amount if direction == 1 else batch_state.long_amount
+            amount = float(random_state.randint(1, 4)) if offset == 1 else holding[index]
+            if not amount:
+                continue
+            price, cost = 3000. + random_state.normal(0, 30), random_state.uniform(0, 5)
+            amounts, costs = np.zeros(num_envs), np.zeros(num_envs)
+            amounts[index], costs[index] = amount, cost
+            expected = batch_state.update(direction, offset, amounts, price, costs=costs)[index]
+            self.assertEqual(row_state.update_row(index, direction, offset, amount, price, cost=cost), expected)
+            np.testing.assert_array_equal(row_state.checkpoint(), batch_state.checkpoint())
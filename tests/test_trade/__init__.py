@@ -0,0 +1,6 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: 
+# **********************************************************************************#
+"""
\ No newline at end of file
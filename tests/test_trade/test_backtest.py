@@ -0,0 +1,70 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test vectorized signal backtest.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from brain.trade.backtest import backtest_signals
+from brain.trade.trade import Trade
+from brain.trade_env.state import PortfolioState
+
+
+def scalar_backtest(prices, signal, margin_cash, multiplier, margin_rate):
+    """
+    Reference backtest stepping PortfolioState bar by bar.
+    """
+    state = PortfolioState.from_configs(symbol='ZN1902', margin_cash=margin_cash,
+                                        multiplier=multiplier, margin_rate=margin_rate)
+    position = state.position_holding
+    records = list()
+    for price, target in zip(prices, signal):
+        delta = target - (position.long_amount - position.short_amount)
+        if delta < 0 and position.long_amount:
+            amount = min(position.long_amount, -delta)
+            state.update(Trade(None, 'ZN1902', -1, 'close', amount, price, None, 0, 0))
+            delta += amount
+        elif delta > 0 and position.short_amount:
+            amount = min(position.short_amount, delta)
+            state.update(Trade(None, 'ZN1902', 1, 'close', amount, price, None, 0, 0))
+            delta -= amount
+        if delta:
+            state.update(Trade(None, 'ZN1902', 1 if delta > 0 else -1, 'open', abs(delta), price, None, 0, 0))
+        state.evaluate(price)
+        records.append((state.portfolio_value, state.margin_cash, position.total_margin,
+                        position.long_cost, position.short_cost, position.profit))
+    return np.array(records).T
+
+
+class TestBacktest(TestCase):
+
+    def test_backtest_signals(self):
+        """
+        Test vectorized backtest reproduces the scalar accounting exactly.
+        """
+        random_state = np.random.RandomState(7)
+        prices = np.round(21000 + np.cumsum(random_state.normal(0, 20, 300)), 1)
+        signals = np.clip(np.cumsum(random_state.randint(-3, 4, (20, 300)), axis=1), -8, 8)
+        signals[0] = 0
+        signals[1, ::7] = 0
+        result = backtest_signals(prices, signals, margin_cash=1e6, multiplier=5, margin_rate=0.15)
+        for index, signal in enumerate(signals):
+            expected = scalar_backtest(prices, signal, 1e6, 5, 0.15)
+            actual = [result.equity[index], result.margin_cash[index], result.margin[index],
+                      result.long_cost[index], result.short_cost[index], result.float_pnl[index]]
+            for values, expected_values in zip(actual, expected):
+                np.testing.assert_array_equal(values, expected_values)
+        single = backtest_signals(prices, signals[2], margin_cash=1e6, multiplier=5, margin_rate=0.15)
+        np.testing.assert_array_equal(single.equity, result.equity[2])
+        self.assertTrue((result.equity[0] == 1e6).all())
+
+    def test_realized_pnl(self):
+        """
+        Test realized profit and loss of a round trip is against the average cost.
+        """
+        result = backtest_signals([100., 102., 104., 103., 101.], [1, 2, 1, 0, -1], margin_cash=1e4, multiplier=10)
+        np.testing.assert_array_equal(result.trades, [1, 1, -1, -1, -1])
+        np.testing.assert_array_equal(result.long_cost, [100, 101, 101, 0, 0])
+        np.testing.assert_array_equal(result.realized_pnl, [0, 0, 30, 20, 0])
+        self.assertEqual(result.equity[-1], 1e4 + 50)
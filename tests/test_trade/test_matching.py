@@ -0,0 +1,100 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test order matching.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from utils.exceptions import Exceptions
+from brain.trade.base import OrderType, FillRule
+from brain.trade.cost import Commission
+from brain.trade.matching import OrderMatcher
+from brain.trade.position import FuturesPosition
+
+
+def bar(*prices):
+    """
+    One bar of each symbol as open, high, low, close arrays.
+    """
+    return [np.array(_, dtype=float) for _ in zip(*prices)]
+
+
+class TestOrderMatcher(TestCase):
+
+    def test_fill_rules(self):
+        """
+        Test trigger and fill prices of market, limit and stop orders.
+        """
+        matcher = OrderMatcher(['RB1905'], fill_rule=FillRule.open)
+        market = matcher.submit('RB1905', 1, 'open', 1)
+        buy_limit = matcher.submit('RB1905', 1, 'open', 2, OrderType.limit, 3000.)
+        sell_limit = matcher.submit('RB1905', -1, 'open', 3, OrderType.limit, 3050.)
+        buy_stop = matcher.submit('RB1905', 1, 'open', 4, OrderType.stop, 3040.)
+        sell_stop = matcher.submit('RB1905', -1, 'open', 5, OrderType.stop, 2990.)
+        trades = matcher.match(*bar((3010., 3045., 3000., 3020.)))
+        filled = {trade.order_id: (trade.transact_amount, trade.transact_price) for trade in trades}
+        self.assertEqual(filled, {market: (1, 3010.), buy_limit: (2, 3000.), buy_stop: (4, 3040.)})
+        np.testing.assert_array_equal(matcher['order_id'], [sell_limit, sell_stop])
+        trades = matcher.match(*bar((2980., 2985., 2970., 2975.)))
+        self.assertEqual([(_.order_id, _.transact_price) for _ in trades], [(sell_stop, 2980.)])
+        trades = matcher.match(*bar((3060., 3070., 3055., 3065.)))
+        self.assertEqual([(_.order_id, _.transact_price) for _ in trades], [(sell_limit, 3060.)])
+        self.assertEqual(len(matcher), 0)
+
+        matcher = OrderMatcher(['RB1905'], touch_fill=False)
+        order = matcher.submit('RB1905', 1, 'open', 1, OrderType.limit, 3000.)
+        self.assertEqual(matcher.match(*bar((3010., 3020., 3000., 3005.))), [])
+        self.assertTrue(matcher.cancel(order))
+        self.assertFalse(matcher.cancel(order))
+        with self.assertRaises(type(Exceptions.INVALID_ORDER)):
+            matcher.submit('RB1905', 1, 'open', 1, OrderType.stop)
+
+    def test_volume_limit(self):
+        """
+        Test fills share the volume cap of each symbol by priority and the rest keeps resting.
+        """
+        matcher = OrderMatcher(['RB1905', 'HC1905'], volume_limit=0.1)
+        low_bid = matcher.submit('RB1905', 1, 'open', 6, OrderType.limit, 3000.)
+        high_bid = matcher.submit('RB1905', 1, 'open', 6, OrderType.limit, 3010.)
+        market = matcher.submit('RB1905', -1, 'open', 3)
+        other = matcher.submit('HC1905', 1, 'open', 50)
+        open_price, high, low, close = bar((3005., 3015., 2995., 3005.), (3500., 3500., 3500., 3500.))
+        trades = matcher.match(open_price, high, low, close, volume=np.array([100, 200]))
+        self.assertEqual([(_.order_id, _.transact_amount, _.transact_price) for _ in trades],
+                         [(market, 3, 3005.), (high_bid, 6, 3005.), (low_bid, 1, 3000.), (other, 20, 3500.)])
+        np.testing.assert_array_equal(matcher['order_id'], [low_bid, other])
+        np.testing.assert_array_equal(matcher['amount'], [5, 30])
+
+    def test_update_positions(self):
+        """
+        Test trades update positions with costs and close fills are capped by holdings.
+        """
+        position = FuturesPosition(symbol='RB1905', price=3000., multiplier=10, margin_rate=0.1)
+        matcher = OrderMatcher(['RB1905', 'HC1905'], positions={'RB1905': position},
+                               commission=Commission(0.0001, 0.0001))
+        matcher.submit('RB1905', 1, 'open', 3)
+        matcher.submit('HC1905', 1, 'open', 1)
+        trades = matcher.match(*bar((3000., 3010., 2990., 3005.), (np.nan,) * 4), filled_time='2019-01-02')
+        self.assertEqual(len(trades), 1)
+        self.assertEqual(position.long_amount, 3)
+        self.assertEqual(position.long_cost, 3005.)
+        self.assertAlmostEqual(trades[0].commission, 3 * 3005. * 10 * 0.0001)
+        self.assertEqual(len(matcher), 1)
+        matcher.submit('RB1905', -1, 'close', 5)
+        trades = matcher.match(*bar((3010., 3010., 3010., 3010.), (3500., 3500., 3500., 3500.)))
+        self.assertEqual([_.transact_amount for _ in trades], [1, 3])
+        self.assertEqual(position.long_amount, 0)
+        self.assertEqual(len(matcher), 0)
+
+    def test_contract_overrides(self):
+        """
+        Test multiplier and margin rate given to the matcher reach costs and position updates.
+        """
+        position = FuturesPosition(symbol='RB1905', price=3000.)
+        matcher = OrderMatcher(['RB1905'], positions={'RB1905': position}, commission=Commission(0.0001, 0.0001),
+                               multiplier={'RB1905': 10}, margin_rate=0.1)
+        matcher.submit('RB1905', 1, 'open', 2)
+        trades = matcher.match(*bar((3000., 3000., 3000., 3000.)))
+        self.assertAlmostEqual(trades[0].commission, 2 * 3000. * 10 * 0.0001)
+        self.assertEqual(position.long_margin, 2 * 3000. * 10 * 0.1)
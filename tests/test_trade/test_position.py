@@ -0,0 +1,48 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test position.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from brain.trade.position import FuturesPosition, evaluate_positions
+from brain.trade_env.state import PortfolioState
+
+
+class TestPosition(TestCase):
+
+    def test_evaluate_positions(self):
+        """
+        Test batch evaluation is bit-compatible with PortfolioState.evaluate.
+        """
+        random_state = np.random.RandomState(7)
+        n = 200
+        long_amount = random_state.randint(0, 5, n).astype(float)
+        short_amount = random_state.randint(0, 5, n).astype(float)
+        long_cost = np.where(long_amount > 0, random_state.uniform(2000, 4000, n), 0.)
+        short_cost = np.where(short_amount > 0, random_state.uniform(2000, 4000, n), 0.)
+        value = np.where(random_state.rand(n) < 0.3, 0., random_state.normal(0, 1e4, n))
+        multiplier = random_state.choice([1., 5., 10., 300.], n)
+        margin_rate = random_state.uniform(0.05, 0.2, n)
+        portfolio_value = random_state.uniform(1e5, 1e6, n)
+        price = random_state.uniform(2000, 4000, n)
+        evaluation = evaluate_positions(price, long_amount, short_amount, long_cost, short_cost, value,
+                                        multiplier, margin_rate, portfolio_value=portfolio_value)
+        for i in range(n):
+            position = FuturesPosition(symbol='RB1905', long_amount=long_amount[i], short_amount=short_amount[i],
+                                       long_cost=long_cost[i], short_cost=short_cost[i], value=value[i])
+            state = PortfolioState(position_holding=position, multiplier=multiplier[i], margin_rate=margin_rate[i])
+            state.portfolio_value = portfolio_value[i]
+            self.assertEqual(position.copy().evaluate(price[i], multiplier[i], margin_rate[i]),
+                             evaluation.float_pnl_added[i])
+            state.evaluate(price[i])
+            self.assertEqual(position.long_margin, evaluation.long_margin[i])
+            self.assertEqual(position.short_margin, evaluation.short_margin[i])
+            self.assertEqual(position.profit, evaluation.profit[i])
+            self.assertEqual(position.value, evaluation.value[i])
+            self.assertEqual(state.portfolio_value, evaluation.portfolio_value[i])
+            self.assertEqual(state.margin_cash, evaluation.margin_cash[i])
+        evaluation = evaluate_positions(3000., long_amount, short_amount, long_cost, short_cost, value)
+        self.assertIsNone(evaluation.portfolio_value)
+        self.assertEqual(evaluation.value.shape, (n,))
@@ -0,0 +1,79 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test daily settlement.
+# **********************************************************************************#
+"""
+import numpy as np
+from unittest import TestCase
+from brain.trade.position import FuturesPosition
+from brain.trade.settlement import SettlementEngine
+from brain.trade.trade import Trade
+
+
+class TestSettlementEngine(TestCase):
+
+    def setUp(self):
+        self.positions = {
+            'RB1905': FuturesPosition(symbol='RB1905', price=3000., long_amount=3, long_cost=2990., value=90000.,
+                                      today_long_open=1, today_profit=120., multiplier=10, margin_rate=0.1),
+            'IF1903': FuturesPosition(symbol='IF1903', price=3500., short_amount=2, short_cost=3510.,
+                                      today_short_open=2, multiplier=300, margin_rate=0.12),
+            'CU1903': FuturesPosition(symbol='CU1903', price=48000., long_amount=1, short_amount=1,
+                                      long_cost=47900., short_cost=48100., multiplier=5, margin_rate=0.08)
+        }
+
+    def test_settle(self):
+        """
+        Test settlement matches FuturesPosition.evaluate at settlement prices and resets today fields.
+        """
+        engine = SettlementEngine.from_positions(self.positions)
+        settlement_price = np.array([3012., 3490., np.nan])
+        day_profit = engine.settle(settlement_price)
+        for index, position in enumerate(self.positions.values()):
+            price = position.price if np.isnan(settlement_price[index]) else settlement_price[index]
+            float_pnl = position.evaluate(price, position.multiplier, position.margin_rate)
+            self.assertEqual(day_profit[index], position.today_profit + float_pnl)
+            self.assertEqual(engine.long_margin[index], position.long_margin)
+            self.assertEqual(engine.short_margin[index], position.short_margin)
+            self.assertEqual(engine.profit[index], position.profit)
+            self.assertEqual(engine.value[index], position.value)
+            self.assertEqual(engine.pre_settlement_price[index], price)
+        np.testing.assert_array_equal(engine.today_long_open, 0)
+        np.testing.assert_array_equal(engine.today_short_open, 0)
+        np.testing.assert_array_equal(engine.today_profit, 0)
+        positions = engine.to_positions(self.positions)
+        self.assertEqual(positions['RB1905'].settlement_price, 3012.)
+        self.assertEqual(positions['IF1903'].today_short_open, 0)
+        self.assertEqual(positions['CU1903'].price, 48000.)
+
+    def test_contract_overrides(self):
+        """
+        Test multiplier and margin rate passed to FuturesPosition.update are given at gathering.
+        """
+        position = FuturesPosition(symbol='RB1905', price=3000.)
+        position.update(Trade(None, 'RB1905', 1, 'open', 2, 3000., None, 0., 0.), 10, 0.1)
+        expected = FuturesPosition(symbol='RB1905', price=3000.)
+        expected.update(Trade(None, 'RB1905', 1, 'open', 2, 3000., None, 0., 0.), 10, 0.1)
+        float_pnl = expected.evaluate(3000., 10, 0.1)
+        for engine in [SettlementEngine.from_positions([position], multiplier=10, margin_rate=0.1),
+                       SettlementEngine.from_positions({'RB1905': position}, multiplier={'RB1905': 10},
+                                                       margin_rate={'RB1905': 0.1})]:
+            day_profit = engine.settle([np.nan])
+            self.assertEqual(day_profit[0], expected.today_profit + float_pnl)
+            self.assertEqual(engine.long_margin[0], 6000.)
+
+    def test_settle_days(self):
+        """
+        Test daily profits of positions held through days add up to the price move.
+        """
+        engine = SettlementEngine(symbols=['RB1905', 'IF1903', 'CU1903'], price=[3000., 3500., 48000.],
+                                  long_amount=[3, 0, 1], short_amount=[0, 2, 0], long_cost=[2990., 0, 47900.],
+                                  short_cost=[0, 3510., 0], multiplier=[10, 300, 5])
+        random_state = np.random.RandomState(0)
+        prices = np.array([3000., 3500., 48000.]) + np.cumsum(random_state.normal(0, 10, (250, 3)), axis=0)
+        day_profits = engine.settle_days(prices)
+        self.assertEqual(day_profits.shape, (250, 3))
+        np.testing.assert_allclose(day_profits[1:].sum(axis=0),
+                                   (prices[-1] - prices[0]) * np.array([3 * 10, -2 * 300, 5]), atol=1e-6)
+        np.testing.assert_array_equal(engine.pre_settlement_price, prices[-1])
@@ -0,0 +1,87 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Test trade book.
+# **********************************************************************************#
+"""
+import numpy as np
+from datetime import datetime
+from unittest import TestCase
+from brain.trade.trade import Trade, MetaTrade
+from brain.trade.trade_book import TradeBook, TRADE_BOOK_DTYPE
+
+
+class TestTradeBook(TestCase):
+
+    def setUp(self):
+        self.trades = [
+            MetaTrade(1, 'RB1905', 1, 'open', 2, 3000., '2019-01-02T09:00', 1., 0.5, portfolio_id='a'),
+            MetaTrade(2, 'RB1905', 1, 'open', 2, 3100., '2019-01-02T09:01', 1., 0.5, portfolio_id='a'),
+            MetaTrade(3, 'RB1905', -1, 'close', 3, 3200., '2019-01-02T09:02:00.25', 1., 0.5, portfolio_id='a'),
+            MetaTrade(4, 'HC1905', -1, 'open', 1, 3500., '2019-01-02T09:03', 1., None, portfolio_id='b'),
+            MetaTrade(5, 'HC1905', 1, 'close', 1, 3400., '2019-01-02T09:04', 1., None, portfolio_id='b'),
+            MetaTrade(None, 'RB1905', 1, 'open', 1, 3000., None, None, None, portfolio_id='b')
+        ]
+
+    def test_records(self):
+        """
+        Test trades are stored as compact rows and read back through views and items.
+        """
+        book = TradeBook(capacity=2)
+        book.append(self.trades[0])
+        book.extend(self.trades[1:])
+        self.assertEqual(len(book), 6)
+        self.assertEqual(book.nbytes, 6 * TRADE_BOOK_DTYPE.itemsize)
+        self.assertLess(TRADE_BOOK_DTYPE.itemsize, 64)
+        self.assertEqual(book.categories('symbol'), ['RB1905', 'HC1905'])
+        np.testing.assert_array_equal(book['symbol'], [0, 0, 0, 1, 1, 0])
+        trade = book[2]
+        self.assertEqual((trade.order_id, trade.symbol, trade.direction, trade.offset_flag),
+                         (3, 'RB1905', -1, 'close'))
+        self.assertEqual(trade.filled_time, datetime(2019, 1, 2, 9, 2, 0, 250000))
+        self.assertIsNone(book[-1].order_id)
+        self.assertEqual(book.categories('portfolio_id'), ['a', 'b'])
+        self.assertEqual(book[-1].portfolio_id, 'b')
+        self.assertIsNone(book[-1].filled_time)
+        self.assertIsNone(book[3].slippage)
+        with self.assertRaises(AttributeError):
+            trade.unknown
+        items = book.to_mongodb_item()
+        recovered = TradeBook.from_query(items)
+        self.assertEqual(recovered.to_mongodb_item(), items)
+        self.assertEqual([_.to_dict() for _ in recovered], items)
+        trade = book.record(symbol='HC1905', direction=1, offset_flag='open', transact_amount=1,
+                            transact_price=3400., filled_time='2019-01-03T09:00')
+        self.assertEqual(book[-1].to_dict(), trade.to_dict())
+        book.append(Trade('external-1', 'RB1905', -1, 'open', 1, 3000., None, 0., 0.))
+        self.assertEqual((len(book), book[-1].order_id), (8, 'external-1'))
+        self.assertIsInstance(book.to_mongodb_item()[0]['filled_time'], datetime)
+
+    def test_aggregations(self):
+        """
+        Test turnover, costs and realized pnl by symbol and portfolio.
+        """
+        book = TradeBook.from_query([_.to_dict() for _ in self.trades])
+        multiplier = {'RB1905': 10, 'HC1905': 10}
+        self.assertEqual(book.turnover(multiplier=multiplier),
+                         {'RB1905': (6000. + 6200. + 9600. + 3000.) * 10, 'HC1905': (3500. + 3400.) * 10})
+        self.assertEqual(book.costs(by='portfolio_id'), {'a': 4.5, 'b': 2.})
+        # 平均开仓成本 3050, 平多 3 手于 3200; 空头 3500 开 3400 平
+        self.assertEqual(book.realized_pnl(multiplier=multiplier), {'RB1905': 4500., 'HC1905': 1000.})
+        self.assertEqual(book.realized_pnl(by='portfolio_id'), {'a': 450., 'b': 100.})
+        self.assertEqual(TradeBook().realized_pnl(), {})
+
+    def test_realized_pnl_average_cost(self):
+        """
+        Test average cost is carried over partial closes and trades without offset flag are skipped.
+        """
+        book = TradeBook()
+        for direction, offset_flag, amount, price in [(1, 'open', 2, 100.), (-1, 'open', 1, 500.),
+                                                      (-1, 'close', 1, 110.), (1, None, 5, 0.),
+                                                      (1, 'open', 1, 200.), (-1, 'close', 2, 160.),
+                                                      (1, 'close', 1, 400.), (-1, 'close', 1, 1.),
+                                                      (1, 'open', 1, 300.), (-1, 'close', 1, 330.)]:
+            book.record(symbol='RB1905', direction=direction, offset_flag=offset_flag, transact_amount=amount,
+                        transact_price=price)
+        # 多头: 100 开 2 手, 平 1 手后 200 加 1 手, 平均成本 150; 超出持仓的平仓按零成本计; 清仓后重新开仓
+        self.assertEqual(book.realized_pnl(), {'RB1905': 10. + 20. + 100. + 1. + 30.})
@@ -6,6 +6,15 @@
 # **********************************************************************************#
 """
 import multiprocessing
+import threading
+import traceback
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+from utils.exceptions import *
+from utils.exceptions import error_wrapper
+
+
+COMMAND_CLOSE = -1
 
 
 def _function_mask(func_detail):
@@ -49,6 +58,185 @@ class ProcessPool(object):
         return result.get()
 
 
+class SharedArrays(object):
+    """
+    Named numpy arrays laid out in one shared memory block, readable and writable
+    by all processes without pickling.
+    """
+    def __init__(self, specs, name=None):
+        """
+        Create the shared memory block, or attach to an existing one by name.
+
+        Args:
+            specs(dict): key-->array name, value-->(shape, dtype)
+            name(string): shared memory name to attach to, create a new block if None
+        """
+        self.specs = specs
+        layout, size = dict(), 0
+        for key, (shape, dtype) in specs.items():
+            dtype = np.dtype(dtype)
+            size = -(-size // 8) * 8
+            layout[key] = (size, tuple(shape), dtype)
+            size += int(np.prod(shape)) * dtype.itemsize
+        self._owner = name is None
+        self._memory = SharedMemory(create=True, size=max(size, 1)) if self._owner else SharedMemory(name=name)
+        self._arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self._memory.buf, offset=offset)
+                        for key, (offset, shape, dtype) in layout.items()}
+
+    @property
+    def name(self):
+        """
+        Shared memory name.
+        """
+        return self._memory.name
+
+    def __getitem__(self, key):
+        return self._arrays[key]
+
+    def close(self):
+        """
+        Close the shared memory, and unlink it if created by self.
+        """
+        self._arrays = dict()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+
+def _persistent_worker(worker_index, initializer, args, specs, name, barrier, errors):
+    """
+    Loop of persistent worker: wait for a command, handle it, then wait for the others.
+
+    A failed initializer aborts the barrier, so that the master and the other workers stop waiting,
+    tracebacks of failures are sent back to the master through errors.
+
+    Args:
+        worker_index(int): worker index
+        initializer(func): initializer with inputs shared arrays and args, returns the command handler
+        args(tuple): initializer arguments
+        specs(dict): shared arrays specs
+        name(string): shared memory name
+        barrier(multiprocessing.Barrier): barrier of all workers and the master
+        errors(multiprocessing.Queue): queue of (worker index, traceback) of failures
+    """
+    arrays = SharedArrays(specs, name=name)
+    try:
+        handler = initializer(arrays, *args)
+    except Exception:
+        errors.put((worker_index, traceback.format_exc()))
+        barrier.abort()
+        arrays.close()
+        return
+    try:
+        while True:
+            barrier.wait()
+            command = int(arrays['_command'][0])
+            if command == COMMAND_CLOSE:
+                break
+            try:
+                handler(command)
+            except Exception:
+                errors.put((worker_index, traceback.format_exc()))
+                arrays['_errors'][worker_index] = True
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    arrays.close()
+
+
+def _worker_failed(tracebacks):
+    """
+    Worker failure exception, carrying the tracebacks of the failed workers.
+    """
+    message = '\n'.join([Exceptions.SUBPROCESS_WORKER_FAILED.args[0]['msg']] +
+                        ['Worker {}:\n{}'.format(index, trace) for index, trace in sorted(tracebacks)])
+    return type(Exceptions.SUBPROCESS_WORKER_FAILED)(error_wrapper(500, message))
+
+
+class PersistentProcessPool(object):
+    """
+    Pool of long-lived worker processes sharing arrays with the master. One command
+    costs one synchronization round of all workers, whatever the size of the arrays.
+    """
+    DEFAULT_PROCESSORS = multiprocessing.cpu_count()
+
+    def __init__(self, initializer, args_batch, specs, timeout=None):
+        """
+        Args:
+            initializer(func): initializer with inputs shared arrays and args, returns the command handler
+            args_batch(list of tuple): initializer arguments, one for each worker
+            specs(dict): key-->array name, value-->(shape, dtype)
+            timeout(float): timeout of each synchronization
+        """
+        self.args_batch = list(args_batch)
+        self.timeout = timeout
+        specs = dict(specs)
+        specs['_command'] = ((1,), np.int64)
+        specs['_errors'] = ((len(self.args_batch),), np.bool_)
+        self.arrays = SharedArrays(specs)
+        self._barrier = multiprocessing.Barrier(len(self.args_batch) + 1)
+        self._failures = multiprocessing.Queue()
+        self._processes = [multiprocessing.Process(target=_persistent_worker,
+                                                   args=(index, initializer, args, specs,
+                                                         self.arrays.name, self._barrier, self._failures),
+                                                   daemon=True)
+                           for index, args in enumerate(self.args_batch)]
+        for process in self._processes:
+            process.start()
+
+    def execute(self, command):
+        """
+        Let all workers handle the command, and wait until they are finished.
+
+        Args:
+            command(int): non-negative command code
+        """
+        self.arrays['_command'][0] = command
+        try:
+            self._barrier.wait(self.timeout)
+            self._barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            # 初始化失败或超时, 收集已上报的错误后停止所有进程
+            tracebacks = self._collect_errors(block=False)
+            self.close()
+            raise _worker_failed(tracebacks)
+        failed = int(self.arrays['_errors'].sum())
+        if failed:
+            self.arrays['_errors'][:] = False
+            raise _worker_failed(self._collect_errors(count=failed))
+
+    def _collect_errors(self, count=None, block=True):
+        """
+        Tracebacks sent back by failed workers, count of them if given, otherwise all that arrive in time.
+        """
+        tracebacks = list()
+        while count is None or len(tracebacks) < count:
+            try:
+                tracebacks.append(self._failures.get(timeout=self.timeout if block else 1.))
+            except Exception:
+                break
+        return tracebacks
+
+    def close(self):
+        """
+        Stop all workers and release the shared memory.
+        """
+        if not self._processes:
+            return
+        if not self._barrier.broken:
+            self.arrays['_command'][0] = COMMAND_CLOSE
+            try:
+                self._barrier.wait(self.timeout)
+            except threading.BrokenBarrierError:
+                pass
+        for process in self._processes:
+            process.join(self.timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = list()
+        self.arrays.close()
+
+
 if __name__ == '__main__':
     def test_func(a, b):
         """
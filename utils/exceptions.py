@@ -64,6 +64,20 @@ class Exceptions(BaseExceptionEnumerate):
     """
     INVALID_INITIALIZE_PARAMETERS = EnvironmentsException(error_wrapper(500, 'You have invalid input parameters'
                                                                              ' when you initialize your trade_env.'))
+    BAR_QUOTE_EXHAUSTED = EnvironmentsException(error_wrapper(500, 'No more history bars in bar quote.'))
+    SUBPROCESS_WORKER_FAILED = EnvironmentsException(error_wrapper(500, 'Subprocess worker failed to '
+                                                                        'handle the command.'))
+    INVALID_OBSERVATION_SIZE = EnvironmentsException(error_wrapper(500, 'Observation size does not match the '
+                                                                        'observation shape of the environments.'))
+    INVALID_FEATURE = EnvironmentsException(error_wrapper(500, 'Invalid feature, the indicator is not supported '
+                                                               'or the window is not positive.'))
+    INVALID_EPISODE_LENGTH = EnvironmentsException(error_wrapper(500, 'Episode length exceeds the history bars.'))
+    INVALID_ACTION_DTYPE = EnvironmentsException(error_wrapper(500, 'Float actions can not be recorded as '
+                                                                    'integer trading action codes.'))
+    INVALID_BACKTEST_CONFIG = EnvironmentsException(error_wrapper(500, 'Invalid backtest config, keys should be '
+                                                                       'those of DEFAULT_KEYWORDS.'))
+    INVALID_ORDER = TradeException(error_wrapper(500, 'Invalid order, the amount should be positive and limit or '
+                                                      'stop orders should have a price.'))
 
 
 class ExceptionsFormat(BaseExceptionEnumerate):
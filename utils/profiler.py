@@ -0,0 +1,111 @@
+"""
+# -*- coding: UTF-8 -*-
+# **********************************************************************************#
+#     File: Phase profiler.
+# **********************************************************************************#
+"""
+import json
+import numpy as np
+from time import perf_counter_ns
+
+
+HISTOGRAM_BUCKETS = 64
+
+
+class PhaseProfiler(object):
+    """
+    Wall time profiler of named phases. Each record costs one bucket increment of a
+    histogram over power-of-two nanosecond buckets, so quantiles are kept without samples.
+    """
+    clock = staticmethod(perf_counter_ns)
+
+    def __init__(self, phases=None):
+        """
+        Args:
+            phases(list of string): phase names in report order, phases are added when first recorded
+        """
+        self.phases = list()
+        self._histograms = dict()
+        self._totals = dict()
+        for phase in phases or list():
+            self._add(phase)
+
+    def _add(self, phase):
+        self.phases.append(phase)
+        self._histograms[phase] = np.zeros(HISTOGRAM_BUCKETS, dtype=np.int64)
+        self._totals[phase] = 0
+
+    def record(self, phase, elapsed):
+        """
+        Record one call of the phase.
+
+        Args:
+            phase(string): phase name
+            elapsed(int): wall time in nanoseconds
+        """
+        if phase not in self._totals:
+            self._add(phase)
+        self._histograms[phase][min(int(elapsed).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self._totals[phase] += elapsed
+
+    def reset(self):
+        """
+        Clear all records.
+        """
+        for phase in self.phases:
+            self._histograms[phase][:] = 0
+            self._totals[phase] = 0
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """
+        Summary of phases.
+
+        Args:
+            quantiles(tuple): quantiles to report, as bucket upper bounds in nanoseconds
+
+        Returns:
+            dict: key-->phase, value-->dict of calls, total_ns, mean_ns, share and quantiles
+        """
+        grand_total = sum(self._totals.values()) or 1
+        result = dict()
+        for phase in self.phases:
+            histogram = self._histograms[phase]
+            calls = int(histogram.sum())
+            cumulative = np.cumsum(histogram)
+            item = {
+                'calls': calls,
+                'total_ns': int(self._totals[phase]),
+                'mean_ns': self._totals[phase] / calls if calls else 0.,
+                'share': self._totals[phase] / grand_total,
+            }
+            for quantile in quantiles:
+                bucket = int(np.searchsorted(cumulative, quantile * calls)) if calls else 0
+                item['p{:g}_ns'.format(100 * quantile)] = (1 << bucket) - 1 if calls else 0
+            result[phase] = item
+        return result
+
+    def dump(self, path):
+        """
+        Dump summary and histograms to a json file with stable layout, to diff between runs.
+
+        Args:
+            path(string): file path
+        """
+        content = {
+            'summary': self.summary(),
+            'histograms': {phase: self._histograms[phase].tolist() for phase in self.phases}
+        }
+        with open(path, 'w') as f:
+            json.dump(content, f, indent=2, sort_keys=True)
+
+    def __repr__(self):
+        lines = ['{:<20}{:>10}{:>14}{:>12}{:>8}'.format('phase', 'calls', 'total(ms)', 'mean(us)', 'share')]
+        for phase, item in self.summary().items():
+            lines.append('{:<20}{:>10}{:>14.3f}{:>12.3f}{:>7.1%}'.format(
+                phase, item['calls'], item['total_ns'] / 1e6, item['mean_ns'] / 1e3, item['share']))
+        return '\n'.join(lines)
+
+
+__all__ = [
+    'PhaseProfiler'
+]